@@ -7,6 +7,8 @@ import modbus_tk.modbus_tcp as modbus_tcp
 import time
 import modbus_tk
 import sys
+from traffic_capture import TrafficCapture
+from tag_codec import Field, compile_codec
 
 # 统一使用TCP/IP协议传输
 def main():
@@ -18,6 +20,10 @@ def main():
         errLogger.info(bdata) # 要后面的字节数据
     # 全局钩子，捕获所有主站接收的原始字节
     modbusHooks.install_hook('modbus.Master.after_recv',recvHooks)
+    # 可选: 把收发的完整帧抓到文件, 之后用 traffic_capture.py 回放
+    capture = None
+    if '--capture' in sys.argv:
+        capture = TrafficCapture(sys.argv[sys.argv.index('--capture') + 1]).install_master_hooks()
     try:
         def beforeConnect(args):
             master = args[0]
@@ -34,12 +40,17 @@ def main():
         # serv.__init__("127.0.0.1",502) # 本机通讯
         # 解包，比如说读取保持寄存器
         errLogger.info(serv.execute(1,cst.READ_HOLDING_REGISTERS,3))# 从站地址1，起始地址=0, 读了三个寄存器
+        # 浮点数占地址0-1两个寄存器, 编解码器按布局缓存
+        codec = compile_codec([Field('value', 0, 'float32')])
         # 写入浮点数
-        serv.execute(1, cst.WRITE_MULTIPLE_REGISTERS, starting_address=0, output_value=[3.14], data_format='>f')
+        serv.execute(1, cst.WRITE_MULTIPLE_REGISTERS, starting_address=0, output_value=codec.encode({'value': 3.14}))
         # 读取浮点数
-        errLogger.info(serv.execute(1, cst.READ_HOLDING_REGISTERS, 0, 2, data_format='>f'))
+        errLogger.info(codec.decode(serv.execute(1, cst.READ_HOLDING_REGISTERS, 0, codec.length)))
     except Exception as e:
         errLogger.error(sys.exc_info())
+    finally:
+        if capture:
+            capture.close()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
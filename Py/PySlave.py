@@ -1,69 +1,176 @@
 import modbus_tk.defines as cst
 # from modbus_tk import modbus_rtu # 不使用RTU
 import logging
-import modbus_tk.modbus_tcp as modbus_tcp   
+import modbus_tk.modbus_tcp as modbus_tcp
 import time
 import modbus_tk
 import sys
+import json
+import os
+import socketserver
+import threading
 
-def main():
-    # 开一个日志
-    errLogger = modbus_tk.utils.create_logger("console", level=logging.DEBUG)
-    try:
-        # 初始化一个从机
-        slave = modbus_tcp.TcpServer() # 默认本机地址，端口502
-        errLogger.info("slave start")
-        slave.start()
+# 块类型可以写数字或简称
+BLOCK_TYPES = {
+    'co': cst.COILS, 'di': cst.DISCRETE_INPUTS,
+    'hr': cst.HOLDING_REGISTERS, 'ir': cst.ANALOG_INPUTS,
+}
 
-        # 添加从站1
-        slave_1 = slave.add_slave(1) # 1就是从站号
-        slave_1.add_block('0',cst.HOLDING_REGISTERS,0,10) # 0是块号，寄存器类型，起始地址，寄存器数量
+def parse_block_type(text):
+    text = text.strip().lower()
+    return BLOCK_TYPES[text] if text in BLOCK_TYPES else int(text)
+
+class SlaveController:
+    """把控制命令应用到 TcpServer 上
 
-        while True:
-            time.sleep(1)
-            cmd = sys.stdin.readline()
-            args = cmd.split(' ')
+    文本命令(一行可用 ; 分隔多条, 依次执行):
+        add_slave <从站号>
+        add_block <从站号> <块名> <类型 hr/ir/co/di或功能码> <起始地址> <数量>
+        set_values <从站号> <块名> <地址> <值...>
+        get_values <从站号> <块名> <地址> <数量>
+    JSON命令(一行一个对象, 一次读写多个从站/块):
+        {"set": [[从站号, 块名, 地址, [值...]], ...], "get": [[从站号, 块名, 地址, 数量], ...]}
+        返回 {"ok": true, "values": [[...], ...]} 或 {"ok": false, "error": "..."}
+    每条命令只在读写对应从站时短暂持有 modbus_tk 的数据锁, 不会阻塞 TcpServer。
+    """
+    def __init__(self, server):
+        self.server = server
 
-            if cmd.find('quit') == 0:
-                sys.stdout.write('quit\r\n')
-                break
-            elif args[0] =='add_slave':
+    def execute(self, line):
+        """执行一行命令, 返回应答文本(不含换行)"""
+        line = line.strip()
+        if not line or line.startswith('#'):
+            return ''
+        if line.startswith('{'):
+            return json.dumps(self.execute_json(line), ensure_ascii=False)
+        return '\r\n'.join(self.run_command(cmd.split()) for cmd in line.split(';') if cmd.strip())
+
+    def execute_json(self, text):
+        try:
+            request = json.loads(text)
+            for slave_id, name, address, values in request.get('set', []):
+                self.server.get_slave(int(slave_id)).set_values(name, int(address), values)
+            values = [list(self.server.get_slave(int(slave_id)).get_values(name, int(address), int(count)))
+                      for slave_id, name, address, count in request.get('get', [])]
+            return {'ok': True, 'values': values}
+        except Exception as e:
+            return {'ok': False, 'error': str(e)}
+
+    def run_command(self, args):
+        try:
+            if args[0] == 'add_slave':
                 # 接收到添加从站的指令
                 slave_id = int(args[1])
-                slave.add_slave(slave_id)
-                sys.stdout.write('add slave {0}\r\n'.format(slave_id))
+                self.server.add_slave(slave_id)
+                return 'add slave {0}'.format(slave_id)
             elif args[0] == 'add_block':
                 # 接收到添加块的指令
                 slave_id = int(args[1])
                 name = args[2]
-                block_type = args[3]
+                block_type = parse_block_type(args[3])
                 start_addr = int(args[4])
                 quantity = int(args[5])
-                slaveAddBlock = slave.get_slave(slave_id)
-                slaveAddBlock.add_block(name,block_type,start_addr,quantity)
-                sys.stdout.write('add block {0} to slave {1}\r\n'.format(name,slave_id))
+                self.server.get_slave(slave_id).add_block(name, block_type, start_addr, quantity)
+                return 'add block {0} to slave {1}'.format(name, slave_id)
             elif args[0] == 'set_values':
                 # 接收到设置值的指令
                 slave_id = int(args[1])
                 name = args[2]
-                values = [int(x) for x in args[3:]]
-                slaveSetValues = slave.get_slave(slave_id)
-                slaveSetValues.set_values(name,values)
-                sys.stdout.write('set values {0} to slave {1}\r\n'.format(values,slave_id))
+                address = int(args[3])
+                values = [int(x) for x in args[4:]]
+                self.server.get_slave(slave_id).set_values(name, address, values)
+                return 'set values {0} to slave {1}'.format(values, slave_id)
             elif args[0] == 'get_values':
                 # 接收到获取值的指令
                 slave_id = int(args[1])
                 name = args[2]
                 start_addr = int(args[3])
                 quantity = int(args[4])
-                slaveGetValues = slave.get_slave(slave_id)
-                values = slaveGetValues.get_values(name,start_addr,quantity)
-                sys.stdout.write('get values {0} from slave {1}\r\n'.format(values,slave_id))
-            else:
-                sys.stdout.write('unknown command\r\n')
+                values = self.server.get_slave(slave_id).get_values(name, start_addr, quantity)
+                return 'get values {0} from slave {1}'.format(values, slave_id)
+            return 'unknown command'
+        except (IndexError, ValueError, KeyError) as e:
+            return 'bad command: {0}'.format(e)
+        except Exception as e:
+            # modbus_tk 的从站/块不存在、越界等错误
+            return 'error: {0}'.format(e)
+
+    def run_script(self, stream, out=sys.stdout):
+        """逐行执行脚本(文件或管道), 遇到 quit 返回True"""
+        for line in stream:
+            if line.strip().startswith('quit'):
+                out.write('quit\r\n')
+                return True
+            reply = self.execute(line)
+            if reply:
+                out.write(reply + '\r\n')
+                out.flush()
+        return False
+
+def serve_control(controller, address):
+    """启动控制接口: address 为 'host:port'(TCP) 或文件路径(Unix socket); 每行一条命令, 每行一条应答"""
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            for raw in self.rfile:
+                line = raw.decode('utf-8', 'replace')
+                if line.strip().startswith('quit'):
+                    break
+                self.wfile.write((controller.execute(line) + '\r\n').encode('utf-8'))
+
+    if ':' in address:
+        host, port = address.rsplit(':', 1)
+        server = socketserver.ThreadingTCPServer((host, int(port)), Handler)
+    else:
+        if os.path.exists(address):
+            os.unlink(address)
+        server = socketserver.ThreadingUnixStreamServer(address, Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def main():
+    # 开一个日志
+    errLogger = modbus_tk.utils.create_logger("console", level=logging.DEBUG)
+    # 用法: python PySlave.py [脚本文件...] [--control 127.0.0.1:5021 或 /tmp/pyslave.sock]
+    argv = sys.argv[1:]
+    control_address = None
+    if '--control' in argv:
+        index = argv.index('--control')
+        control_address = argv[index + 1]
+        del argv[index:index + 2]
+    control = None
+    try:
+        # 初始化一个从机
+        slave = modbus_tcp.TcpServer() # 默认本机地址，端口502
+        errLogger.info("slave start")
+        slave.start()
+
+        # 添加从站1
+        slave_1 = slave.add_slave(1) # 1就是从站号
+        slave_1.add_block('0',cst.HOLDING_REGISTERS,0,10) # 0是块号，寄存器类型，起始地址，寄存器数量
+
+        controller = SlaveController(slave)
+        if control_address:
+            control = serve_control(controller, control_address)
+            errLogger.info("control api on {0}".format(control_address))
+
+        # 先执行命令脚本, 再读标准输入(终端或管道)
+        for path in argv:
+            with open(path, encoding='utf-8') as script:
+                if controller.run_script(script):
+                    return
+        if not controller.run_script(sys.stdin):
+            # 标准输入结束(如管道脚本执行完)后从站继续运行, 只有 quit 命令或 Ctrl+C 才退出
+            errLogger.info("stdin closed, slave keeps running (Ctrl+C to stop)")
+            while True:
+                time.sleep(1)
+    except KeyboardInterrupt:
+        pass
     finally:
+        if control:
+            control.shutdown()
         # 关闭从站
         slave.stop()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
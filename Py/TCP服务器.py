@@ -1,65 +1,153 @@
-import socket
+import asyncio
+import struct
 import threading
+from concurrent.futures import ThreadPoolExecutor
 
-# 标志变量 用于停止服务器
-is_running = True
+# 事件驱动的TCP服务器: 一个事件循环管理所有连接, 不再每个连接一个线程。
+# 消息分帧方式:
+#   raw    - 默认, 兼容旧客户端: 一次读取最多1024字节, 原样应答后关闭连接
+#   length - 4字节大端长度前缀 + 内容(与LabVIEW"字符串平化"后写入TCP的格式一致), 应答同样带前缀
+#   line   - 以换行结尾的一行
+FRAME_HEADER = struct.Struct('>I')
 
-def handle_client_connection(client_socket):
-    try:
-        # 接收客户端发送的路径数据（接收TCP客户端的信息）
-        file_path = client_socket.recv(1024).decode()
-        print(f"接收到的文件路径: {file_path}")
+def handle_client_message(payload):
+    """处理一条消息并返回应答(在工作线程池中执行)"""
+    # 接收客户端发送的路径数据（接收TCP客户端的信息）
+    file_path = payload.decode(errors='replace')
+    print(f"接收到的文件路径: {file_path}")
+    # 返回接收到的文件路径（发送信息给TCP客户端）
+    return file_path.encode()
 
-        # 返回接收到的文件路径（发送信息给TCP客户端）
-        client_socket.sendall(file_path.encode())
-    finally:
-        client_socket.close()
+class FramedTcpServer:
+    """asyncio TCP服务器
 
-def tcp_server():
-    global is_running
-    # 创建一个 TCP 套接字
-    server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-    # 将套接字绑定到所有可用的网络接口和指定端口
-    server_socket.bind(('0.0.0.0', 12345))
-    # 监听传入连接的最大数量
-    server_socket.listen(5)
-    # 设置套接字超时时间为1秒
-    server_socket.settimeout(1)
-    print("服务器正在监听端口 12345")
+    handler: 处理一条消息的函数 bytes -> bytes(返回None则不应答), 在有界线程池中执行
+    max_connections: 同时保持的最大连接数, 超出的新连接直接关闭
+    idle_timeout: 连接空闲多少秒后断开
+    workers: 处理线程数; 排队的消息最多 workers*queue_factor 条, 满了就暂停读取(背压)
+    """
+    def __init__(self, handler=handle_client_message, host='0.0.0.0', port=12345, framing='raw',
+                 max_connections=10000, idle_timeout=60.0, workers=8, queue_factor=4,
+                 max_frame=1024 * 1024, backlog=1024):
+        if framing not in ('length', 'line', 'raw'):
+            raise ValueError(f"未知的分帧方式: {framing}")
+        self.handler = handler
+        self.host = host
+        self.port = port
+        self.framing = framing
+        self.max_connections = max_connections
+        self.idle_timeout = idle_timeout
+        self.workers = workers
+        self.queue_factor = queue_factor
+        self.max_frame = max_frame
+        self.backlog = backlog
+        self.loop = None
+        self.started = threading.Event()
+        self.connection_count = 0
+        self._server = None
+        self._writers = set()
+        self._tasks = set()
+        self._stop_event = None
+        self._executor = None
+        self._slots = None
 
-    # 创建一个线程来等待停止命令
-    def stop_server():
-        global is_running
-        input("按Enter键停止服务器...\n")
-        is_running = False
+    async def _read_message(self, reader):
+        if self.framing == 'length':
+            length, = FRAME_HEADER.unpack(await reader.readexactly(FRAME_HEADER.size))
+            if length > self.max_frame:
+                raise ValueError(f"消息过长: {length}字节")
+            return await reader.readexactly(length)
+        if self.framing == 'line':
+            line = await reader.readuntil(b'\n')
+            return line.rstrip(b'\r\n')
+        data = await reader.read(1024)
+        if not data:
+            raise asyncio.IncompleteReadError(b'', 1)
+        return data
 
-    # 启动停止服务器的线程
-    stop_thread = threading.Thread(target=stop_server)
-    stop_thread.start()
+    def _encode(self, reply):
+        if self.framing == 'length':
+            return FRAME_HEADER.pack(len(reply)) + reply
+        if self.framing == 'line':
+            return reply + b'\n'
+        return reply
 
-    # 等待客户端连接
-    while is_running:
+    async def _handle(self, reader, writer):
+        if self.connection_count >= self.max_connections:
+            writer.close()
+            return
+        self.connection_count += 1
+        self._writers.add(writer)
+        self._tasks.add(asyncio.current_task())
+        addr = writer.get_extra_info('peername')
         try:
-            # 接受客户端连接，返回连接套接字和客户端地址
-            client_socket, addr = server_socket.accept()
-            print(f"与 {addr} 建立连接")
-            # 创建一个新的线程来处理客户端连接
-            client_handler = threading.Thread(
-                target=handle_client_connection,
-                args=(client_socket,)
-            )
-            client_handler.start()
-        except socket.timeout:
-            # 如果发生超时，则继续等待连接
-            continue
+            while True:
+                payload = await asyncio.wait_for(self._read_message(reader), self.idle_timeout)
+                async with self._slots:
+                    reply = await self.loop.run_in_executor(self._executor, self.handler, payload)
+                if reply is not None:
+                    writer.write(self._encode(reply))
+                    await writer.drain()
+                if self.framing == 'raw':
+                    break
+        except (asyncio.IncompleteReadError, asyncio.TimeoutError, asyncio.LimitOverrunError,
+                ConnectionError, ValueError):
+            pass
         except Exception as e:
-            # 捕获其他异常并打印错误消息
-            print(f"服务器错误: {e}")
-            break
+            print(f"处理 {addr} 时出错: {e}")
+        finally:
+            self.connection_count -= 1
+            self._writers.discard(writer)
+            self._tasks.discard(asyncio.current_task())
+            writer.close()
+
+    async def serve(self):
+        """运行直到 stop() 被调用"""
+        self.loop = asyncio.get_running_loop()
+        self._stop_event = asyncio.Event()
+        self._slots = asyncio.Semaphore(self.workers * self.queue_factor)
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="tcp-handler")
+        self._server = await asyncio.start_server(
+            self._handle, self.host, self.port, backlog=self.backlog, reuse_address=True,
+            limit=max(self.max_frame, 2 ** 16))
+        self.port = self._server.sockets[0].getsockname()[1]
+        self.started.set()
+        try:
+            await self._stop_event.wait()
+        finally:
+            self._server.close()
+            for writer in list(self._writers):
+                writer.close()
+            # 等待各连接处理协程读到EOF后自行退出
+            if self._tasks:
+                await asyncio.wait(list(self._tasks), timeout=5)
+            await self._server.wait_closed()
+            self._executor.shutdown(wait=False)
+            self.started.clear()
+
+    def stop(self):
+        """线程安全地停止服务器"""
+        if self.loop is not None and not self.loop.is_closed():
+            self.loop.call_soon_threadsafe(self._stop_event.set)
 
-    # 关闭服务器套接字
-    server_socket.close()
+def tcp_server(port=12345, framing='raw'):
+    server = FramedTcpServer(port=port, framing=framing)
+
+    # 创建一个线程来等待停止命令
+    def stop_server():
+        server.started.wait()
+        input("按Enter键停止服务器...\n")
+        server.stop()
+
+    threading.Thread(target=stop_server, daemon=True).start()
+    print(f"服务器正在监听端口 {port} (分帧方式: {framing})")
+    try:
+        asyncio.run(server.serve())
+    except KeyboardInterrupt:
+        pass
     print("服务器已关闭")
 
 if __name__ == "__main__":
-    tcp_server()
\ No newline at end of file
+    import sys
+    # 用法: python TCP服务器.py [raw|length|line]
+    tcp_server(framing=sys.argv[1] if len(sys.argv) > 1 else 'raw')
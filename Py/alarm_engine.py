@@ -0,0 +1,137 @@
+# alarm_engine.py
+"""向量化报警引擎
+
+报警定义(设备, 点, 类型, 限值, 回差, 延时)加载后编译为按列存放的NumPy数组,
+每批轮询结果只做一次向量运算就得到全部规则的状态; 只有状态变化(报警/恢复)时
+才生成事件和报警文字, 规则数量增加到上千条时每次轮询的开销基本不变。
+
+类型:
+  high - 值 > limit 报警, 值 <= limit - hysteresis 恢复
+  low  - 值 < limit 报警, 值 >= limit + hysteresis 恢复
+  rate - |变化率(每秒)| > limit 报警, <= limit - hysteresis 恢复
+delay: 条件需要连续保持 delay 秒才报警(恢复立即生效)
+每条规则有报警文字 message 和恢复文字 clear_message, 事件的 active 区分报警(True)和恢复(False)。
+
+    engine = AlarmEngine(load_rules('alarms.json'))
+    for event in engine.evaluate({'gh1': {'temperature': 31.2, 'humidity': 55.0}}):
+        print(event.message)
+"""
+import json
+import time
+from collections import namedtuple
+import numpy as np
+
+ALARM_TYPES = ('high', 'low', 'rate')
+
+
+class AlarmRule(namedtuple('AlarmRule', 'device tag type limit hysteresis delay message clear_message')):
+    """一条报警定义; message/clear_message 可使用 {device} {tag} {value} {limit} 占位符"""
+    def __new__(cls, device, tag, type, limit, hysteresis=0.0, delay=0.0, message=None, clear_message=None):
+        if type not in ALARM_TYPES:
+            raise ValueError(f"未知的报警类型: {type}")
+        if hysteresis < 0 or delay < 0:
+            raise ValueError(f"回差和延时不能为负: {device}.{tag}")
+        if message is None:
+            message = {'high': '{device} {tag} 过高: {value:.2f} > {limit}',
+                       'low': '{device} {tag} 过低: {value:.2f} < {limit}',
+                       'rate': '{device} {tag} 变化过快: {value:.2f}/s > {limit}/s'}[type]
+        if clear_message is None:
+            clear_message = {'high': '{device} {tag} 过高已恢复: {value:.2f}',
+                             'low': '{device} {tag} 过低已恢复: {value:.2f}',
+                             'rate': '{device} {tag} 变化过快已恢复: {value:.2f}/s'}[type]
+        return super().__new__(cls, device, tag, type, limit, hysteresis, delay, message, clear_message)
+
+    @classmethod
+    def from_dict(cls, config):
+        return cls(config.get('device', ''), config['tag'], config['type'], config['limit'],
+                   config.get('hysteresis', 0.0), config.get('delay', 0.0), config.get('message'),
+                   config.get('clear_message'))
+
+
+# 状态变化事件: active=True 报警, False 恢复; value 为触发时的值(rate类型为变化率)
+AlarmEvent = namedtuple('AlarmEvent', 'rule active value time message')
+
+
+def load_rules(path):
+    """从JSON文件读取报警定义: [{"device", "tag", "type", "limit", "hysteresis", "delay", "message",
+    "clear_message"}, ...]"""
+    with open(path, encoding='utf-8') as f:
+        return [AlarmRule.from_dict(d) for d in json.load(f)]
+
+
+class AlarmEngine:
+    """编译后的报警规则集
+
+    evaluate() 的输入为 {设备: {点: 值}}, 未出现在本批结果中的点保持原状态。
+    """
+    def __init__(self, rules=()):
+        self.rules = list(rules)
+        self.points = {}  # (设备, 点) -> 列号
+        for rule in self.rules:
+            self.points.setdefault((rule.device, rule.tag), len(self.points))
+        n = len(self.rules)
+        self._column = np.array([self.points[(r.device, r.tag)] for r in self.rules], dtype=np.intp)
+        # high 与 rate 直接比较, low 取负后同样按"超过限值"处理
+        self._sign = np.array([-1.0 if r.type == 'low' else 1.0 for r in self.rules])
+        self._is_rate = np.array([r.type == 'rate' for r in self.rules], dtype=bool)
+        self._limit = np.array([r.limit for r in self.rules], dtype=float) * self._sign
+        self._clear = self._limit - np.array([r.hysteresis for r in self.rules], dtype=float)
+        self._delay = np.array([r.delay for r in self.rules], dtype=float)
+        self.active = np.zeros(n, dtype=bool)
+        self._pending = np.full(n, np.nan)  # 条件开始成立的时间
+        self._values = np.full(len(self.points), np.nan)
+        self._previous = np.full(len(self.points), np.nan)
+        self._previous_time = np.full(len(self.points), np.nan)
+
+    def evaluate(self, samples, now=None):
+        """评估一批轮询结果, 返回状态变化事件列表"""
+        now = time.time() if now is None else now
+        values = self._values
+        values.fill(np.nan)
+        points = self.points
+        for device, tags in samples.items():
+            for tag, value in tags.items():
+                column = points.get((device, tag))
+                if column is not None and value is not None:
+                    values[column] = value
+        return self.evaluate_array(values, now)
+
+    def evaluate_array(self, values, now):
+        """values 为按 self.points 列号排列的数组(NaN表示本批没有该点)"""
+        present = ~np.isnan(values)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            rate = np.abs((values - self._previous) / (now - self._previous_time))
+        self._previous = np.where(present, values, self._previous)
+        self._previous_time = np.where(present, now, self._previous_time)
+
+        x = np.where(self._is_rate, rate[self._column], values[self._column] * self._sign)
+        valid = ~np.isnan(x)
+        active = self.active
+        with np.errstate(invalid='ignore'):
+            condition = np.where(active, x > self._clear, x > self._limit)
+        # 延时: 记录条件开始成立的时间, 条件中断时清除
+        start = valid & condition & ~active & np.isnan(self._pending)
+        self._pending[start] = now
+        self._pending[valid & ~condition] = np.nan
+        raised = valid & condition & ~active & (now - self._pending >= self._delay)
+        cleared = valid & ~condition & active
+        if not (raised.any() or cleared.any()):
+            return []
+        active[raised] = True
+        active[cleared] = False
+        self._pending[raised] = np.nan
+        events = []
+        for index in np.flatnonzero(raised | cleared):
+            events.append(self._event(int(index), bool(active[index]), x[index], now))
+        return events
+
+    def _event(self, index, is_active, x, now):
+        rule = self.rules[index]
+        value = float(x if rule.type == 'rate' else x * self._sign[index])
+        template = rule.message if is_active else rule.clear_message
+        text = template.format(device=rule.device, tag=rule.tag, value=value, limit=rule.limit)
+        return AlarmEvent(rule, is_active, value, now, text)
+
+    def active_alarms(self):
+        """当前处于报警状态的规则"""
+        return [self.rules[i] for i in np.flatnonzero(self.active)]
@@ -0,0 +1,102 @@
+# async_client.py
+"""基于asyncio的轻量Modbus TCP主站客户端
+
+请求/响应的编解码复用 pymodbus 的消息类, 只自己处理MBAP帧和连接;
+读函数与同步客户端同名, 返回的响应对象同样有 isError()/registers/bits。
+"""
+import asyncio
+import struct
+from pymodbus.factory import ClientDecoder
+from pymodbus.bit_read_message import ReadCoilsRequest, ReadDiscreteInputsRequest
+from pymodbus.register_read_message import ReadHoldingRegistersRequest, ReadInputRegistersRequest
+from pymodbus.register_write_message import WriteSingleRegisterRequest, WriteMultipleRegistersRequest
+from pymodbus.bit_write_message import WriteSingleCoilRequest
+from async_server import check_mbap
+
+MBAP_HEADER = struct.Struct('>HHHB')
+
+
+class AsyncModbusClient:
+    """单连接异步客户端, 同一连接上的请求按顺序执行"""
+    def __init__(self, host, port=502, unit=1, timeout=3.0):
+        self.host = host
+        self.port = port
+        self.unit = unit
+        self.timeout = timeout
+        self.decoder = ClientDecoder()
+        self._reader = None
+        self._writer = None
+        self._transaction = 0
+        self._lock = asyncio.Lock()
+
+    @property
+    def connected(self):
+        return self._writer is not None and not self._writer.is_closing()
+
+    async def connect(self):
+        if not self.connected:
+            self._reader, self._writer = await asyncio.wait_for(
+                asyncio.open_connection(self.host, self.port), self.timeout)
+        return True
+
+    async def close(self):
+        writer, self._writer, self._reader = self._writer, None, None
+        if writer is not None:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except (ConnectionError, OSError):
+                pass
+
+    async def transact(self, unit, pdu):
+        """发送原始PDU(功能码+数据)并返回响应PDU; 连接、超时或帧头错误时关闭连接并抛出异常"""
+        async with self._lock:
+            await self.connect()
+            self._transaction = (self._transaction + 1) & 0xFFFF
+            self._writer.write(MBAP_HEADER.pack(self._transaction, 0, len(pdu) + 1, unit) + pdu)
+            try:
+                await self._writer.drain()
+                while True:
+                    header = await asyncio.wait_for(self._reader.readexactly(MBAP_HEADER.size), self.timeout)
+                    transaction_id, protocol_id, length, _ = MBAP_HEADER.unpack(header)
+                    check_mbap(protocol_id, length)
+                    response = await asyncio.wait_for(self._reader.readexactly(length - 1), self.timeout)
+                    if transaction_id == self._transaction:
+                        return response
+                    # 丢弃超时请求迟到的响应
+            except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError, OSError, ValueError):
+                await self.close()  # ValueError: 响应帧头错误, 连接已无法同步
+                raise
+
+    async def execute(self, request):
+        """发送请求对象并返回解码后的响应"""
+        unit = request.unit_id if request.unit_id is not None else self.unit
+        pdu = await self.transact(unit, struct.pack('>B', request.function_code) + request.encode())
+        response = self.decoder.decode(pdu)
+        if response is None:
+            raise ValueError("无法解析的响应")
+        return response
+
+    def _unit(self, unit):
+        return self.unit if unit is None else unit
+
+    async def read_coils(self, address, count=1, unit=None):
+        return await self.execute(ReadCoilsRequest(address, count, unit=self._unit(unit)))
+
+    async def read_discrete_inputs(self, address, count=1, unit=None):
+        return await self.execute(ReadDiscreteInputsRequest(address, count, unit=self._unit(unit)))
+
+    async def read_holding_registers(self, address, count=1, unit=None):
+        return await self.execute(ReadHoldingRegistersRequest(address, count, unit=self._unit(unit)))
+
+    async def read_input_registers(self, address, count=1, unit=None):
+        return await self.execute(ReadInputRegistersRequest(address, count, unit=self._unit(unit)))
+
+    async def write_coil(self, address, value, unit=None):
+        return await self.execute(WriteSingleCoilRequest(address, value, unit=self._unit(unit)))
+
+    async def write_register(self, address, value, unit=None):
+        return await self.execute(WriteSingleRegisterRequest(address, value, unit=self._unit(unit)))
+
+    async def write_registers(self, address, values, unit=None):
+        return await self.execute(WriteMultipleRegistersRequest(address, values, unit=self._unit(unit)))
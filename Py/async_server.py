@@ -0,0 +1,194 @@
+# async_server.py
+"""基于asyncio的Modbus TCP从站
+
+单线程事件循环同时服务大量主站连接, 数据块和日志上下文与同步服务器共用。
+事件循环通过 loop 属性暴露, GUI 可用 stop()/submit() 跨线程控制服务器。
+"""
+import asyncio
+import struct
+import threading
+import time
+from pymodbus.factory import ServerDecoder
+from pymodbus.exceptions import NoSuchSlaveException
+from pymodbus.pdu import ExceptionResponse, ModbusExceptions as merror
+
+MBAP_HEADER = struct.Struct('>HHHB')  # 事务ID, 协议ID, 长度, 从站ID
+# 长度字段 = 从站ID(1字节) + PDU(功能码 + 最多252字节数据)
+MIN_MBAP_LENGTH = 2
+MAX_MBAP_LENGTH = 254
+
+
+def check_mbap(protocol_id, length):
+    """校验MBAP头, 不是Modbus帧时抛出ValueError(调用方应断开连接)"""
+    if protocol_id != 0:
+        raise ValueError(f"协议ID错误: {protocol_id}")
+    if not MIN_MBAP_LENGTH <= length <= MAX_MBAP_LENGTH:
+        raise ValueError(f"MBAP长度错误: {length}")
+
+
+class AsyncModbusServer:
+    """asyncio Modbus TCP 从站
+
+    context: ModbusServerContext; 若上下文可调用(如LoggingServerContext),
+             请求通过 context(request) 执行, 以便记录请求日志;
+             上下文的 metrics 属性(ServerMetrics)不为None时按收发的帧长度记录指标
+    max_connections: 同时保持的最大连接数, 超出的新连接直接关闭
+    idle_timeout: 连接空闲多少秒后断开, None表示不限
+    reuse_port: 设置SO_REUSEPORT, 多个进程可监听同一端口由内核分配连接
+    """
+    def __init__(self, context, address, max_connections=10000, idle_timeout=None, backlog=1024,
+                 reuse_port=False):
+        self.context = context
+        self.metrics = getattr(context, 'metrics', None)
+        self.address = address
+        self.max_connections = max_connections
+        self.idle_timeout = idle_timeout
+        self.backlog = backlog
+        self.reuse_port = reuse_port
+        self.decoder = ServerDecoder()
+        self.loop = None
+        self.started = threading.Event()
+        self.error = None
+        self._server = None
+        self._stop_event = None
+        self._stop_requested = False
+        self._writers = set()
+        self._tasks = set()
+
+    @property
+    def connection_count(self):
+        return len(self._writers)
+
+    @property
+    def port(self):
+        """实际监听的端口(address中端口为0时由系统分配)"""
+        return self._server.sockets[0].getsockname()[1]
+
+    def execute(self, request):
+        """执行请求并返回响应; 返回None表示不应答"""
+        try:
+            if callable(self.context):
+                return self.context(request)
+            return request.execute(self.context[request.unit_id])
+        except NoSuchSlaveException:
+            return request.doException(merror.GatewayNoResponse)
+        except Exception as e:
+            print(f"请求处理错误: {e}")
+            return request.doException(merror.SlaveFailure)
+
+    async def _read_frame(self, reader):
+        header = await reader.readexactly(MBAP_HEADER.size)
+        transaction_id, protocol_id, length, unit_id = MBAP_HEADER.unpack(header)
+        check_mbap(protocol_id, length)
+        pdu = await reader.readexactly(length - 1)
+        return transaction_id, protocol_id, unit_id, pdu
+
+    @staticmethod
+    def _write(writer, transaction_id, protocol_id, unit_id, response):
+        """发送响应帧, 返回PDU"""
+        body = struct.pack('>B', response.function_code) + response.encode()
+        writer.write(MBAP_HEADER.pack(transaction_id, protocol_id, len(body) + 1, unit_id) + body)
+        return body
+
+    async def _handle(self, reader, writer):
+        if len(self._writers) >= self.max_connections:
+            writer.close()
+            return
+        self._writers.add(writer)
+        self._tasks.add(asyncio.current_task())
+        try:
+            while True:
+                if self.idle_timeout:
+                    frame = await asyncio.wait_for(self._read_frame(reader), self.idle_timeout)
+                else:
+                    frame = await self._read_frame(reader)
+                transaction_id, protocol_id, unit_id, pdu = frame
+                try:
+                    request = self.decoder.decode(pdu)
+                except Exception:
+                    # MBAP头正确但PDU格式错误(如数据不完整): 回复非法数据值, 连接仍然同步
+                    body = self._write(writer, transaction_id, protocol_id, unit_id,
+                                       ExceptionResponse(pdu[0], merror.IllegalValue))
+                    if self.metrics is not None:
+                        self.metrics.observe(pdu[0], unit_id, 0.0, True, len(pdu), len(body))
+                    await writer.drain()
+                    continue
+                if request is None:
+                    continue
+                request.transaction_id = transaction_id
+                request.protocol_id = protocol_id
+                request.unit_id = unit_id
+                metrics = self.metrics
+                start = time.perf_counter() if metrics is not None else 0.0
+                response = self.execute(request)
+                elapsed = time.perf_counter() - start
+                if response is None:
+                    if metrics is not None:
+                        metrics.observe(request.function_code, unit_id, elapsed, True, len(pdu))
+                    continue
+                body = self._write(writer, transaction_id, protocol_id, unit_id, response)
+                if metrics is not None:
+                    metrics.observe(request.function_code, unit_id, elapsed, response.function_code > 0x80,
+                                    len(pdu), len(body))
+                await writer.drain()
+        except (asyncio.IncompleteReadError, asyncio.TimeoutError, ConnectionError):
+            pass
+        except ValueError:
+            pass  # 非法帧, 无法再同步, 直接断开
+        finally:
+            self._writers.discard(writer)
+            self._tasks.discard(asyncio.current_task())
+            writer.close()
+
+    async def serve(self):
+        """在当前事件循环中运行, 直到 stop() 被调用"""
+        self.loop = asyncio.get_running_loop()
+        self._stop_event = asyncio.Event()
+        if self._stop_requested:
+            self._stop_event.set()
+        host, port = self.address
+        self._server = await asyncio.start_server(
+            self._handle, host, port, backlog=self.backlog, reuse_address=True,
+            reuse_port=self.reuse_port or None)
+        self.started.set()
+        try:
+            await self._stop_event.wait()
+        finally:
+            self._server.close()
+            for writer in list(self._writers):
+                writer.close()
+            # 等待各连接处理协程读到EOF后自行退出
+            if self._tasks:
+                await asyncio.wait(list(self._tasks), timeout=5)
+            await self._server.wait_closed()
+            self.started.clear()
+
+    def serve_forever(self):
+        """在当前线程新建事件循环并阻塞运行(供QThread或后台线程调用)"""
+        try:
+            asyncio.run(self.serve())
+        except Exception as e:
+            self.error = e
+            self.started.set()  # 唤醒等待启动的线程
+            raise
+
+    def start_in_thread(self):
+        """在后台线程中运行服务器, 等到端口监听成功后返回线程对象"""
+        thread = threading.Thread(target=self.serve_forever, name="modbus-asyncio", daemon=True)
+        thread.start()
+        # 启动前已调用 stop() 时服务器可能在这里等待之前就已退出并清除 started
+        while not self.started.wait(0.05) and thread.is_alive():
+            pass
+        if self.error is not None:
+            raise self.error
+        return thread
+
+    def submit(self, coro):
+        """从其他线程向服务器事件循环提交协程, 返回concurrent.futures.Future"""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def stop(self):
+        """线程安全地停止服务器(在事件循环启动前调用也有效)"""
+        self._stop_requested = True
+        if self.loop is not None and self._stop_event is not None and not self.loop.is_closed():
+            self.loop.call_soon_threadsafe(self._stop_event.set)
@@ -0,0 +1,198 @@
+# benchmark.py
+"""从站吞吐量与延迟基准测试
+
+在子进程中以本机临时端口启动模拟从站(asyncio或同步服务器, 可带请求日志),
+用1到N个并发异步主站按功能码比例发请求, 统计每秒请求数和 p50/p99/p999 延迟。
+结果保存为JSON基线, 用 --compare 与旧基线比较, 退步超过阈值时返回非零退出码。
+
+    python benchmark.py --clients 1,8,32 --duration 5 --mix read_holding_registers:8,write_registers:2
+    python benchmark.py --save baseline.json
+    python benchmark.py --compare baseline.json
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import platform
+import random
+import sys
+import time
+from async_client import AsyncModbusClient
+
+DEFAULT_MIX = 'read_holding_registers:6,read_input_registers:2,write_registers:1,read_coils:1'
+
+# 功能名 -> 生成客户端调用的函数 (client, 地址, 批量大小)
+OPERATIONS = {
+    'read_holding_registers': lambda c, a, n: c.read_holding_registers(a, n),
+    'read_input_registers': lambda c, a, n: c.read_input_registers(a, n),
+    'read_coils': lambda c, a, n: c.read_coils(a, n),
+    'read_discrete_inputs': lambda c, a, n: c.read_discrete_inputs(a, n),
+    'write_register': lambda c, a, n: c.write_register(a, a & 0xFFFF),
+    'write_registers': lambda c, a, n: c.write_registers(a, [a & 0xFFFF] * n),
+}
+
+
+def parse_mix(text):
+    """'read_holding_registers:8,write_register:2' -> [(功能名, 权重), ...]"""
+    mix = []
+    for item in text.split(','):
+        name, _, weight = item.strip().partition(':')
+        if name not in OPERATIONS:
+            raise ValueError(f"未知的功能: {name}")
+        mix.append((name, float(weight or 1)))
+    return mix
+
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(p / 100.0 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def _serve(mode, logged, port_queue):
+    """子进程: 启动模拟从站并把实际端口报告给父进程"""
+    from register_store import RegisterStore
+    from modbus_slave_simulator import build_server_context
+    from request_log import RequestLogger
+    logger = RequestLogger(sink=lambda lines: None).start() if logged else None
+    context = build_server_context(RegisterStore(), logger=logger)
+    if mode == 'async':
+        from async_server import AsyncModbusServer
+        server = AsyncModbusServer(context, ('127.0.0.1', 0))
+        server.start_in_thread()
+        server.started.wait()
+        port_queue.put(server.port)
+        while True:
+            time.sleep(3600)  # 进程由父进程终止
+    else:
+        from pymodbus.server.sync import ModbusTcpServer
+        from modbus_slave_simulator import ContextRequestHandler, LengthSocketFramer
+        # 与 run_slave 相同的处理器和分帧器, 请求经由 context(request) 执行并记录日志
+        server = ModbusTcpServer(context, address=('127.0.0.1', 0), handler=ContextRequestHandler,
+                                 framer=LengthSocketFramer)
+        port_queue.put(server.socket.getsockname()[1])
+        server.serve_forever()
+
+
+def start_server(mode='async', logged=True):
+    """返回 (子进程, 端口)"""
+    ctx = multiprocessing.get_context('spawn')
+    port_queue = ctx.Queue()
+    process = ctx.Process(target=_serve, args=(mode, logged, port_queue), daemon=True)
+    process.start()
+    return process, port_queue.get(timeout=30)
+
+
+async def _client_loop(port, mix, batch, persistent, deadline, latencies, errors, seed):
+    rng = random.Random(seed)
+    names = [name for name, _ in mix]
+    weights = [weight for _, weight in mix]
+    client = AsyncModbusClient('127.0.0.1', port, unit=0, timeout=5.0)
+    try:
+        while time.perf_counter() < deadline:
+            operation = OPERATIONS[rng.choices(names, weights)[0]]
+            address = rng.randrange(0, 1000)
+            begin = time.perf_counter()
+            try:
+                response = await operation(client, address, batch)
+                if response.isError():
+                    errors.append(1)
+            except (asyncio.TimeoutError, asyncio.IncompleteReadError, OSError, ValueError):
+                errors.append(1)
+            latencies.append(time.perf_counter() - begin)
+            if not persistent:
+                await client.close()
+    finally:
+        await client.close()
+
+
+async def run_load(port, clients, duration, mix, batch=10, persistent=True):
+    """以clients个并发连接压测duration秒, 返回结果字典"""
+    latencies, errors = [], []
+    start = time.perf_counter()
+    deadline = start + duration
+    await asyncio.gather(*(_client_loop(port, mix, batch, persistent, deadline, latencies, errors, i)
+                           for i in range(clients)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        'clients': clients,
+        'requests': len(latencies),
+        'errors': len(errors),
+        'rps': round(len(latencies) / elapsed, 1),
+        'p50_ms': round(percentile(latencies, 50) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 3),
+        'p999_ms': round(percentile(latencies, 99.9) * 1000, 3),
+    }
+
+
+def compare(results, baseline, tolerance):
+    """与基线逐项比较; 返回退步描述列表"""
+    old = {(r['scenario'], r['clients']): r for r in baseline['results']}
+    regressions = []
+    for r in results:
+        base = old.get((r['scenario'], r['clients']))
+        if base is None:
+            continue
+        if r['rps'] < base['rps'] * (1 - tolerance):
+            regressions.append(f"{r['scenario']} x{r['clients']}: rps {base['rps']} -> {r['rps']}")
+        if r['p99_ms'] > base['p99_ms'] * (1 + tolerance):
+            regressions.append(f"{r['scenario']} x{r['clients']}: p99 {base['p99_ms']}ms -> {r['p99_ms']}ms")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Modbus从站基准测试')
+    parser.add_argument('--server', choices=['async', 'sync'], default='async')
+    parser.add_argument('--no-log', action='store_true', help='不挂接请求日志')
+    parser.add_argument('--clients', default='1,8,32', help='并发客户端数, 逗号分隔')
+    parser.add_argument('--duration', type=float, default=3.0, help='每组测试秒数')
+    parser.add_argument('--mix', default=DEFAULT_MIX, help='功能:权重, 逗号分隔')
+    parser.add_argument('--batch', type=int, default=10, help='每次读写的寄存器数')
+    parser.add_argument('--reconnect', action='store_true', help='每个请求重新建立连接')
+    parser.add_argument('--save', help='保存结果为基线JSON')
+    parser.add_argument('--compare', help='与基线JSON比较')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='允许的退步比例')
+    args = parser.parse_args(argv)
+
+    mix = parse_mix(args.mix)
+    scenario = f"{args.server}{'' if args.no_log else '+log'}{'+reconnect' if args.reconnect else ''}"
+    process, port = start_server(args.server, not args.no_log)
+    results = []
+    try:
+        for clients in (int(c) for c in args.clients.split(',')):
+            result = asyncio.run(run_load(port, clients, args.duration, mix, args.batch, not args.reconnect))
+            result['scenario'] = scenario
+            results.append(result)
+            print(f"{scenario:>20} 客户端 {clients:>4}: {result['rps']:>9.1f} 请求/秒  "
+                  f"p50 {result['p50_ms']:.3f}ms  p99 {result['p99_ms']:.3f}ms  "
+                  f"p999 {result['p999_ms']:.3f}ms  错误 {result['errors']}")
+    finally:
+        process.terminate()
+        process.join()
+
+    report = {
+        'timestamp': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'config': {'mix': args.mix, 'batch': args.batch, 'duration': args.duration},
+        'results': results,
+    }
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"基线已保存: {args.save}")
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for line in regressions:
+            print(f"退步: {line}")
+        if regressions:
+            return 1
+        print("与基线相比无明显退步")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
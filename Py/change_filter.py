@@ -0,0 +1,75 @@
+# change_filter.py
+"""变化上报(COV)过滤
+
+每次轮询的结果先经过过滤器, 只有超出死区的点才上报:
+  - 绝对死区: |新值 - 上次上报值| > deadband
+  - 百分比死区: 写成字符串 '2%', 相对上次上报值的绝对值
+  - bool和整数以外的类型不做死区比较, 只要不相等就上报
+  - heartbeat 秒内没有上报过的点即使没有变化也重新上报一次
+列表值(count>1)任一元素超出死区时整个列表上报。
+
+    cov = ChangeFilter({'temperature': 0.1, 'speed': '2%'}, heartbeat=30)
+    changes = cov.update(values)   # {名称: 值}, 只含需要上报的点
+"""
+import copy
+import time
+
+
+def parse_deadband(deadband):
+    """数字或 '2%' -> (绝对死区, 比例死区)"""
+    if isinstance(deadband, str) and deadband.strip().endswith('%'):
+        return 0.0, float(deadband.strip()[:-1]) / 100.0
+    return float(deadband or 0), 0.0
+
+
+class ChangeFilter:
+    """按点记录上次上报的值和时间
+
+    deadbands: {名称: 死区}, 未列出的点使用 default_deadband(默认0, 即任何变化都上报)
+    heartbeat: 最长上报间隔(秒), None表示只在变化时上报
+    """
+    def __init__(self, deadbands=None, default_deadband=0, heartbeat=None):
+        self.deadbands = {name: parse_deadband(d) for name, d in (deadbands or {}).items()}
+        self.default_deadband = parse_deadband(default_deadband)
+        self.heartbeat = heartbeat
+        self.last = {}  # 名称 -> (上报值, 上报时间)
+        self.stats = {'polled': 0, 'reported': 0}
+
+    def set_deadband(self, name, deadband):
+        self.deadbands[name] = parse_deadband(deadband)
+
+    def forget(self, name):
+        """删除点的记录, 下次出现时一定上报"""
+        self.last.pop(name, None)
+
+    @staticmethod
+    def _exceeds(old, new, absolute, ratio):
+        if isinstance(new, bool) or not isinstance(new, (int, float)) or isinstance(old, bool):
+            return old != new
+        limit = max(absolute, abs(old) * ratio)
+        return abs(new - old) > limit if limit > 0 else new != old
+
+    def changed(self, name, value):
+        previous = self.last.get(name)
+        if previous is None:
+            return True
+        old = previous[0]
+        absolute, ratio = self.deadbands.get(name, self.default_deadband)
+        if isinstance(value, list):
+            return (not isinstance(old, list) or len(old) != len(value)
+                    or any(self._exceeds(o, v, absolute, ratio) for o, v in zip(old, value)))
+        return self._exceeds(old, value, absolute, ratio)
+
+    def update(self, values, now=None):
+        """过滤一次轮询结果, 返回需要上报的 {名称: 值}"""
+        now = time.monotonic() if now is None else now
+        heartbeat = self.heartbeat
+        changes = {}
+        for name, value in values.items():
+            if self.changed(name, value) or (heartbeat is not None and now - self.last[name][1] >= heartbeat):
+                value = copy.copy(value)  # 列表复制一份, 避免之后被原地修改
+                self.last[name] = (value, now)
+                changes[name] = value
+        self.stats['polled'] += len(values)
+        self.stats['reported'] += len(changes)
+        return changes
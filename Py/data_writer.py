@@ -0,0 +1,196 @@
+# data_writer.py
+"""缓冲写入的采样数据文件
+
+行先缓存在内存里, 攒够条数或超过时间间隔才写盘; 文件可按大小或按天轮转。
+除CSV外提供定长记录的二进制格式, read_range 可以按时间范围流式读取而不载入整个文件。
+
+轮转时文件名为 {名称}-{YYYYMMDD}[-{序号}]{扩展名}, 不轮转时直接使用给定路径。
+"""
+import csv
+import glob
+import json
+import os
+import struct
+import time
+from datetime import datetime
+
+BINARY_MAGIC = b'MBTS'
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+class DataWriter:
+    """缓冲、轮转的数据写入器
+
+    path: 基础文件路径, 如 greenhouse_data.csv / greenhouse_data.bin
+    columns: 数据列名(时间戳列之外)
+    fmt: 'csv' 或 'binary'(每行 float64 时间戳 + float32 数值)
+    max_rows / flush_interval: 缓冲条数或秒数达到其一即写盘
+    max_bytes: 单个文件大小上限, None表示不按大小轮转
+    rotate_daily: 是否每天换一个文件
+    """
+    def __init__(self, path, columns, fmt='csv', max_rows=100, flush_interval=5.0,
+                 max_bytes=None, rotate_daily=False):
+        if fmt not in ('csv', 'binary'):
+            raise ValueError(f"未知的文件格式: {fmt}")
+        self.path = path
+        self.columns = tuple(columns)
+        self.fmt = fmt
+        self.max_rows = max_rows
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self.rotate_daily = rotate_daily
+        self.record = struct.Struct('<d' + 'f' * len(self.columns))
+        self._rows = []
+        self._last_flush = time.monotonic()
+        self._file = None
+        self._file_day = None
+        self._file_index = 0
+
+    def write(self, timestamp, values):
+        """追加一行; timestamp 为epoch秒"""
+        self._rows.append((timestamp, tuple(values)))
+        if len(self._rows) >= self.max_rows or time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        """把缓冲的行写入文件(必要时轮转)"""
+        self._last_flush = time.monotonic()
+        if not self._rows:
+            return
+        rows, self._rows = self._rows, []
+        start = 0
+        for i, (timestamp, _) in enumerate(rows):
+            day = datetime.fromtimestamp(timestamp).strftime("%Y%m%d")
+            if self._file is None or (self.rotate_daily and day != self._file_day):
+                self._write_rows(rows[start:i])
+                start = i
+                self._open(day)
+        self._write_rows(rows[start:])
+        self._file.flush()
+        if self.max_bytes and self._file.tell() >= self.max_bytes:
+            self._close_file()
+            self._file_index += 1
+
+    def close(self):
+        self.flush()
+        self._close_file()
+
+    def _close_file(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _target_path(self, day):
+        if not self.rotate_daily and not self.max_bytes:
+            return self.path
+        stem, ext = os.path.splitext(self.path)
+        name = f"{stem}-{day}"
+        if self._file_index:
+            name += f"-{self._file_index}"
+        return name + ext
+
+    def _open(self, day):
+        self._close_file()
+        if day != self._file_day:
+            self._file_index = 0
+        self._file_day = day
+        path = self._target_path(day)
+        # 同一天重启时跳过已经写满的文件
+        while self.max_bytes and os.path.exists(path) and os.path.getsize(path) >= self.max_bytes:
+            self._file_index += 1
+            path = self._target_path(day)
+        new_file = not os.path.exists(path) or os.path.getsize(path) == 0
+        if self.fmt == 'csv':
+            self._file = open(path, 'a', newline='')
+        else:
+            self._file = open(path, 'ab')
+            if new_file:
+                header = json.dumps({'columns': self.columns}).encode()
+                self._file.write(BINARY_MAGIC + struct.pack('<H', len(header)) + header)
+
+    def _write_rows(self, rows):
+        if not rows:
+            return
+        if self.fmt == 'csv':
+            writer = csv.writer(self._file)
+            writer.writerows([datetime.fromtimestamp(ts).strftime(TIME_FORMAT), *values]
+                             for ts, values in rows)
+        else:
+            pack = self.record.pack
+            self._file.write(b''.join(pack(ts, *values) for ts, values in rows))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def data_files(path):
+    """按时间顺序列出基础路径对应的所有数据文件(含轮转文件)"""
+    stem, ext = os.path.splitext(path)
+    files = glob.glob(f"{glob.escape(stem)}-*{ext}")
+
+    def order(name):
+        parts = name[len(stem) + 1:-len(ext) or None].split('-')
+        return parts[0], int(parts[1]) if len(parts) > 1 and parts[1].isdigit() else 0
+    files.sort(key=order)
+    if os.path.exists(path):
+        files.insert(0, path)
+    return files
+
+
+def _read_binary(path, start, end, chunk_rows=4096):
+    with open(path, 'rb') as f:
+        if f.read(4) != BINARY_MAGIC:
+            raise ValueError(f"不是二进制数据文件: {path}")
+        header_len, = struct.unpack('<H', f.read(2))
+        columns = json.loads(f.read(header_len))['columns']
+        record = struct.Struct('<d' + 'f' * len(columns))
+        data_start = f.tell()
+        total = (os.fstat(f.fileno()).st_size - data_start) // record.size
+
+        def timestamp_at(index):
+            f.seek(data_start + index * record.size)
+            return struct.unpack('<d', f.read(8))[0]
+
+        # 记录按时间追加, 二分查找起点
+        lo, hi = 0, total
+        if start is not None:
+            while lo < hi:
+                mid = (lo + hi) // 2
+                if timestamp_at(mid) < start:
+                    lo = mid + 1
+                else:
+                    hi = mid
+        f.seek(data_start + lo * record.size)
+        while True:
+            chunk = f.read(record.size * chunk_rows)
+            if len(chunk) < record.size:
+                return
+            for row in record.iter_unpack(chunk[:len(chunk) - len(chunk) % record.size]):
+                if end is not None and row[0] > end:
+                    return
+                yield row[0], row[1:]
+
+
+def _read_csv(path, start, end):
+    with open(path, newline='') as f:
+        for row in csv.reader(f):
+            if not row:
+                continue
+            ts = datetime.strptime(row[0], TIME_FORMAT).timestamp()
+            if start is not None and ts < start:
+                continue
+            if end is not None and ts > end:
+                return
+            yield ts, tuple(float(v) for v in row[1:])
+
+
+def read_range(path, start=None, end=None):
+    """流式读取 [start, end] 时间范围内的行, 产出 (epoch秒, 数值元组)"""
+    for name in data_files(path):
+        with open(name, 'rb') as f:
+            is_binary = f.read(4) == BINARY_MAGIC
+        rows = _read_binary(name, start, end) if is_binary else _read_csv(name, start, end)
+        yield from rows
@@ -0,0 +1,159 @@
+# fleet_poller.py
+"""多设备并发轮询
+
+一个事件循环轮询整批设备(如大量ESP32温室节点): 每台设备有自己的周期和点表,
+按绝对时间点调度(不累积漂移), 启动时随机错开, 对同一主机限制并发,
+连不上的设备按指数退避重试。
+"""
+import asyncio
+import json
+import random
+import time
+from poll_plan import Tag, PollPlanner
+from async_client import AsyncModbusClient
+
+# ESP32温室节点的默认点表: 保持寄存器0/1为温度/湿度(放大100倍存储, 温度可能为负)
+GREENHOUSE_TAGS = [
+    Tag('temperature', 'hr', 0, 'int16', scale=0.01),
+    Tag('humidity', 'hr', 1, 'uint16', scale=0.01),
+]
+
+
+class Device:
+    """一台被轮询的设备"""
+    def __init__(self, name, host, port=502, unit=1, interval=2.0, tags=None, max_gap=8):
+        self.name = name
+        self.host = host
+        self.port = port
+        self.unit = unit
+        self.interval = interval
+        self.planner = PollPlanner(tags or GREENHOUSE_TAGS, max_gap=max_gap)
+        self.stats = {'polls': 0, 'failures': 0, 'missed': 0}
+
+    @classmethod
+    def from_dict(cls, config):
+        tags = [Tag(**t) for t in config.get('tags', [])] or None
+        return cls(config['name'], config['host'], config.get('port', 502),
+                   config.get('unit', 1), config.get('interval', 2.0), tags)
+
+
+def load_devices(path):
+    """从JSON文件读取设备列表: [{"name", "host", "port", "unit", "interval", "tags": [...]}, ...]"""
+    with open(path, encoding='utf-8') as f:
+        return [Device.from_dict(d) for d in json.load(f)]
+
+
+class FleetPoller:
+    """asyncio设备群轮询器
+
+    on_data(device, values, timestamp): 每次成功读取后调用(在事件循环线程中)
+    per_host_limit: 同一主机(IP)上同时进行的轮询数
+    max_concurrency: 全局同时进行的轮询数
+    """
+    def __init__(self, devices, on_data=None, per_host_limit=1, max_concurrency=500,
+                 timeout=2.0, jitter=True, backoff_initial=1.0, backoff_max=60.0):
+        self.devices = list(devices)
+        self.on_data = on_data
+        self.per_host_limit = per_host_limit
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.jitter = jitter
+        self.backoff_initial = backoff_initial
+        self.backoff_max = backoff_max
+        self._host_limits = {}
+        self._global_limit = None
+        self._stop_event = None
+
+    def _host_limit(self, host):
+        limit = self._host_limits.get(host)
+        if limit is None:
+            limit = self._host_limits[host] = asyncio.Semaphore(self.per_host_limit)
+        return limit
+
+    async def poll_once(self, device, client):
+        """读取一次设备全部点; 失败返回None"""
+        async with self._global_limit, self._host_limit(device.host):
+            try:
+                values = await device.planner.read_async(client)
+            except (asyncio.TimeoutError, OSError, ValueError, asyncio.IncompleteReadError):
+                values = None
+            except Exception as e:
+                # 其他错误(如响应解码失败)只影响这台设备, 按失败处理后退避重试
+                print(f"{device.name} 轮询错误: {e}")
+                values = None
+        device.stats['polls'] += 1
+        if values is None:
+            device.stats['failures'] += 1
+        return values
+
+    async def _run_device(self, device):
+        loop = asyncio.get_running_loop()
+        client = AsyncModbusClient(device.host, device.port, device.unit, self.timeout)
+        backoff = self.backoff_initial
+        if self.jitter:
+            await self._sleep(random.uniform(0, device.interval))
+        deadline = loop.time()
+        try:
+            while not self._stop_event.is_set():
+                values = await self.poll_once(device, client)
+                now = loop.time()
+                if values is None:
+                    # 设备不可达: 指数退避, 恢复后重新对齐周期
+                    await self._sleep(backoff)
+                    backoff = min(backoff * 2, self.backoff_max)
+                    deadline = loop.time()
+                    continue
+                backoff = self.backoff_initial
+                if self.on_data:
+                    try:
+                        self.on_data(device, values, time.time())
+                    except Exception as e:
+                        print(f"{device.name} 数据处理错误: {e}")
+                # 下一个绝对时间点; 超时错过的周期直接跳过并计数
+                deadline += device.interval
+                if deadline <= now:
+                    missed = int((now - deadline) // device.interval) + 1
+                    device.stats['missed'] += missed
+                    deadline += missed * device.interval
+                await self._sleep(deadline - now)
+        finally:
+            await client.close()
+
+    async def _sleep(self, seconds):
+        """可被 stop() 提前唤醒的等待"""
+        try:
+            await asyncio.wait_for(self._stop_event.wait(), max(0.0, seconds))
+        except asyncio.TimeoutError:
+            pass
+
+    async def run(self):
+        """轮询所有设备, 直到 stop() 被调用"""
+        self._stop_event = asyncio.Event()
+        self._global_limit = asyncio.Semaphore(self.max_concurrency)
+        self._host_limits = {}
+        await asyncio.gather(*(self._run_device(d) for d in self.devices))
+
+    def stop(self):
+        if self._stop_event is not None:
+            self._stop_event.set()
+
+    def summary(self):
+        polls = sum(d.stats['polls'] for d in self.devices)
+        failures = sum(d.stats['failures'] for d in self.devices)
+        missed = sum(d.stats['missed'] for d in self.devices)
+        return f"设备 {len(self.devices)} 台, 轮询 {polls} 次, 失败 {failures} 次, 错过周期 {missed} 次"
+
+
+if __name__ == "__main__":
+    import sys
+
+    def print_data(device, values, timestamp):
+        # 点表已按scale换算为工程值
+        print(f"{device.name}: " + ", ".join(f"{k}={v:.2f}" for k, v in values.items()))
+
+    poller = FleetPoller(load_devices(sys.argv[1] if len(sys.argv) > 1 else 'devices.json'), on_data=print_data)
+    try:
+        asyncio.run(poller.run())
+    except KeyboardInterrupt:
+        print("\n监测停止")
+        print(poller.summary())
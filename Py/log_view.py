@@ -0,0 +1,115 @@
+# log_view.py
+"""虚拟化的通信日志视图
+
+日志保存在固定容量的环形缓冲区模型中, QListView 只绘制可见行;
+新日志先进入待刷新队列, 由定时器按固定帧率成批插入,
+按寄存器类型(AI/AO/DI/DO)过滤通过代理模型完成, 不会重绘全部历史。
+"""
+from collections import deque
+from PyQt5.QtCore import Qt, QAbstractListModel, QModelIndex, QSortFilterProxyModel, QRegExp, QTimer
+from PyQt5.QtWidgets import QWidget, QVBoxLayout, QListView, QAbstractItemView
+from PyQt5 import QtGui
+
+REG_TYPE_ROLE = Qt.UserRole + 1
+SYSTEM_TYPE = '系统'  # 非请求类的界面消息
+
+
+class LogModel(QAbstractListModel):
+    """环形缓冲区日志模型, 超出容量时丢弃最旧的行"""
+    def __init__(self, capacity=20000, parent=None):
+        super().__init__(parent)
+        self.capacity = capacity
+        self._rows = deque()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        reg_type, text = self._rows[index.row()]
+        if role == Qt.DisplayRole:
+            return text
+        if role == REG_TYPE_ROLE:
+            return reg_type
+        return None
+
+    def append_rows(self, rows):
+        """一次插入一批 (寄存器类型, 文本)"""
+        if not rows:
+            return
+        rows = rows[-self.capacity:]
+        overflow = len(self._rows) + len(rows) - self.capacity
+        if overflow > 0:
+            self.beginRemoveRows(QModelIndex(), 0, overflow - 1)
+            for _ in range(overflow):
+                self._rows.popleft()
+            self.endRemoveRows()
+        first = len(self._rows)
+        self.beginInsertRows(QModelIndex(), first, first + len(rows) - 1)
+        self._rows.extend(rows)
+        self.endInsertRows()
+
+    def clear(self):
+        self.beginResetModel()
+        self._rows.clear()
+        self.endResetModel()
+
+
+class LogView(QWidget):
+    """带批量刷新和类型过滤的日志控件"""
+    def __init__(self, capacity=20000, fps=20, parent=None):
+        super().__init__(parent)
+        self.model = LogModel(capacity, self)
+        self.proxy = QSortFilterProxyModel(self)
+        self.proxy.setSourceModel(self.model)
+        self.proxy.setFilterRole(REG_TYPE_ROLE)
+        self.proxy.setDynamicSortFilter(True)
+
+        self.list_view = QListView()
+        self.list_view.setModel(self.proxy)
+        self.list_view.setUniformItemSizes(True)
+        self.list_view.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.list_view.setSelectionMode(QAbstractItemView.ExtendedSelection)
+        self.list_view.setFont(QtGui.QFont("Consolas", 10))
+
+        layout = QVBoxLayout()
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.addWidget(self.list_view)
+        self.setLayout(layout)
+
+        self._pending = []
+        self.flush_timer = QTimer(self)
+        self.flush_timer.timeout.connect(self.flush)
+        self.flush_timer.start(int(1000 / fps))
+
+    def add(self, reg_type, text):
+        self._pending.append((reg_type, text))
+
+    def add_many(self, rows):
+        self._pending.extend(rows)
+
+    def flush(self):
+        """把待刷新的日志一次性插入模型, 视图在底部时保持跟随"""
+        if not self._pending:
+            return
+        rows, self._pending = self._pending, []
+        scrollbar = self.list_view.verticalScrollBar()
+        at_bottom = scrollbar.value() >= scrollbar.maximum()
+        self.model.append_rows(rows)
+        if at_bottom:
+            self.list_view.scrollToBottom()
+
+    def set_filter(self, reg_type):
+        """只显示某一类日志; None 或 '全部' 显示所有"""
+        if not reg_type or reg_type == '全部':
+            self.proxy.setFilterRegExp(QRegExp())
+        else:
+            self.proxy.setFilterRegExp(QRegExp(f"^{reg_type}$"))
+
+    def clear(self):
+        self._pending = []
+        self.model.clear()
+
+    def to_text(self):
+        return "\n".join(self.proxy.index(i, 0).data() for i in range(self.proxy.rowCount()))
@@ -2,19 +2,29 @@ import sys
 import socket
 from datetime import datetime
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, 
-                            QHBoxLayout, QLabel, QTextEdit, QLineEdit, 
-                            QPushButton, QGroupBox, QMessageBox)
+                            QHBoxLayout, QLabel, QLineEdit, 
+                            QPushButton, QGroupBox, QMessageBox, QComboBox, QCheckBox)
 from PyQt5.QtCore import QTimer, Qt, pyqtSignal, QObject, QThread
 from PyQt5 import QtGui
-from pymodbus.server.sync import StartTcpServer
-from pymodbus.datastore import ModbusSlaveContext, ModbusServerContext
-from pymodbus.datastore import ModbusSequentialDataBlock
+from register_store import RegisterStore
+from request_log import RequestLogger
+from async_server import AsyncModbusServer
+from log_view import LogView, SYSTEM_TYPE
+from register_view import RegisterPanel
+from modbus_slave_simulator import build_slave_context, LoggingServerContext
+from signal_engine import SignalEngine, add_demo_signals
 
 class ModbusServerGUI(QMainWindow):
+    # 后台日志线程成批送回的日志行
+    log_batch = pyqtSignal(list)
+
     def __init__(self):
         super().__init__()
         self.server_worker = None
         self.worker_thread = None
+        self.request_logger = None
+        self.signal_engine = None
+        self.log_batch.connect(self.log_lines)
         self.setup_ui()
         self.setWindowTitle("Modbus从站监控器")
         self.resize(900, 650)
@@ -60,7 +70,12 @@ class ModbusServerGUI(QMainWindow):
         
         self.status_label = QLabel("状态: 未运行")
         
+        # 启动后由信号发生器更新 AI 0-15 和 DI 0-15
+        self.signals_check = QCheckBox("模拟输入信号")
+        self.signals_check.setChecked(True)
+        
         ctrl_layout.addWidget(self.start_btn)
+        ctrl_layout.addWidget(self.signals_check)
         ctrl_layout.addWidget(self.status_label)
         ctrl_layout.addStretch()
         ctrl_group.setLayout(ctrl_layout)
@@ -71,10 +86,10 @@ class ModbusServerGUI(QMainWindow):
         desc_text = QLabel("""
         <b>地址映射表:</b>
         <table>
-        <tr><td>AI</td><td>输入寄存器</td><td>30001-30100</td></tr>
-        <tr><td>AO</td><td>保持寄存器</td><td>40001-40100</td></tr>
-        <tr><td>DI</td><td>离散输入</td><td>10001-10008</td></tr>
-        <tr><td>DO</td><td>线圈</td><td>00001-00008</td></tr>
+        <tr><td>AI</td><td>输入寄存器</td><td>0-65535</td></tr>
+        <tr><td>AO</td><td>保持寄存器</td><td>0-65535</td></tr>
+        <tr><td>DI</td><td>离散输入</td><td>0-65535</td></tr>
+        <tr><td>DO</td><td>线圈</td><td>0-65535</td></tr>
         </table>
         <p>注: LabVIEW地址 = Python地址 + 1</p>
         """)
@@ -93,18 +108,22 @@ class ModbusServerGUI(QMainWindow):
         log_group = QGroupBox("通信日志 (实时更新)")
         log_layout = QVBoxLayout()
         
-        self.log_display = QTextEdit()
-        self.log_display.setReadOnly(True)
-        self.log_display.setFont(QtGui.QFont("Consolas", 10))
+        # 虚拟化日志视图: 环形缓冲区+按帧批量刷新
+        self.log_display = LogView(capacity=20000, fps=20)
         
         log_tools = QHBoxLayout()
         self.clear_btn = QPushButton("清空日志")
         self.clear_btn.clicked.connect(self.clear_logs)
         self.pause_btn = QPushButton("暂停刷新")
         self.pause_btn.setCheckable(True)
+        self.filter_box = QComboBox()
+        self.filter_box.addItems(['全部', 'AI', 'AO', 'DI', 'DO', SYSTEM_TYPE])
+        self.filter_box.currentTextChanged.connect(self.log_display.set_filter)
         
         log_tools.addWidget(self.clear_btn)
         log_tools.addWidget(self.pause_btn)
+        log_tools.addWidget(QLabel("类型过滤:"))
+        log_tools.addWidget(self.filter_box)
         log_tools.addStretch()
         
         log_layout.addWidget(self.log_display)
@@ -115,9 +134,8 @@ class ModbusServerGUI(QMainWindow):
         status_group = QGroupBox("寄存器状态监控")
         status_layout = QVBoxLayout()
         
-        self.register_status = QTextEdit()
-        self.register_status.setReadOnly(True)
-        self.register_status.setFont(QtGui.QFont("Consolas", 9))
+        # 表格只重绘发生变化的寄存器, 可滚动浏览全部地址
+        self.register_status = RegisterPanel()
         
         status_layout.addWidget(self.register_status)
         status_group.setLayout(status_layout)
@@ -134,7 +152,7 @@ class ModbusServerGUI(QMainWindow):
         # 状态更新定时器
         self.update_timer = QTimer()
         self.update_timer.timeout.connect(self.update_register_status)
-        self.update_timer.start(1000)
+        self.update_timer.start(200)
 
     def setup_styles(self):
         self.setStyleSheet("""
@@ -178,9 +196,12 @@ class ModbusServerGUI(QMainWindow):
         """在日志框中显示消息"""
         if not self.pause_btn.isChecked():
             timestamp = datetime.now().strftime("%H:%M:%S.%f")[:-3]
-            self.log_display.append(f"[{timestamp}] {message}")
-            scrollbar = self.log_display.verticalScrollBar()
-            scrollbar.setValue(scrollbar.maximum())
+            self.log_display.add(SYSTEM_TYPE, f"[{timestamp}] {message}")
+
+    def log_lines(self, lines):
+        """追加一批 (寄存器类型, 日志行), 由日志视图按帧率统一刷新"""
+        if not self.pause_btn.isChecked():
+            self.log_display.add_many(lines)
 
     def clear_logs(self):
         """清空日志"""
@@ -234,17 +255,17 @@ class ModbusServerGUI(QMainWindow):
         
         self.log_message(f"正在启动Modbus从站 @ {ip}:{port}...")
         
-        # 初始化数据存储
-        store = ModbusSlaveContext(
-            di=LoggingDataBlock('DI', 0, [0]*8, self.log_message),
-            co=LoggingDataBlock('DO', 0, [0]*8, self.log_message),
-            hr=LoggingDataBlock('AO', 0, [0]*100, self.log_message),
-            ir=LoggingDataBlock('AI', 0, [0]*100, self.log_message)
-        )
+        # 初始化数据存储, 读写日志由后台线程成批送回界面
+        self.request_logger = RequestLogger(sink=self.log_batch.emit, typed_sink=True).start()
+        tables = RegisterStore().unit(0)
+        store = build_slave_context(tables, self.request_logger)
+        self.register_status.set_tables(tables)
+        if self.signals_check.isChecked():
+            self.signal_engine = add_demo_signals(SignalEngine(rate=10), tables).start()
         
         # 创建线程和工作对象
         self.worker_thread = QThread()
-        self.server_worker = ServerWorker(ip, port, store)
+        self.server_worker = ServerWorker(ip, port, store, self.request_logger)
         self.server_worker.moveToThread(self.worker_thread)
         
         # 连接信号槽
@@ -266,6 +287,7 @@ class ModbusServerGUI(QMainWindow):
         self.ip_input.setEnabled(False)
         self.port_input.setEnabled(False)
         self.get_ip_btn.setEnabled(False)
+        self.signals_check.setEnabled(False)
 
     def stop_server(self):
         """停止服务器"""
@@ -274,6 +296,12 @@ class ModbusServerGUI(QMainWindow):
             if self.worker_thread:
                 self.worker_thread.quit()
                 self.worker_thread.wait()
+            if self.signal_engine:
+                self.signal_engine.stop()
+                self.signal_engine = None
+            if self.request_logger:
+                self.request_logger.stop()
+                self.request_logger = None
             
             self.log_message("服务器已停止")
             
@@ -286,37 +314,15 @@ class ModbusServerGUI(QMainWindow):
             self.ip_input.setEnabled(True)
             self.port_input.setEnabled(True)
             self.get_ip_btn.setEnabled(True)
+            self.signals_check.setEnabled(True)
 
     def update_register_status(self):
-        """更新寄存器状态显示"""
-        if not hasattr(self, 'server_worker') or not self.server_worker or self.pause_btn.isChecked():
+        """刷新寄存器表格中发生变化的单元格(直接读表, 不经过日志数据块)"""
+        if not self.server_worker or self.pause_btn.isChecked():
             return
             
         try:
-            store = self.server_worker.store
-            status_text = []
-            
-            # 显示DO线圈状态 (地址0-7)
-            do_values = store.getValues(0x01, 0, 8)  # 0x01 = 读线圈
-            status_text.append("=== DO线圈状态 (地址0-7) ===")
-            status_text.append(" ".join(f"{i}:{'●' if v else '○'}" for i, v in enumerate(do_values)))
-            
-            # 显示DI离散输入 (地址0-7)
-            di_values = store.getValues(0x02, 0, 8)  # 0x02 = 读离散输入
-            status_text.append("\n=== DI离散输入 (地址0-7) ===")
-            status_text.append(" ".join(f"{i}:{'●' if v else '○'}" for i, v in enumerate(di_values)))
-            
-            # 显示AO保持寄存器 (地址0-9)
-            ao_values = store.getValues(0x03, 0, 10)  # 0x03 = 读保持寄存器
-            status_text.append("\n=== AO保持寄存器 (地址0-9) ===")
-            status_text.append("\n".join(f"地址{i}: {v:5}" for i, v in enumerate(ao_values)))
-            
-            # 显示AI输入寄存器 (地址0-9)
-            ai_values = store.getValues(0x04, 0, 10)  # 0x04 = 读输入寄存器
-            status_text.append("\n=== AI输入寄存器 (地址0-9) ===")
-            status_text.append("\n".join(f"地址{i}: {v:5}" for i, v in enumerate(ai_values)))
-            
-            self.register_status.setPlainText("\n".join(status_text))
+            self.register_status.refresh()
         except Exception as e:
             self.log_message(f"更新寄存器状态错误: {str(e)}")
 
@@ -326,58 +332,32 @@ class ModbusServerGUI(QMainWindow):
         event.accept()
 
 class ServerWorker(QObject):
-    """Modbus服务器工作对象"""
+    """Modbus服务器工作对象(在QThread中运行asyncio事件循环)"""
     log_signal = pyqtSignal(str)
     finished = pyqtSignal()
     
-    def __init__(self, ip, port, store):
+    def __init__(self, ip, port, store, logger=None):
         super().__init__()
         self.ip = ip
         self.port = port
         self.store = store
-        self._running = True
+        context = LoggingServerContext(slaves=store, single=True, logger=logger)
+        self.server = AsyncModbusServer(context, (ip, port))
         
     def run(self):
-        context = ModbusServerContext(slaves=self.store, single=True)
         self.log_signal.emit(f"Modbus从站已启动: {self.ip}:{self.port}")
         
         try:
-            self.server = StartTcpServer(
-                context=context,
-                address=(self.ip, self.port),
-                defer_reactor_run=True
-            )
-            while self._running:
-                QThread.msleep(100)
+            # 阻塞到 stop() 通知事件循环退出为止
+            self.server.serve_forever()
         except Exception as e:
             self.log_signal.emit(f"服务器错误: {str(e)}")
         finally:
-            if hasattr(self, 'server'):
-                self.server.server_close()
             self.finished.emit()
     
     def stop(self):
-        self._running = False
-
-class LoggingDataBlock(ModbusSequentialDataBlock):
-    """带日志记录的数据块"""
-    def __init__(self, reg_type, address, values, log_callback):
-        super().__init__(address, values)
-        self.reg_type = reg_type
-        self.log_callback = log_callback
-    
-    def getValues(self, address, count=1):
-        values = super().getValues(address, count)
-        self.log_callback(
-            f"{self.reg_type}读取 → 地址: {address}, 数量: {count}, 返回值: {values}"
-        )
-        return values
-
-    def setValues(self, address, values):
-        self.log_callback(
-            f"{self.reg_type}写入 → 地址: {address}, 写入值: {values}"
-        )
-        super().setValues(address, values)
+        """可从界面线程直接调用, 通过事件循环线程安全地关闭服务器"""
+        self.server.stop()
 
 if __name__ == "__main__":
     app = QApplication(sys.argv)
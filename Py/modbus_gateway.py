@@ -0,0 +1,226 @@
+# modbus_gateway.py
+"""带缓存的 Modbus TCP 网关
+
+放在慢速现场设备(如每2秒刷新一次、同时只处理一个连接的ESP32)前面:
+  - 接受任意多个主站连接, 上游只保持一条连接, 请求按顺序转发
+  - 完全相同的读请求正在进行时合并为一次上游请求
+  - 读响应按地址范围配置的TTL缓存, 过期前的重复读直接由缓存应答
+  - 写请求直接转发, 并使重叠地址的缓存失效
+
+    python modbus_gateway.py 192.168.1.50 --upstream-port 502 --port 5020 --ttl 2.0
+"""
+import asyncio
+import struct
+from async_client import AsyncModbusClient
+from async_server import MBAP_HEADER, check_mbap
+
+READ_FUNCTIONS = {1: 'co', 2: 'di', 3: 'hr', 4: 'ir'}
+# 写功能码 -> 受影响的表
+WRITE_FUNCTIONS = {5: 'co', 15: 'co', 6: 'hr', 16: 'hr'}
+GATEWAY_TARGET_FAILED = 0x0B  # 异常码: 网关目标设备无响应
+ADDRESS_COUNT = struct.Struct('>HH')
+MAX_CACHE_ENTRIES = 10000  # 超过时清理过期项
+
+
+class CacheRule:
+    """某张表 [start, end) 地址范围内读响应的缓存时间(秒), ttl=0 表示不缓存"""
+    def __init__(self, table, start, end, ttl):
+        self.table = table
+        self.start = start
+        self.end = end
+        self.ttl = ttl
+
+
+class ModbusGateway:
+    """缓存网关
+
+    rules: [CacheRule, ...], 按顺序匹配第一条完整覆盖读取范围的规则, 都不匹配时用default_ttl
+    """
+    def __init__(self, upstream_host, upstream_port=502, host='0.0.0.0', port=5020,
+                 default_ttl=1.0, rules=None, timeout=3.0, max_connections=10000):
+        self.upstream = AsyncModbusClient(upstream_host, upstream_port, timeout=timeout)
+        self.host = host
+        self.port = port
+        self.default_ttl = default_ttl
+        self.rules = list(rules or [])
+        self.max_connections = max_connections
+        self.cache = {}  # (从站, 功能码, 地址, 数量) -> (过期时间, 响应PDU)
+        self.stats = {'hits': 0, 'misses': 0, 'merged': 0, 'writes': 0, 'errors': 0}
+        self.connection_count = 0
+        self._inflight = {}  # 键 -> Future
+        self._generations = {}  # (从站, 表) -> 写入次数, 读取期间发生写入时不缓存结果
+        self._server = None
+        self._writers = set()
+        self._tasks = set()
+        self._stop_event = None
+        self.loop = None
+
+    def ttl_for(self, table, address, count):
+        for rule in self.rules:
+            if rule.table == table and rule.start <= address and address + count <= rule.end:
+                return rule.ttl
+        return self.default_ttl
+
+    def invalidate(self, unit, table, address, count):
+        """删除与写入范围重叠的缓存, 之后的读取不再合并到进行中的读请求"""
+        end = address + count
+        self._generations[(unit, table)] = self._generations.get((unit, table), 0) + 1
+        overlaps = lambda k: k[0] == unit and READ_FUNCTIONS[k[1]] == table and k[2] < end and address < k[2] + k[3]
+        for key in [k for k in self.cache if overlaps(k)]:
+            del self.cache[key]
+        for key in [k for k in self._inflight if overlaps(k)]:
+            del self._inflight[key]
+
+    def purge(self, now):
+        """删除过期缓存; 仍然过多时全部清空"""
+        self.cache = {k: v for k, v in self.cache.items() if v[0] > now}
+        if len(self.cache) >= MAX_CACHE_ENTRIES:
+            self.cache.clear()
+
+    async def _forward(self, unit, pdu):
+        try:
+            return await self.upstream.transact(unit, pdu)
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError, OSError, ValueError):
+            # 上游连接已由客户端关闭, 下一个请求重新连接
+            self.stats['errors'] += 1
+            return bytes([pdu[0] | 0x80, GATEWAY_TARGET_FAILED])
+
+    async def _read(self, unit, pdu):
+        function_code = pdu[0]
+        address, count = ADDRESS_COUNT.unpack_from(pdu, 1)
+        key = (unit, function_code, address, count)
+        loop = asyncio.get_running_loop()
+        cached = self.cache.get(key)
+        if cached is not None and cached[0] > loop.time():
+            self.stats['hits'] += 1
+            return cached[1]
+        pending = self._inflight.get(key)
+        if pending is not None:
+            self.stats['merged'] += 1
+            return await asyncio.shield(pending)
+        self.stats['misses'] += 1
+        table = READ_FUNCTIONS[function_code]
+        generation = self._generations.get((unit, table), 0)
+        future = loop.create_future()
+        self._inflight[key] = future
+        try:
+            response = await self._forward(unit, pdu)
+            ttl = self.ttl_for(table, address, count)
+            # 读取期间有写入时, 响应可能是写入前的值, 不缓存
+            if ttl > 0 and not response[0] & 0x80 and self._generations.get((unit, table), 0) == generation:
+                if len(self.cache) >= MAX_CACHE_ENTRIES:
+                    self.purge(loop.time())
+                self.cache[key] = (loop.time() + ttl, response)
+            future.set_result(response)
+            return response
+        except Exception as e:
+            # 合并到本次读取的请求得到同样的错误
+            future.set_exception(e)
+            future.exception()  # 标记为已取出, 没有合并的请求时不报"未取出的异常"
+            raise
+        except BaseException:
+            future.cancel()  # 任务被取消(停止网关)
+            raise
+        finally:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+
+    async def handle_pdu(self, unit, pdu):
+        """处理一条请求PDU, 返回响应PDU"""
+        function_code = pdu[0]
+        if function_code in READ_FUNCTIONS and len(pdu) >= 5:
+            return await self._read(unit, pdu)
+        if function_code in WRITE_FUNCTIONS and len(pdu) >= 5:
+            address, value = ADDRESS_COUNT.unpack_from(pdu, 1)
+            count = value if function_code in (15, 16) else 1
+            table = WRITE_FUNCTIONS[function_code]
+            self.invalidate(unit, table, address, count)
+            self.stats['writes'] += 1
+            response = await self._forward(unit, pdu)
+            # 写入排队期间开始的读取可能已缓存旧值, 写完后再失效一次
+            self.invalidate(unit, table, address, count)
+            return response
+        return await self._forward(unit, pdu)
+
+    async def _handle(self, reader, writer):
+        if self.connection_count >= self.max_connections:
+            writer.close()
+            return
+        self.connection_count += 1
+        self._writers.add(writer)
+        self._tasks.add(asyncio.current_task())
+        try:
+            while True:
+                header = await reader.readexactly(MBAP_HEADER.size)
+                transaction_id, protocol_id, length, unit = MBAP_HEADER.unpack(header)
+                check_mbap(protocol_id, length)
+                pdu = await reader.readexactly(length - 1)
+                response = await self.handle_pdu(unit, pdu)
+                writer.write(MBAP_HEADER.pack(transaction_id, protocol_id, len(response) + 1, unit) + response)
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass  # ValueError: 非法帧, 直接断开
+        except Exception as e:
+            print(f"网关处理错误: {e}")
+        finally:
+            self.connection_count -= 1
+            self._writers.discard(writer)
+            self._tasks.discard(asyncio.current_task())
+            writer.close()
+
+    async def serve(self, started=None):
+        """运行直到 stop() 被调用; started(threading.Event)在开始监听后被设置"""
+        self.loop = asyncio.get_running_loop()
+        self._stop_event = asyncio.Event()
+        self._server = await asyncio.start_server(self._handle, self.host, self.port, reuse_address=True)
+        self.port = self._server.sockets[0].getsockname()[1]
+        if started is not None:
+            started.set()
+        try:
+            await self._stop_event.wait()
+        finally:
+            self._server.close()
+            for writer in list(self._writers):
+                writer.close()
+            if self._tasks:
+                await asyncio.wait(list(self._tasks), timeout=5)
+            await self._server.wait_closed()
+            await self.upstream.close()
+
+    def stop(self):
+        """线程安全地停止网关"""
+        if self.loop is not None and self._stop_event is not None and not self.loop.is_closed():
+            self.loop.call_soon_threadsafe(self._stop_event.set)
+
+    def summary(self):
+        s = self.stats
+        reads = s['hits'] + s['misses'] + s['merged']
+        saved = (s['hits'] + s['merged']) / reads * 100 if reads else 0.0
+        return (f"读 {reads} 次(缓存命中 {s['hits']}, 合并 {s['merged']}, 上游 {s['misses']}, "
+                f"节省 {saved:.1f}%), 写 {s['writes']} 次, 上游错误 {s['errors']} 次")
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description='带缓存的Modbus TCP网关')
+    parser.add_argument('upstream', help='现场设备IP')
+    parser.add_argument('--upstream-port', type=int, default=502)
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=5020)
+    parser.add_argument('--ttl', type=float, default=1.0, help='默认缓存时间(秒)')
+    parser.add_argument('--rule', action='append', default=[],
+                        help='表:起始-结束:TTL, 例如 hr:0-2:2.0, 可重复')
+    args = parser.parse_args()
+
+    rules = []
+    for text in args.rule:
+        table, span, ttl = text.split(':')
+        start, end = span.split('-')
+        rules.append(CacheRule(table, int(start), int(end), float(ttl)))
+    gateway = ModbusGateway(args.upstream, args.upstream_port, args.host, args.port, args.ttl, rules)
+    print(f"网关 {args.host}:{args.port} → {args.upstream}:{args.upstream_port}")
+    try:
+        asyncio.run(gateway.serve())
+    except KeyboardInterrupt:
+        print("\n网关已停止")
+        print(gateway.summary())
@@ -1,18 +1,45 @@
 # modbus_master.py
 from pymodbus.client import ModbusTcpClient
 from PyQt5.QtCore import QObject, pyqtSignal
+from poll_plan import Tag, PollPlanner
+from change_filter import ChangeFilter
+
+# 默认点表: 保持寄存器(地址0:速度, 地址1:启动状态), 离散输入(传感器状态)
+DEFAULT_TAGS = [
+    Tag('speed', 'hr', 0, 'uint16'),
+    Tag('start', 'hr', 1, 'bool'),
+    Tag('sensors', 'di', 0, 'bool', 8),
+]
 
 class ModbusMaster(QObject):
+    # 只携带本次需要上报的点(变化超出死区或到了心跳时间); 全部最新值见 self.registers
     data_updated = pyqtSignal(dict)
     
-    def __init__(self, ip='127.0.0.1', port=5020):
+    def __init__(self, ip='127.0.0.1', port=5020, tags=None, max_gap=8,
+                 deadbands=None, default_deadband=0, heartbeat=None):
         super().__init__()
         self.client = ModbusTcpClient(ip, port=port)
-        self.registers = {
-            'speed': 0,
-            'start': False,
-            'sensors': [0]*8
-        }
+        # 点表编译为最少的读请求, 计划缓存到点表变化为止
+        self.planner = PollPlanner(tags or DEFAULT_TAGS, max_gap=max_gap)
+        self.registers = {tag.name: self._initial_value(tag) for tag in self.planner.tags}
+        # 死区: {名称: 绝对值 或 '2%'}; heartbeat秒内未上报的点会重新上报
+        self.change_filter = ChangeFilter(deadbands, default_deadband, heartbeat)
+        
+    @staticmethod
+    def _initial_value(tag):
+        value = False if tag.type == 'bool' else 0
+        return [value] * tag.count if tag.count > 1 else value
+
+    def add_tag(self, tag):
+        """添加或替换一个点, 下次轮询时重新规划"""
+        self.planner.add(tag)
+        self.change_filter.forget(tag.name)
+        self.registers.setdefault(tag.name, self._initial_value(tag))
+
+    def remove_tag(self, name):
+        self.planner.remove(name)
+        self.registers.pop(name, None)
+        self.change_filter.forget(name)
         
     def connect(self):
         return self.client.connect()
@@ -20,18 +47,14 @@ class ModbusMaster(QObject):
     def read_data(self):
         """读取所有需要的数据"""
         try:
-            # 读取保持寄存器(地址0:速度, 地址1:启动状态)
-            hr_result = self.client.read_holding_registers(0, 2)
-            # 读取离散输入(传感器状态)
-            di_result = self.client.read_discrete_inputs(0, 8)
+            # 按缓存的轮询计划读取全部点
+            values = self.planner.read(self.client)
             
-            if not hr_result.isError() and not di_result.isError():
-                self.registers.update({
-                    'speed': hr_result.registers[0],
-                    'start': bool(hr_result.registers[1]),
-                    'sensors': [int(b) for b in di_result.bits]
-                })
-                self.data_updated.emit(self.registers)
+            if values is not None:
+                self.registers.update(values)
+                changes = self.change_filter.update(values)
+                if changes:
+                    self.data_updated.emit(changes)
                 return True
         except Exception as e:
             print(f"读取错误: {e}")
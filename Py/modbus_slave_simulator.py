@@ -1,23 +1,108 @@
-from pymodbus.server.sync import StartTcpServer
+from pymodbus.server.sync import StartTcpServer, ModbusConnectedRequestHandler
 from pymodbus.datastore import ModbusSlaveContext, ModbusServerContext
-from pymodbus.datastore import ModbusSequentialDataBlock
+from pymodbus.exceptions import NoSuchSlaveException
+from pymodbus.framer.socket_framer import ModbusSocketFramer
+from pymodbus.pdu import ModbusExceptions as merror
+from register_store import ArrayDataBlock, RegisterStore
+from request_log import RequestLogger
+from async_server import AsyncModbusServer, MBAP_HEADER
+from signal_engine import SignalEngine, add_demo_signals
+from server_metrics import ServerMetrics
 import socket
+import sys
+import time
 
-class LoggingDataBlock(ModbusSequentialDataBlock):
-    """带分类日志的数据块"""
-    def __init__(self, reg_type, *args, **kwargs):
+class LoggingDataBlock(ArrayDataBlock):
+    """带分类日志的数据块(日志交给RequestLogger在后台写出)"""
+    def __init__(self, reg_type, table, address=0, logger=None):
         self.reg_type = reg_type  # 'AI'/'AO'/'DI'/'DO'
-        super().__init__(*args, **kwargs)
+        self.logger = logger
+        super().__init__(table, address)
     
-    def getValues(self, address, count=1):
+    def getValues(self, address, count=1, function_code=None):
         values = super().getValues(address, count)
-        print(f"{self.reg_type}读取 → 地址: {address}, 数量: {count}, 返回值: {values}")
+        if self.logger:
+            self.logger.access(self.reg_type, '读取', address, count, values, function_code)
         return values
 
-    def setValues(self, address, values):
-        print(f"{self.reg_type}写入 → 地址: {address}, 写入值: {values}")
+    def setValues(self, address, values, function_code=None):
+        if self.logger:
+            self.logger.access(self.reg_type, '写入', address, len(values) if isinstance(values, list) else 1, values,
+                               function_code)
         super().setValues(address, values)
 
+class LoggingSlaveContext(ModbusSlaveContext):
+    """把请求的功能码传给数据块, 访问日志按实际功能码(如FC5/FC6)抽样和限速"""
+    def getValues(self, fx, address, count=1):
+        if not self.zero_mode:
+            address = address + 1
+        return self.store[self.decode(fx)].getValues(address, count, fx)
+
+    def setValues(self, fx, address, values):
+        if not self.zero_mode:
+            address = address + 1
+        self.store[self.decode(fx)].setValues(address, values, fx)
+
+class LoggingServerContext(ModbusServerContext):
+    def __init__(self, slaves=None, single=True, logger=None, metrics=None):
+        super().__init__(slaves=slaves, single=single)
+        self.logger = logger
+        # ServerMetrics, 为None时不统计; 由服务器在收发帧时记录(见 ContextRequestHandler 和 AsyncModbusServer)
+        self.metrics = metrics
+
+    def __call__(self, request):
+        """记录请求并在对应从站上执行(服务器通过此入口分发请求)"""
+        if self.logger:
+            self.logger.request(request)
+        return request.execute(self[request.unit_id])
+
+class LengthSocketFramer(ModbusSocketFramer):
+    """记录请求PDU长度(MBAP长度字段减去从站ID), 统计字节数时不必重新编码请求"""
+    def populateResult(self, result):
+        super().populateResult(result)
+        result.pdu_length = self._header['len'] - 1
+
+class ContextRequestHandler(ModbusConnectedRequestHandler):
+    """同步服务器的请求处理器: 与异步服务器一样经由 context(request) 执行, 以便记录日志和指标"""
+    def execute(self, request):
+        metrics = getattr(self.server.context, 'metrics', None)
+        start = time.perf_counter() if metrics is not None else 0.0
+        try:
+            response = self.server.context(request)
+        except NoSuchSlaveException:
+            if self.server.ignore_missing_slaves:
+                return
+            response = request.doException(merror.GatewayNoResponse)
+        except Exception as e:
+            print(f"请求处理错误: {e}")
+            response = request.doException(merror.SlaveFailure)
+        elapsed = time.perf_counter() - start
+        response.transaction_id = request.transaction_id
+        response.unit_id = request.unit_id
+        sent = self.send(response)
+        if metrics is not None:
+            # send() 返回发出的整帧字节数, 减去MBAP头(7字节)即响应PDU长度
+            metrics.observe(request.function_code, request.unit_id, elapsed, response.function_code > 0x80,
+                            getattr(request, 'pdu_length', 0), max(0, (sent or 0) - MBAP_HEADER.size))
+
+def build_slave_context(tables, logger=None):
+    """用一个从站的寄存器表构造带日志的从站上下文(地址从0开始, 覆盖整张表)"""
+    return LoggingSlaveContext(
+        di=LoggingDataBlock('DI', tables['di'], logger=logger),     # 离散输入
+        co=LoggingDataBlock('DO', tables['co'], logger=logger),     # 线圈
+        hr=LoggingDataBlock('AO', tables['hr'], logger=logger),     # 保持寄存器(模拟输出)
+        ir=LoggingDataBlock('AI', tables['ir'], logger=logger),     # 输入寄存器(模拟输入)
+        zero_mode=True
+    )
+
+def build_server_context(register_store, unit_ids=None, logger=None, metrics=None):
+    """构造服务器上下文; unit_ids为空时所有从站ID共用一组寄存器表"""
+    if not unit_ids:
+        slaves = build_slave_context(register_store.unit(0), logger)
+        return LoggingServerContext(slaves=slaves, single=True, logger=logger, metrics=metrics)
+    slaves = {unit_id: build_slave_context(register_store.unit(unit_id), logger) for unit_id in unit_ids}
+    return LoggingServerContext(slaves=slaves, single=False, logger=logger, metrics=metrics)
+
 def get_local_ip():
     """获取本机IP地址"""
     s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
@@ -28,37 +113,19 @@ def get_local_ip():
         s.close()
     return ip
 
-def run_slave():
-    # 初始化带分类日志的寄存器
-    store = ModbusSlaveContext(
-        di=LoggingDataBlock('DI', 0, [0]*8),     # 离散输入
-        co=LoggingDataBlock('DO', 0, [0]*8),     # 线圈
-        hr=LoggingDataBlock('AO', 0, [0]*100),   # 保持寄存器(模拟输出)
-        ir=LoggingDataBlock('AI', 0, [0]*100)    # 输入寄存器(模拟输入)
-    )
-    
-    # 请求分类器
-    def get_reg_type(function_code):
-        return {
-            1: 'DO', 2: 'DI', 3: 'AO', 4: 'AI',
-            5: 'DO', 6: 'AO', 15: 'DO', 16: 'AO'
-        }.get(function_code, 'UNKNOWN')
-    
-    class LoggingServerContext(ModbusServerContext):
-        def __call__(self, request):
-            reg_type = get_reg_type(request.function_code)
-            print(f"\n=== {reg_type}操作请求 ===")
-            print(f"功能码: {request.function_code}")
-            print(f"从站ID: {request.unit_id}")
-            if hasattr(request, 'address'):
-                print(f"Modbus地址: {request.address} (实际地址: {request.address+1})")
-            if hasattr(request, 'count'):
-                print(f"读取数量: {request.count}")
-            if hasattr(request, 'values'):
-                print(f"写入数值: {request.values}")
-            return super().__call__(request)
-
-    context = LoggingServerContext(slaves=store, single=True)
+def run_slave(unit_ids=None, logger=None, asyncio_mode=False, signals=True, metrics_port=None):
+    # 日志在后台线程批量输出, 可传入带抽样/限速或JSON格式的RequestLogger
+    logger = logger or RequestLogger()
+    # 按功能码/从站ID统计请求, 只在metrics_port不为空时启用并以Prometheus格式提供 /metrics
+    metrics = ServerMetrics() if metrics_port else None
+    # 初始化带分类日志的寄存器(每张表覆盖完整的65536个地址)
+    register_store = RegisterStore()
+    context = build_server_context(register_store, unit_ids, logger, metrics)
+    # 输入寄存器/离散输入由信号发生器周期更新
+    engine = SignalEngine(rate=10)
+    if signals:
+        for unit_id in unit_ids or [0]:
+            add_demo_signals(engine, register_store.unit(unit_id))
     
     local_ip = get_local_ip()
     print(f"本机可用IP地址: {local_ip}")
@@ -71,9 +138,29 @@ def run_slave():
     print("寄存器类型映射:")
     print("AI: 输入寄存器(模拟输入) | AO: 保持寄存器(模拟输出)")
     print("DI: 离散输入           | DO: 线圈(数字输出)")
+    print(f"服务器模式: {'asyncio(单线程多连接)' if asyncio_mode else '同步'}")
+    if signals:
+        print("信号发生器: AI 0-15 (正弦/斜坡/方波/噪声/随机游走), DI 0-15 (方波)")
+    if metrics_port:
+        metrics.serve_http(server_ip, metrics_port)
+        print(f"指标: http://{server_ip}:{metrics_port}/metrics")
     print("\n等待主站连接...")
     
-    StartTcpServer(context, address=(server_ip, port))
+    logger.start()
+    engine.start()
+    try:
+        if asyncio_mode:
+            AsyncModbusServer(context, (server_ip, port)).serve_forever()
+        else:
+            StartTcpServer(context, address=(server_ip, port), handler=ContextRequestHandler,
+                           framer=LengthSocketFramer)
+    except KeyboardInterrupt:
+        print("\n从站已停止")
+    finally:
+        engine.stop()
+        logger.stop()
 
 if __name__ == "__main__":
-    run_slave()
\ No newline at end of file
+    metrics_port = int(sys.argv[sys.argv.index('--metrics-port') + 1]) if '--metrics-port' in sys.argv else None
+    run_slave(asyncio_mode='--asyncio' in sys.argv, signals='--no-signals' not in sys.argv,
+              metrics_port=metrics_port)
\ No newline at end of file
@@ -0,0 +1,165 @@
+# poll_plan.py
+"""轮询计划
+
+用声明式的点表(名称, 表, 地址, 类型)描述要读取的数据,
+规划器把它编译成最少的读请求: 相邻或间隔不大的地址合并为一个请求,
+同时遵守单次最多125个寄存器/2000个位的协议限制。
+计划会被缓存, 只有点表变化时才重新生成。
+寄存器的解码交给 tag_codec: 每个读请求对应一个缓存的块解码器。
+"""
+from collections import namedtuple
+from tag_codec import TYPES, ORDERS, compile_codec
+
+# 表名 -> 读功能码
+TABLE_FUNCTIONS = {'co': 1, 'di': 2, 'hr': 3, 'ir': 4}
+# 表名 -> 客户端读函数名
+TABLE_READERS = {
+    'co': 'read_coils',
+    'di': 'read_discrete_inputs',
+    'hr': 'read_holding_registers',
+    'ir': 'read_input_registers',
+}
+BIT_TABLES = ('co', 'di')
+MAX_READ_REGISTERS = 125
+MAX_READ_BITS = 2000
+
+# 类型 -> (占用寄存器数, struct格式); bool在寄存器表中表示"非零"
+TYPE_FORMATS = {name: (words, None if name == 'bool' else '>' + char)
+                for name, (words, char) in TYPES.items()}
+
+
+class Tag(namedtuple('Tag', 'name table address type count scale offset byte_order word_order')):
+    """点定义; count>1 时表示从address开始的一组同类型数据, 读出为列表
+
+    寄存器表中的值为 原始值 * scale + offset, 字节序/字序见 tag_codec.Field
+    """
+    def __new__(cls, name, table, address, type='uint16', count=1, scale=1.0, offset=0.0,
+                byte_order='big', word_order='big'):
+        if table not in TABLE_FUNCTIONS:
+            raise ValueError(f"未知的表: {table}")
+        if table in BIT_TABLES and type != 'bool':
+            raise ValueError(f"{table} 表只能使用bool类型: {name}")
+        if type not in TYPE_FORMATS:
+            raise ValueError(f"未知的数据类型: {type}")
+        if byte_order not in ORDERS or word_order not in ORDERS:
+            raise ValueError(f"字节序/字序只能为 big 或 little: {name}")
+        return super().__new__(cls, name, table, address, type, count, scale, offset,
+                               byte_order, word_order)
+
+    @property
+    def width(self):
+        """占用的地址数量"""
+        if self.table in BIT_TABLES:
+            return self.count
+        return TYPE_FORMATS[self.type][0] * self.count
+
+
+# 一个读请求: 表, 起始地址, 数量, 以及覆盖的点
+ReadRequest = namedtuple('ReadRequest', 'table start count tags')
+
+
+def build_plan(tags, max_gap=8, max_bit_gap=64):
+    """把点表编译为读请求列表
+
+    max_gap: 寄存器表中两段之间允许一起读取的最大空洞(寄存器数)
+    max_bit_gap: 位表中允许的最大空洞(位数)
+    """
+    plan = []
+    by_table = {}
+    for tag in tags:
+        by_table.setdefault(tag.table, []).append(tag)
+    for table in sorted(by_table, key=TABLE_FUNCTIONS.get):
+        is_bits = table in BIT_TABLES
+        limit = MAX_READ_BITS if is_bits else MAX_READ_REGISTERS
+        gap = max_bit_gap if is_bits else max_gap
+        start = end = None
+        members = []
+        for tag in sorted(by_table[table], key=lambda t: t.address):
+            if tag.width > limit:
+                raise ValueError(f"点 {tag.name} 超过单次读取上限 {limit}")
+            tag_end = tag.address + tag.width
+            if start is not None and tag.address - end <= gap and max(end, tag_end) - start <= limit:
+                end = max(end, tag_end)
+                members.append(tag)
+                continue
+            if start is not None:
+                plan.append(ReadRequest(table, start, end - start, tuple(members)))
+            start, end, members = tag.address, tag_end, [tag]
+        if start is not None:
+            plan.append(ReadRequest(table, start, end - start, tuple(members)))
+    return plan
+
+
+def decode_tag(tag, values, offset):
+    """从一次读请求的结果中取出点的值"""
+    if tag.table in BIT_TABLES:
+        bits = [bool(b) for b in values[offset:offset + tag.count]]
+        return bits if tag.count > 1 else bits[0]
+    codec = compile_codec((tag,))
+    return codec.decode(values[offset:offset + tag.width])[tag.name]
+
+
+class PollPlanner:
+    """缓存轮询计划的规划器"""
+    def __init__(self, tags=(), max_gap=8, max_bit_gap=64):
+        self.max_gap = max_gap
+        self.max_bit_gap = max_bit_gap
+        self._tags = {}
+        self._plan = None
+        self.rebuilds = 0
+        for tag in tags:
+            self.add(tag)
+
+    @property
+    def tags(self):
+        return list(self._tags.values())
+
+    def add(self, tag):
+        if self._tags.get(tag.name) != tag:
+            self._tags[tag.name] = tag
+            self._plan = None
+
+    def remove(self, name):
+        if self._tags.pop(name, None) is not None:
+            self._plan = None
+
+    @property
+    def plan(self):
+        """当前计划; 点表未变化时直接返回缓存"""
+        if self._plan is None:
+            self._plan = build_plan(self._tags.values(), self.max_gap, self.max_bit_gap)
+            self.rebuilds += 1
+        return self._plan
+
+    def read(self, client, **kwargs):
+        """按计划读取, 返回 {名称: 值}; 任一请求失败返回None
+
+        kwargs 原样传给客户端读函数(如 unit=1)
+        """
+        values = {}
+        for request in self.plan:
+            reader = getattr(client, TABLE_READERS[request.table])
+            if not self._collect(request, reader(request.start, request.count, **kwargs), values):
+                return None
+        return values
+
+    async def read_async(self, client, **kwargs):
+        """read() 的异步版本, client 的读函数为协程(如 AsyncModbusClient)"""
+        values = {}
+        for request in self.plan:
+            reader = getattr(client, TABLE_READERS[request.table])
+            if not self._collect(request, await reader(request.start, request.count, **kwargs), values):
+                return None
+        return values
+
+    @staticmethod
+    def _collect(request, result, values):
+        if result.isError():
+            return False
+        if request.table in BIT_TABLES:
+            for tag in request.tags:
+                values[tag.name] = decode_tag(tag, result.bits, tag.address - request.start)
+        else:
+            codec = compile_codec(request.tags, request.start, request.count)
+            values.update(codec.decode(result.registers[:request.count]))
+        return True
@@ -0,0 +1,148 @@
+# poll_scheduler.py
+"""按绝对截止时间运行的轮询调度器
+
+每个任务的下一次截止时间 = 上一次截止时间 + 周期, 读取和写盘的耗时不会累积成漂移;
+落后超过一个周期时跳过错过的节拍(计入 missed), 保持原来的相位。
+统计每个任务的执行次数、错过的节拍、抖动(实际开始时间 - 截止时间)和往返时间。
+
+自适应(给出 deadbands 时启用): 回调返回 {点名: 值},
+  - 任一点变化超过其死区: 周期减半, 不低于 min_interval
+  - 所有点都没有明显变化: 周期乘以 growth, 不超过 max_interval
+  - 周期至少为 rtt_factor 倍的往返时间(回调耗时的滑动平均), 慢速链路自动降频
+
+    scheduler = PollScheduler()
+    scheduler.add('sensors', read_sensors, 5.0, min_interval=1.0, max_interval=60.0,
+                  deadbands={'temperature': 0.1, 'humidity': 0.5})
+    scheduler.run()
+"""
+import heapq
+import threading
+import time
+from collections import deque
+
+
+class PollTask:
+    """一个周期任务及其统计"""
+    def __init__(self, name, callback, interval, min_interval=None, max_interval=None,
+                 deadbands=None, growth=1.25, rtt_factor=4.0):
+        self.name = name
+        self.callback = callback
+        self.interval = interval
+        self.min_interval = interval if min_interval is None else min_interval
+        self.max_interval = interval if max_interval is None else max_interval
+        self.deadbands = deadbands
+        self.growth = growth
+        self.rtt_factor = rtt_factor
+        self.deadline = None
+        self.last_values = {}
+        # 统计
+        self.runs = 0
+        self.missed = 0
+        self.errors = 0
+        self.rtt = None  # 回调耗时的滑动平均(秒)
+        self.max_jitter = 0.0
+        self.jitters = deque(maxlen=1000)
+
+    @property
+    def adaptive(self):
+        return self.deadbands is not None and self.min_interval < self.max_interval
+
+    def _changed(self, values):
+        changed = False
+        for name, value in values.items():
+            last = self.last_values.get(name)
+            if last is None or abs(value - last) > self.deadbands.get(name, 0):
+                self.last_values[name] = value  # 与上次明显变化时的值比较, 缓慢漂移也能被发现
+                changed = True
+        return changed
+
+    def adapt(self, values, elapsed):
+        """根据本次结果和耗时调整周期"""
+        self.rtt = elapsed if self.rtt is None else self.rtt * 0.8 + elapsed * 0.2
+        if not self.adaptive:
+            return
+        if isinstance(values, dict) and self._changed(values):
+            interval = self.interval / 2
+        else:
+            interval = self.interval * self.growth
+        interval = max(interval, self.rtt * self.rtt_factor)
+        self.interval = min(self.max_interval, max(self.min_interval, interval))
+
+    def jitter_percentile(self, p):
+        values = sorted(self.jitters)
+        return values[min(len(values) - 1, int(p / 100.0 * len(values)))] if values else 0.0
+
+    def summary(self):
+        rtt = (self.rtt or 0.0) * 1000
+        return (f"{self.name}: 执行 {self.runs} 次, 错过节拍 {self.missed} 次, 出错 {self.errors} 次, "
+                f"抖动 p50 {self.jitter_percentile(50) * 1000:.2f}ms p99 {self.jitter_percentile(99) * 1000:.2f}ms "
+                f"最大 {self.max_jitter * 1000:.2f}ms, 往返 {rtt:.2f}ms, 当前周期 {self.interval:.2f}s")
+
+
+class PollScheduler:
+    """单线程调度器, 总是先执行截止时间最早的任务"""
+    def __init__(self, clock=time.monotonic):
+        self.clock = clock
+        self.tasks = {}
+        self._queue = []  # (截止时间, 序号, 任务)
+        self._counter = 0
+        self._stop = threading.Event()
+
+    def add(self, name, callback, interval, min_interval=None, max_interval=None,
+            deadbands=None, growth=1.25, rtt_factor=4.0, start=None):
+        """添加任务; start为第一次执行的时间(默认立即)"""
+        task = PollTask(name, callback, interval, min_interval, max_interval, deadbands, growth, rtt_factor)
+        task.deadline = self.clock() if start is None else start
+        self.tasks[name] = task
+        self._push(task)
+        return task
+
+    def _push(self, task):
+        self._counter += 1
+        heapq.heappush(self._queue, (task.deadline, self._counter, task))
+
+    def run_once(self):
+        """等待并执行下一个到期的任务; 被 stop() 打断时返回False"""
+        deadline, _, task = heapq.heappop(self._queue)
+        delay = deadline - self.clock()
+        if delay > 0 and self._stop.wait(delay):
+            self._push(task)  # 截止时间不变, 下次 run() 继续
+            return False
+        begin = self.clock()
+        jitter = begin - deadline
+        task.jitters.append(jitter)
+        task.max_jitter = max(task.max_jitter, jitter)
+        values = None
+        try:
+            values = task.callback()
+        except Exception as e:
+            task.errors += 1
+            print(f"任务 {task.name} 出错: {e}")
+        end = self.clock()
+        task.runs += 1
+        task.adapt(values, end - begin)
+        # 下一个截止时间按绝对时间推进; 已经错过的节拍直接跳过
+        task.deadline = deadline + task.interval
+        if task.deadline <= end:
+            skipped = int((end - task.deadline) // task.interval) + 1
+            task.missed += skipped
+            task.deadline += skipped * task.interval
+        self._push(task)
+        return True
+
+    def run(self, duration=None):
+        """运行直到 stop() 被调用(或经过duration秒)"""
+        self._stop.clear()
+        if duration is not None:
+            timer = threading.Timer(duration, self.stop)
+            timer.daemon = True
+            timer.start()
+        while self._queue and not self._stop.is_set():
+            self.run_once()
+
+    def stop(self):
+        """线程安全地停止 run()"""
+        self._stop.set()
+
+    def summary(self):
+        return '\n'.join(task.summary() for task in self.tasks.values())
@@ -0,0 +1,106 @@
+# polling_session.py
+"""持久轮询会话
+
+保持一条Modbus TCP长连接, 断线后按指数退避自动重连;
+同一次轮询中相邻地址的读取合并为一个请求, 并统计节省的往返次数。
+"""
+import time
+from pymodbus.client.sync import ModbusTcpClient as ModbusClient
+from pymodbus.exceptions import ModbusIOException
+
+MAX_READ_REGISTERS = 125  # 单次读寄存器的协议上限
+
+
+def merge_addresses(addresses, max_count=MAX_READ_REGISTERS):
+    """把地址合并为连续区间, 返回[(起始地址, 数量), ...]"""
+    ranges = []
+    for address in sorted(set(addresses)):
+        if ranges:
+            start, count = ranges[-1]
+            if address == start + count and count < max_count:
+                ranges[-1] = (start, count + 1)
+                continue
+        ranges.append((address, 1))
+    return ranges
+
+
+class PollingSession:
+    """带自动重连和读合并的持久会话"""
+    def __init__(self, host, port=502, unit=1, timeout=3,
+                 backoff_initial=0.5, backoff_max=30.0):
+        self.client = ModbusClient(host, port=port, timeout=timeout)
+        self.unit = unit
+        self.backoff_initial = backoff_initial
+        self.backoff_max = backoff_max
+        self._backoff = backoff_initial
+        self._next_attempt = 0.0
+        self._connected = False
+        # 统计: 轮询次数, 实际请求数, 合并前的请求数, 建立连接次数
+        self.stats = {'polls': 0, 'requests': 0, 'naive_requests': 0, 'connects': 0}
+
+    @property
+    def round_trips_saved(self):
+        """相对“每次轮询都重新连接+每个地址单独请求”节省的往返次数"""
+        naive = self.stats['naive_requests'] + self.stats['polls']
+        actual = self.stats['requests'] + self.stats['connects']
+        return naive - actual
+
+    def summary(self):
+        s = self.stats
+        return (f"轮询 {s['polls']} 次, 请求 {s['requests']} 次(合并前 {s['naive_requests']} 次), "
+                f"建立连接 {s['connects']} 次, 节省往返 {self.round_trips_saved} 次")
+
+    def connect(self):
+        """确保连接可用; 处于退避期内直接返回False而不阻塞"""
+        if self._connected and self.client.is_socket_open():
+            return True
+        now = time.monotonic()
+        if now < self._next_attempt:
+            return False
+        if self.client.connect():
+            self._connected = True
+            self._backoff = self.backoff_initial
+            self.stats['connects'] += 1
+            return True
+        self._mark_failed()
+        return False
+
+    def _mark_failed(self):
+        self._connected = False
+        self.client.close()
+        self._next_attempt = time.monotonic() + self._backoff
+        self._backoff = min(self._backoff * 2, self.backoff_max)
+
+    def read_holding_registers(self, tags):
+        """读取 {名称: 地址} 对应的保持寄存器, 返回 {名称: 原始值}; 失败返回None"""
+        if not self.connect():
+            return None  # 退避期内或连接失败: 没有发出请求, 不计入统计
+        self.stats['polls'] += 1
+        self.stats['naive_requests'] += len(tags)
+        values = {}
+        try:
+            for start, count in merge_addresses(tags.values()):
+                self.stats['requests'] += 1
+                result = self.client.read_holding_registers(start, count, unit=self.unit)
+                if isinstance(result, ModbusIOException):
+                    # 超时或连接中断, 进入退避后重连
+                    self._mark_failed()
+                    return None
+                if result.isError():
+                    return None
+                for offset, value in enumerate(result.registers):
+                    values[start + offset] = value
+        except Exception as e:
+            print(f"通信错误, 稍后重连: {e}")
+            self._mark_failed()
+            return None
+        return {name: values[address] for name, address in tags.items()}
+
+    def read_block(self, start, count):
+        """读取从start开始的count个保持寄存器, 返回列表; 失败返回None"""
+        values = self.read_holding_registers({address: address for address in range(start, start + count)})
+        return None if values is None else [values[address] for address in range(start, start + count)]
+
+    def close(self):
+        self._connected = False
+        self.client.close()
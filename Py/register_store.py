@@ -0,0 +1,290 @@
+# register_store.py
+"""紧凑寄存器存储
+
+保持/输入寄存器用 array('H') 连续存放，线圈/离散输入按位压缩在 bytearray 中。
+每张表默认覆盖完整的 65536 地址空间，读取时返回视图而不是拷贝。
+表也可以建在外部缓冲区上(SharedRegisterStore 用共享内存), 供多个进程共用。
+"""
+from array import array
+import multiprocessing
+from multiprocessing import shared_memory
+import threading
+from pymodbus.datastore.store import BaseModbusDataBlock
+
+ADDRESS_SPACE = 65536  # 每张表的地址数量
+MAX_DIRTY_RANGES = 1024  # 未取走的脏区间过多时合并为一个大区间
+
+
+class DirtyRanges:
+    """记录被写过的地址区间, 供界面只刷新变化部分(单一消费者)"""
+    def __init__(self):
+        self._ranges = []
+        self._lock = threading.Lock()
+
+    def mark(self, start, end):
+        with self._lock:
+            ranges = self._ranges
+            if len(ranges) >= MAX_DIRTY_RANGES:
+                lo = min(r[0] for r in ranges)
+                hi = max(r[1] for r in ranges)
+                self._ranges = [(min(lo, start), max(hi, end))]
+            else:
+                ranges.append((start, end))
+
+    def take(self):
+        """取走并合并全部脏区间, 返回按地址排序的 [(起始, 结束), ...]"""
+        with self._lock:
+            ranges, self._ranges = self._ranges, []
+        merged = []
+        for start, end in sorted(ranges):
+            if merged and start <= merged[-1][1]:
+                merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+            else:
+                merged.append((start, end))
+        return merged
+
+
+class RegisterTable:
+    """16位寄存器表(array('H')存储, 或传入 buffer 建在外部内存上)"""
+    def __init__(self, size=ADDRESS_SPACE, buffer=None):
+        self.size = size
+        if buffer is None:
+            self.data = array('H', bytes(2 * size))
+            self._view = memoryview(self.data)
+        else:
+            self.data = self._view = memoryview(buffer)[:2 * size].cast('H')
+        self.dirty = None  # 调用 track_changes() 后才记录脏区间
+
+    def __len__(self):
+        return self.size
+
+    def track_changes(self):
+        """开启脏区间记录并返回 DirtyRanges"""
+        if self.dirty is None:
+            self.dirty = DirtyRanges()
+        return self.dirty
+
+    def get(self, address, count=1):
+        """返回[address, address+count)的只读视图(不拷贝)"""
+        return self._view[address:address + count]
+
+    def set(self, address, values):
+        if isinstance(values, int):
+            values = [values]
+        self._view[address:address + len(values)] = array('H', values)
+        if self.dirty is not None:
+            self.dirty.mark(address, address + len(values))
+
+    def clear(self):
+        self._view.cast('B')[:] = bytes(2 * self.size)
+        if self.dirty is not None:
+            self.dirty.mark(0, self.size)
+
+    def as_numpy(self):
+        """共享同一块内存的NumPy视图, 用于批量更新"""
+        import numpy as np
+        return np.frombuffer(self.data, dtype=np.uint16)
+
+
+class BitView:
+    """位表切片的惰性视图, 迭代时才解包"""
+    __slots__ = ('_bits', '_start', '_count')
+
+    def __init__(self, bits, start, count):
+        self._bits = bits
+        self._start = start
+        self._count = count
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += self._count
+        if not 0 <= index < self._count:
+            raise IndexError("位索引越界")
+        i = self._start + index
+        return bool(self._bits[i >> 3] & (1 << (i & 7)))
+
+    def __iter__(self):
+        bits = self._bits
+        for i in range(self._start, self._start + self._count):
+            yield bool(bits[i >> 3] & (1 << (i & 7)))
+
+    def __eq__(self, other):
+        return list(self) == list(other)
+
+    def __repr__(self):
+        return repr([int(b) for b in self])
+
+
+class BitTable:
+    """按位压缩的线圈/离散输入表(每字节8个点)
+
+    lock: 多个进程共用同一缓冲区时传入 multiprocessing.Lock, 写位(读-改-写整字节)时持有
+    """
+    def __init__(self, size=ADDRESS_SPACE, buffer=None, lock=None):
+        self.size = size
+        if buffer is None:
+            self.data = bytearray((size + 7) // 8)
+        else:
+            self.data = memoryview(buffer)[:(size + 7) // 8]
+        self.lock = lock
+        self.dirty = None  # 调用 track_changes() 后才记录脏区间
+
+    def __len__(self):
+        return self.size
+
+    def track_changes(self):
+        """开启脏区间记录并返回 DirtyRanges"""
+        if self.dirty is None:
+            self.dirty = DirtyRanges()
+        return self.dirty
+
+    def get(self, address, count=1):
+        return BitView(self.data, address, count)
+
+    def set(self, address, values):
+        if self.lock is None:
+            self._set(address, values)
+        else:
+            with self.lock:
+                self._set(address, values)
+
+    def _set(self, address, values):
+        if isinstance(values, int):
+            values = [values]
+        data = self.data
+        count = 0
+        for i, value in enumerate(values, address):
+            if value:
+                data[i >> 3] |= 1 << (i & 7)
+            else:
+                data[i >> 3] &= ~(1 << (i & 7)) & 0xFF
+            count += 1
+        if self.dirty is not None:
+            self.dirty.mark(address, address + count)
+
+    def clear(self):
+        if self.lock is None:
+            self.data[:] = bytes(len(self.data))
+        else:
+            with self.lock:
+                self.data[:] = bytes(len(self.data))
+        if self.dirty is not None:
+            self.dirty.mark(0, self.size)
+
+
+class ArrayDataBlock(BaseModbusDataBlock):
+    """把 RegisterTable/BitTable 适配为 pymodbus 数据块"""
+    def __init__(self, table, address=0):
+        self.table = table
+        self.address = address
+        self.values = table.data
+        self.default_value = 0
+
+    def reset(self):
+        self.table.clear()
+
+    def validate(self, address, count=1):
+        start = address - self.address
+        return 0 <= start and start + count <= self.table.size
+
+    def getValues(self, address, count=1):
+        return self.table.get(address - self.address, count)
+
+    def setValues(self, address, values):
+        self.table.set(address - self.address, values)
+
+    def __iter__(self):
+        return enumerate(self.table.get(0, self.table.size), self.address)
+
+
+class RegisterStore:
+    """按从站ID管理四类寄存器表, 首次访问某个从站时才分配"""
+    def __init__(self, size=ADDRESS_SPACE):
+        self.size = size
+        self._units = {}
+
+    def unit(self, unit_id):
+        """返回从站的表字典: di/co 为位表, hr/ir 为寄存器表"""
+        tables = self._units.get(unit_id)
+        if tables is None:
+            tables = {
+                'di': BitTable(self.size),
+                'co': BitTable(self.size),
+                'hr': RegisterTable(self.size),
+                'ir': RegisterTable(self.size),
+            }
+            self._units[unit_id] = tables
+        return tables
+
+    def __contains__(self, unit_id):
+        return unit_id in self._units
+
+    def __iter__(self):
+        return iter(self._units.items())
+
+    def __len__(self):
+        return len(self._units)
+
+
+class SharedRegisterStore(RegisterStore):
+    """建在 multiprocessing.shared_memory 上的寄存器存储
+
+    所有从站的表在创建时一次分配到同一块共享内存, 其他进程用 attach() 按名称挂接,
+    任一进程的写入对所有进程立即可见。脏区间记录只在本进程内有效。
+    线圈/离散输入按位压缩, 写位要读-改-写整字节, 因此所有进程的位表共用一把
+    跨进程锁(lock 属性); 挂接时须传入创建者的锁(例如作为子进程参数传递)。
+    """
+    def __init__(self, unit_ids=(0,), size=ADDRESS_SPACE, name=None, create=True, lock=None):
+        super().__init__(size)
+        self.unit_ids = list(unit_ids)
+        self.owner = create
+        if lock is None:
+            if not create:
+                raise ValueError("挂接共享存储时必须传入创建者的 lock")
+            lock = multiprocessing.Lock()
+        self.lock = lock
+        layout, unit_bytes = self._layout(size)
+        self.shm = shared_memory.SharedMemory(name=name, create=create, size=unit_bytes * len(self.unit_ids))
+        self.name = self.shm.name
+        for i, unit_id in enumerate(self.unit_ids):
+            base = i * unit_bytes
+            tables = self._units[unit_id] = {}
+            for key, table_type, start, end in layout:
+                buffer = self.shm.buf[base + start:base + end]
+                tables[key] = BitTable(size, buffer, lock) if table_type is BitTable else RegisterTable(size, buffer)
+
+    @staticmethod
+    def _layout(size):
+        """每个从站内四张表的排列: ([(键, 类型, 起始, 结束), ...], 每个从站的字节数)"""
+        layout, offset = [], 0
+        for key, table_type, nbytes in (('hr', RegisterTable, 2 * size), ('ir', RegisterTable, 2 * size),
+                                        ('co', BitTable, (size + 7) // 8), ('di', BitTable, (size + 7) // 8)):
+            layout.append((key, table_type, offset, offset + nbytes))
+            offset += nbytes
+        return layout, offset
+
+    @classmethod
+    def attach(cls, name, lock, unit_ids=(0,), size=ADDRESS_SPACE):
+        """在其他进程中挂接已创建的共享存储(lock为创建者的 store.lock, unit_ids和size须与创建时一致)"""
+        return cls(unit_ids, size, name=name, create=False, lock=lock)
+
+    def unit(self, unit_id):
+        tables = self._units.get(unit_id)
+        if tables is None:
+            raise KeyError(f"从站 {unit_id} 不在共享存储中")
+        return tables
+
+    def close(self):
+        """释放本进程的映射; 创建者同时删除共享内存"""
+        for tables in self._units.values():
+            for table in tables.values():
+                views = [table.data] + ([table._view] if isinstance(table, RegisterTable) else [])
+                for view in views:
+                    view.release()
+        self._units = {}
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
@@ -0,0 +1,94 @@
+# register_view.py
+"""增量刷新的寄存器表格视图
+
+模型直接读取寄存器表(不经过带日志的数据块, 不产生日志也不占用服务器),
+每次刷新只对 setValues 记录下的脏区间发出 dataChanged, 未变化的单元格不重绘。
+表格可滚动浏览完整的 0-65535 地址空间。
+"""
+from PyQt5.QtCore import Qt, QAbstractTableModel, QModelIndex
+from PyQt5.QtWidgets import QTabWidget, QTableView, QAbstractItemView
+from PyQt5 import QtGui
+
+# (页签名, 表键, 是否为位表)
+TABLE_PAGES = [
+    ('AO保持寄存器', 'hr', False),
+    ('AI输入寄存器', 'ir', False),
+    ('DO线圈', 'co', True),
+    ('DI离散输入', 'di', True),
+]
+
+
+class RegisterTableModel(QAbstractTableModel):
+    """单张寄存器表的只读模型: 列为 地址 / 值"""
+    HEADERS = ('地址', '值')
+
+    def __init__(self, table=None, is_bits=False, parent=None):
+        super().__init__(parent)
+        self.is_bits = is_bits
+        self.table = None
+        self.dirty = None
+        self.set_table(table)
+
+    def set_table(self, table):
+        self.beginResetModel()
+        self.table = table
+        self.dirty = table.track_changes() if table is not None else None
+        self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() or self.table is None else len(self.table)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.HEADERS[section]
+        return None
+
+    def data(self, index, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole or not index.isValid():
+            return None
+        address = index.row()
+        if index.column() == 0:
+            return str(address)
+        value = self.table.get(address)[0]
+        if self.is_bits:
+            return '●' if value else '○'
+        return str(value)
+
+    def refresh(self):
+        """只通知发生变化的行"""
+        if self.dirty is None:
+            return
+        for start, end in self.dirty.take():
+            end = min(end, len(self.table))
+            if start < end:
+                self.dataChanged.emit(self.index(start, 1), self.index(end - 1, 1), [Qt.DisplayRole])
+
+
+class RegisterPanel(QTabWidget):
+    """四类寄存器的分页表格"""
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.models = {}
+        for title, key, is_bits in TABLE_PAGES:
+            model = RegisterTableModel(is_bits=is_bits, parent=self)
+            view = QTableView()
+            view.setModel(model)
+            view.setFont(QtGui.QFont("Consolas", 9))
+            view.verticalHeader().setVisible(False)
+            view.verticalHeader().setDefaultSectionSize(20)
+            view.horizontalHeader().setStretchLastSection(True)
+            view.setEditTriggers(QAbstractItemView.NoEditTriggers)
+            self.models[key] = model
+            self.addTab(view, title)
+
+    def set_tables(self, tables):
+        """绑定一个从站的寄存器表字典(RegisterStore.unit()的返回值)"""
+        for key, model in self.models.items():
+            model.set_table(tables[key] if tables else None)
+
+    def refresh(self):
+        for model in self.models.values():
+            model.refresh()
@@ -0,0 +1,180 @@
+# request_log.py
+"""非阻塞请求日志
+
+服务器线程只把原始记录放进队列, 格式化和输出由后台线程批量完成。
+支持按功能码抽样/限速, 以及文本或 JSON lines 两种输出格式。
+"""
+import json
+import queue
+import sys
+import threading
+import time
+from datetime import datetime
+
+# 请求分类器
+def get_reg_type(function_code):
+    return {
+        1: 'DO', 2: 'DI', 3: 'AO', 4: 'AI',
+        5: 'DO', 6: 'AO', 15: 'DO', 16: 'AO'
+    }.get(function_code, 'UNKNOWN')
+
+# 调用方没有给出功能码时, 数据块访问按此归到功能码(用于按功能码抽样/限速)
+ACCESS_FUNCTION_CODES = {
+    ('DO', '读取'): 1, ('DI', '读取'): 2, ('AO', '读取'): 3, ('AI', '读取'): 4,
+    ('DO', '写入'): 15, ('AO', '写入'): 16,
+}
+
+
+def stdout_sink(lines):
+    """默认输出: 一次性写到标准输出"""
+    sys.stdout.write("\n".join(lines) + "\n")
+    sys.stdout.flush()
+
+
+class RequestLogger:
+    """后台批量写出的请求日志
+
+    sink: 接收一批已格式化行(list)的回调, 在后台线程中调用
+    sample_rates: {功能码: 保留比例}, 例如 {3: 0.1} 表示每10条读保持寄存器记录保留1条
+    rate_limits: {功能码: 每秒最多条数}
+    请求记录(request)和数据块访问记录(access)分别抽样和限速
+    typed_sink: 为True时sink收到 [(寄存器类型, 行), ...], 便于界面按类型过滤
+    """
+    def __init__(self, sink=stdout_sink, json_lines=False, batch_size=200,
+                 flush_interval=0.2, sample_rates=None, rate_limits=None,
+                 max_queue=100000, typed_sink=False):
+        self.sink = sink
+        self.json_lines = json_lines
+        self.typed_sink = typed_sink
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.sample_every = {fc: max(1, round(1 / rate)) for fc, rate in (sample_rates or {}).items() if rate > 0}
+        self.muted = {fc for fc, rate in (sample_rates or {}).items() if rate <= 0}
+        self.rate_limits = dict(rate_limits or {})
+        self.dropped = 0
+        self._seen = {}
+        self._window = {}  # (记录类型, 功能码) -> [当前秒, 本秒已记录条数]
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._thread = None
+        self._stopping = threading.Event()
+
+    def start(self):
+        if self._thread is None:
+            self._stopping.clear()
+            self._thread = threading.Thread(target=self._run, name="request-log", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        """停止后台线程, 并写出队列中剩余的记录"""
+        if self._thread is not None:
+            self._stopping.set()
+            self._thread.join()
+            self._thread = None
+
+    def accept(self, function_code, kind='request'):
+        """抽样和限速判断, 在热路径上调用, 只做计数; kind为'request'或'access'"""
+        if function_code in self.muted:
+            self.dropped += 1
+            return False
+        key = (kind, function_code)
+        every = self.sample_every.get(function_code)
+        if every is not None:
+            seen = self._seen.get(key, 0)
+            self._seen[key] = seen + 1
+            if seen % every:
+                self.dropped += 1
+                return False
+        limit = self.rate_limits.get(function_code)
+        if limit is not None:
+            second = int(time.monotonic())
+            window = self._window.get(key)
+            if window is None or window[0] != second:
+                window = self._window[key] = [second, 0]
+            if window[1] >= limit:
+                self.dropped += 1
+                return False
+            window[1] += 1
+        return True
+
+    def _put(self, record):
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def request(self, request):
+        """记录一次请求(LoggingServerContext调用)"""
+        fc = request.function_code
+        if not self.accept(fc):
+            return
+        fields = {'reg_type': get_reg_type(fc), 'function_code': fc, 'unit_id': request.unit_id}
+        for name in ('address', 'count', 'values'):
+            if hasattr(request, name):
+                value = getattr(request, name)
+                fields[name] = list(value) if isinstance(value, (list, tuple)) else value
+        self._put((time.time(), 'request', fields))
+
+    def access(self, reg_type, op, address, count, values, function_code=None):
+        """记录一次数据块读写(LoggingDataBlock调用); op为'读取'或'写入', function_code为请求的功能码"""
+        if function_code is None:
+            function_code = ACCESS_FUNCTION_CODES.get((reg_type, op))
+        if not self.accept(function_code, 'access'):
+            return
+        values = [values] if isinstance(values, (int, bool)) else [int(v) for v in values]
+        self._put((time.time(), 'access', {
+            'reg_type': reg_type, 'op': op, 'address': address, 'count': count, 'values': values
+        }))
+
+    def format(self, record):
+        ts, kind, fields = record
+        if self.json_lines:
+            return json.dumps({'ts': ts, 'kind': kind, **fields}, ensure_ascii=False)
+        stamp = datetime.fromtimestamp(ts).strftime("%H:%M:%S.%f")[:-3]
+        if kind == 'access':
+            if fields['op'] == '读取':
+                return (f"[{stamp}] {fields['reg_type']}读取 → 地址: {fields['address']}, "
+                        f"数量: {fields['count']}, 返回值: {fields['values']}")
+            return f"[{stamp}] {fields['reg_type']}写入 → 地址: {fields['address']}, 写入值: {fields['values']}"
+        text = f"[{stamp}] {fields['reg_type']}操作请求 → 功能码: {fields['function_code']}, 从站ID: {fields['unit_id']}"
+        if 'address' in fields:
+            text += f", Modbus地址: {fields['address']} (实际地址: {fields['address']+1})"
+        if 'count' in fields:
+            text += f", 数量: {fields['count']}"
+        if 'values' in fields:
+            text += f", 写入数值: {fields['values']}"
+        return text
+
+    def _dropped_line(self, count):
+        if self.json_lines:
+            return json.dumps({'ts': time.time(), 'kind': 'dropped', 'count': count})
+        return f"(已丢弃 {count} 条日志)"
+
+    def _run(self):
+        reported = 0
+        while not (self._stopping.is_set() and self._queue.empty()):
+            # 攒满一批或到达刷新间隔后统一写出
+            batch = []
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=timeout))
+                except queue.Empty:
+                    break
+            if self.typed_sink:
+                lines = [(record[2]['reg_type'], self.format(record)) for record in batch]
+            else:
+                lines = [self.format(record) for record in batch]
+            dropped = self.dropped
+            if dropped != reported:
+                line = self._dropped_line(dropped - reported)
+                lines.append((None, line) if self.typed_sink else line)
+                reported = dropped
+            if lines:
+                try:
+                    self.sink(lines)
+                except Exception as e:
+                    print(f"日志输出错误: {e}", file=sys.stderr)
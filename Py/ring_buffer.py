@@ -0,0 +1,83 @@
+# ring_buffer.py
+"""定长历史缓冲区与绘图降采样
+
+RingBuffer 用预分配的NumPy数组保存最近 capacity 个采样(epoch秒时间戳 + 数值列),
+写满后覆盖最旧的数据, 内存占用固定。
+lttb / minmax 把任意长度的曲线降到固定点数, 让绘图耗时与运行时长无关。
+"""
+import numpy as np
+
+
+class RingBuffer:
+    """固定容量的时间序列环形缓冲区"""
+    def __init__(self, capacity, columns):
+        self.capacity = capacity
+        self.columns = tuple(columns)
+        self._times = np.zeros(capacity, dtype=np.float64)
+        self._values = np.zeros((capacity, len(self.columns)), dtype=np.float64)
+        self._next = 0
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def append(self, timestamp, values):
+        i = self._next
+        self._times[i] = timestamp
+        self._values[i] = values
+        self._next = (i + 1) % self.capacity
+        self._size = min(self._size + 1, self.capacity)
+
+    def _order(self, array):
+        if self._size < self.capacity:
+            return array[:self._size]
+        return np.concatenate((array[self._next:], array[:self._next]))
+
+    def times(self):
+        """按时间顺序返回时间戳数组"""
+        return self._order(self._times)
+
+    def column(self, name):
+        """按时间顺序返回某一列"""
+        return self._order(self._values[:, self.columns.index(name)])
+
+    def latest(self):
+        if not self._size:
+            return None
+        i = (self._next - 1) % self.capacity
+        return self._times[i], dict(zip(self.columns, self._values[i]))
+
+
+def minmax(x, y, buckets):
+    """每个桶保留最小值和最大值两个点(保留尖峰), 结果最多 2*buckets 个点"""
+    n = len(x)
+    if n <= 2 * buckets:
+        return x, y
+    edges = np.linspace(0, n, buckets + 1).astype(int)
+    idx = []
+    for lo, hi in zip(edges[:-1], edges[1:]):
+        seg = y[lo:hi]
+        a, b = lo + int(np.argmin(seg)), lo + int(np.argmax(seg))
+        idx.extend((a, b) if a <= b else (b, a))
+    idx = np.array(idx)
+    return x[idx], y[idx]
+
+
+def lttb(x, y, threshold):
+    """Largest-Triangle-Three-Buckets 降采样, 保留首尾点, 结果为 threshold 个点"""
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return x, y
+    edges = np.linspace(1, n - 1, threshold - 1).astype(int)
+    idx = np.empty(threshold, dtype=int)
+    idx[0], idx[-1] = 0, n - 1
+    a = 0
+    for i in range(threshold - 2):
+        lo, hi = edges[i], edges[i + 1]
+        # 下一个桶的平均点(最后一个桶用末尾点)
+        nlo, nhi = edges[i + 1], edges[i + 2] if i + 2 < len(edges) else n
+        avg_x, avg_y = x[nlo:nhi].mean(), y[nlo:nhi].mean()
+        area = np.abs((x[a] - avg_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y - y[a]))
+        a = lo + int(np.argmax(area))
+        idx[i + 1] = a
+    return x[idx], y[idx]
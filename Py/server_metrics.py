@@ -0,0 +1,142 @@
+# server_metrics.py
+"""从站请求指标
+
+按 (功能码, 从站ID) 统计请求数、异常响应数、PDU字节数和固定分桶的处理耗时直方图。
+每个线程写自己的分片(threading.local), 记录时不加锁; 采集时才合并各分片,
+已退出线程的分片在登记新线程或采集时并入汇总后丢弃。
+字节数由服务器按实际收发的帧长度传入, 不重新编码请求/响应。输出为 Prometheus 文本格式, 可由
+serve_http() 单独提供, 或挂到 web_monitor 的 /metrics 路由上。
+"""
+import threading
+import time
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# 处理耗时分桶上限(秒)
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# 统计项下标
+COUNT, ERRORS, BYTES_IN, BYTES_OUT, SECONDS, BUCKETS = range(6)
+
+
+class ServerMetrics:
+    """按线程分片聚合的请求指标"""
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.started = time.time()
+        self._local = threading.local()
+        self._shards = []  # [(线程, 分片)]
+        self._retired = {}  # 已退出线程的汇总
+        self._lock = threading.Lock()  # 只在登记新线程和采集时使用
+
+    def _shard(self):
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = self._local.shard = {}
+            with self._lock:
+                # 同步服务器每个连接一个线程, 登记时顺便回收已退出的线程
+                self._retire_dead()
+                self._shards.append((threading.current_thread(), shard))
+        return shard
+
+    def _retire_dead(self):
+        alive = []
+        for thread, shard in self._shards:
+            if thread.is_alive():
+                alive.append((thread, shard))
+            else:
+                self._merge(self._retired, shard)
+        self._shards = alive
+
+    def observe(self, function_code, unit_id, seconds, error=False, bytes_in=0, bytes_out=0):
+        shard = self._shard()
+        stats = shard.get((function_code, unit_id))
+        if stats is None:
+            stats = shard[(function_code, unit_id)] = [0, 0, 0, 0, 0.0, [0] * (len(self.buckets) + 1)]
+        stats[COUNT] += 1
+        if error:
+            stats[ERRORS] += 1
+        stats[BYTES_IN] += bytes_in
+        stats[BYTES_OUT] += bytes_out
+        stats[SECONDS] += seconds
+        stats[BUCKETS][bisect_left(self.buckets, seconds)] += 1
+
+    @staticmethod
+    def _merge(total, shard):
+        for key, stats in list(shard.items()):
+            merged = total.get(key)
+            if merged is None:
+                merged = total[key] = [0, 0, 0, 0, 0.0, [0] * len(stats[BUCKETS])]
+            for i in range(SECONDS + 1):
+                merged[i] += stats[i]
+            buckets = merged[BUCKETS]
+            for i, n in enumerate(list(stats[BUCKETS])):
+                buckets[i] += n
+
+    def snapshot(self):
+        """合并所有分片, 返回 {(功能码, 从站ID): [请求数, 错误数, 收字节, 发字节, 总耗时, 分桶计数]}"""
+        with self._lock:
+            self._retire_dead()
+            total = {}
+            self._merge(total, self._retired)
+            for _, shard in self._shards:
+                self._merge(total, shard)
+        return total
+
+    def render(self):
+        """Prometheus 文本格式"""
+        snapshot = sorted(self.snapshot().items())
+        lines = [
+            '# HELP modbus_uptime_seconds 从站运行时间',
+            '# TYPE modbus_uptime_seconds gauge',
+            f'modbus_uptime_seconds {time.time() - self.started:.3f}',
+        ]
+
+        def counter(name, help_text, index):
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} counter')
+            for (fc, unit), stats in snapshot:
+                lines.append(f'{name}{{function_code="{fc}",unit="{unit}"}} {stats[index]}')
+
+        counter('modbus_requests_total', '请求数', COUNT)
+        counter('modbus_request_errors_total', '异常响应数', ERRORS)
+        counter('modbus_request_bytes_total', '收到的请求PDU字节数', BYTES_IN)
+        counter('modbus_response_bytes_total', '发出的响应PDU字节数', BYTES_OUT)
+        name = 'modbus_request_duration_seconds'
+        lines.append(f'# HELP {name} 请求处理耗时')
+        lines.append(f'# TYPE {name} histogram')
+        for (fc, unit), stats in snapshot:
+            labels = f'function_code="{fc}",unit="{unit}"'
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float('inf'),), stats[BUCKETS]):
+                cumulative += n
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                lines.append(f'{name}_bucket{{{labels},le="{le}"}} {cumulative}')
+            lines.append(f'{name}_sum{{{labels}}} {stats[SECONDS]:.6f}')
+            lines.append(f'{name}_count{{{labels}}} {stats[COUNT]}')
+        return '\n'.join(lines) + '\n'
+
+    def serve_http(self, host='0.0.0.0', port=9102):
+        """在后台线程提供 /metrics, 返回 HTTP 服务器(调用 shutdown() 停止)"""
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] != '/metrics':
+                    self.send_error(404)
+                    return
+                body = metrics.render().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', CONTENT_TYPE)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+        return server
@@ -0,0 +1,145 @@
+# sharded_slave.py
+"""多进程分片从站
+
+单个Python进程受GIL限制只能用满一个核。这里启动N个工作进程, 每个进程运行一个
+asyncio从站, 寄存器表放在共享内存中(SharedRegisterStore), 任一进程收到的写入
+对其他进程立即可见。支持SO_REUSEPORT的系统上所有进程监听同一端口, 由内核分配连接;
+否则(或指定 port_range)各进程依次监听 port, port+1, ...
+
+    python sharded_slave.py --workers 4 --port 5020
+"""
+import argparse
+import multiprocessing
+import os
+import queue
+import socket
+import time
+from register_store import SharedRegisterStore, ADDRESS_SPACE
+from request_log import RequestLogger, stdout_sink
+
+
+def _prefixed_sink(prefix):
+    def sink(lines):
+        stdout_sink([f"{prefix} {line}" for line in lines])
+    return sink
+
+
+def _worker(index, store_name, lock, unit_ids, size, address, reuse_port, log, ready):
+    """工作进程: 挂接共享寄存器表并运行asyncio从站"""
+    from modbus_slave_simulator import build_server_context
+    from async_server import AsyncModbusServer
+    store = SharedRegisterStore.attach(store_name, lock, unit_ids or [0], size)
+    logger = RequestLogger(sink=_prefixed_sink(f"[进程{index}]")).start() if log else None
+    server = AsyncModbusServer(build_server_context(store, unit_ids, logger), address, reuse_port=reuse_port)
+    try:
+        server.start_in_thread()
+        ready.put((index, server.port, None))
+        while server.started.wait(1.0):
+            pass  # 服务器线程退出时 started 被清除
+    except KeyboardInterrupt:
+        pass
+    except Exception as e:
+        ready.put((index, None, str(e)))
+    finally:
+        server.stop()
+        if logger:
+            logger.stop()
+
+
+class ShardedSlave:
+    """共享寄存器表的多进程从站
+
+    store 属性是父进程中的共享存储, 可直接读写(例如由信号发生器更新输入寄存器)。
+    """
+    def __init__(self, host='0.0.0.0', port=5020, workers=None, unit_ids=None, port_range=False,
+                 log=True, size=ADDRESS_SPACE):
+        self.host = host
+        self.port = port
+        self.workers = workers or os.cpu_count() or 1
+        self.unit_ids = list(unit_ids) if unit_ids else None
+        self.reuse_port = not port_range and hasattr(socket, 'SO_REUSEPORT')
+        self.log = log
+        self.size = size
+        self.store = None
+        self.ports = []
+        self._processes = []
+
+    def start(self, timeout=30):
+        """创建共享内存并启动全部工作进程, 等到所有进程开始监听后返回"""
+        ctx = multiprocessing.get_context('spawn')
+        # 位表写入的跨进程锁须来自spawn上下文才能传给工作进程
+        self.store = SharedRegisterStore(self.unit_ids or [0], self.size, lock=ctx.Lock())
+        ready = ctx.Queue()
+        port = self.port
+        try:
+            for index in range(self.workers):
+                if not self.reuse_port and self.port:
+                    port = self.port + index
+                process = ctx.Process(
+                    target=_worker, name=f"modbus-shard-{index}", daemon=True,
+                    args=(index, self.store.name, self.store.lock, self.unit_ids, self.size, (self.host, port),
+                          self.reuse_port, self.log, ready))
+                process.start()
+                self._processes.append(process)
+                bound = self._wait_ready(ready, process, index, time.monotonic() + timeout)
+                self.ports.append(bound)
+                if self.reuse_port:
+                    port = bound  # 端口为0时后续进程复用第一个进程分到的端口
+        except BaseException:
+            self.stop()
+            raise
+        return self
+
+    @staticmethod
+    def _wait_ready(ready, process, index, deadline):
+        """等待工作进程报告监听端口; 进程提前退出或超时时抛出RuntimeError"""
+        while time.monotonic() < deadline:
+            try:
+                _, bound, error = ready.get(timeout=0.2)
+            except queue.Empty:
+                if not process.is_alive():
+                    break
+                continue
+            if error:
+                raise RuntimeError(f"工作进程{index}启动失败: {error}")
+            return bound
+        raise RuntimeError(f"工作进程{index}未能启动")
+
+    def join(self):
+        for process in self._processes:
+            process.join()
+
+    def stop(self):
+        """终止工作进程并删除共享内存"""
+        for process in self._processes:
+            if process.is_alive():
+                process.terminate()
+        for process in self._processes:
+            process.join(5)
+        self._processes = []
+        if self.store is not None:
+            self.store.close()
+            self.store = None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='多进程Modbus从站')
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=5020)
+    parser.add_argument('--workers', type=int, default=None, help='工作进程数, 默认为CPU核数')
+    parser.add_argument('--units', default='', help='从站ID列表, 逗号分隔; 为空时所有ID共用一组表')
+    parser.add_argument('--port-range', action='store_true', help='各进程使用连续端口而不是SO_REUSEPORT')
+    parser.add_argument('--no-log', action='store_true', help='关闭请求日志')
+    args = parser.parse_args()
+
+    unit_ids = [int(u) for u in args.units.split(',') if u]
+    slave = ShardedSlave(args.host, args.port, args.workers, unit_ids, args.port_range, not args.no_log)
+    slave.start()
+    mode = 'SO_REUSEPORT' if slave.reuse_port else '端口范围'
+    print(f"已启动 {slave.workers} 个工作进程({mode}), 监听端口: {sorted(set(slave.ports))}")
+    try:
+        slave.join()
+    except KeyboardInterrupt:
+        print("\n从站已停止")
+    finally:
+        slave.stop()
@@ -0,0 +1,189 @@
+# signal_engine.py
+"""向量化信号发生器
+
+为模拟从站的输入寄存器/离散输入生成变化的数据。所有通道的参数按列存放在NumPy数组中,
+每个周期用一次向量运算算出全部通道的值, 再按目标表分组整块写入寄存器表的NumPy视图。
+写入不经过数据块, 不对单个寄存器加锁, 每张表每周期只记录一次脏区间。
+多寄存器的值在更新过程中可能被读到一半, 与真实设备的行为一致。
+
+    engine = SignalEngine(rate=10)
+    engine.add(tables['ir'], 0, 'sine', amplitude=50, offset=100, period=10)
+    engine.add(tables['di'], 0, 'step', period=4)
+    engine.start()
+"""
+import threading
+import time
+from contextlib import nullcontext
+import numpy as np
+from register_store import BitTable
+
+GENERATORS = ('sine', 'ramp', 'step', 'noise', 'random_walk')
+
+
+class SignalEngine:
+    """按固定频率更新全部信号通道
+
+    每个通道: value = 波形 * amplitude + offset (+ 噪声), 寄存器值 = round(value * scale)
+    写入16位寄存器时按补码截断(负数与ESP32的(int)强转一致); 写入位表时 value > 0 为1。
+    """
+    def __init__(self, rate=10.0, seed=None):
+        self.rate = rate
+        self.rng = np.random.default_rng(seed)
+        self._channels = []
+        self._compiled = None
+        self._last = None
+        self._walk_state = np.zeros(0)  # random_walk 当前值, 重新编译后保留
+        self._thread = None
+        self._stopping = threading.Event()
+        self._lock = threading.Lock()  # 保护通道配置, 不涉及寄存器读写
+        self.ticks = 0
+
+    def add(self, table, address, kind='sine', amplitude=1.0, offset=0.0, period=10.0,
+            phase=0.0, scale=1.0, noise=0.0, duty=0.5, low=None, high=None):
+        """添加一个通道
+
+        period/phase: 周期(秒)和相位(周期的比例, 0-1)
+        duty: step 波形高电平占比
+        low/high: random_walk 的取值范围, 默认为 offset ± amplitude * 10
+        """
+        if kind not in GENERATORS:
+            raise ValueError(f"未知的信号类型: {kind}")
+        if low is None:
+            low = offset - abs(amplitude) * 10
+        if high is None:
+            high = offset + abs(amplitude) * 10
+        with self._lock:
+            self._channels.append((table, address, GENERATORS.index(kind), amplitude, offset, period,
+                                   phase, scale, noise, duty, low, high))
+            self._compiled = None
+
+    def clear(self):
+        with self._lock:
+            self._channels = []
+            self._compiled = None
+            self._walk_state = np.zeros(0)
+
+    def __len__(self):
+        return len(self._channels)
+
+    def _compile(self):
+        """把通道列表转为参数数组, 并按目标表分组地址"""
+        channels = self._channels
+        columns = list(zip(*channels)) if channels else [()] * 12
+        params = {name: np.array(columns[i], dtype=np.float64) for i, name in enumerate(
+            ('amplitude', 'offset', 'period', 'phase', 'scale', 'noise', 'duty', 'low', 'high'), 3)}
+        params['kind'] = np.array(columns[2], dtype=np.int8)
+        params['period'] = np.where(params['period'] > 0, params['period'], 1.0)
+        state = params['offset'].copy()
+        kept = min(len(state), len(self._walk_state))
+        state[:kept] = self._walk_state[:kept]
+        self._walk_state = state
+        params['walk'] = params['kind'] == GENERATORS.index('random_walk')
+        groups = {}
+        for index, (table, address) in enumerate((c[0], c[1]) for c in channels):
+            groups.setdefault(id(table), (table, [], []))
+            groups[id(table)][1].append(address)
+            groups[id(table)][2].append(index)
+        targets = []
+        for table, addresses, indices in groups.values():
+            addresses = np.array(addresses, dtype=np.int64)
+            is_bits = isinstance(table, BitTable)
+            if is_bits:
+                # 受影响的字节及每个通道在其中的位掩码
+                view = np.frombuffer(table.data, dtype=np.uint8)
+                byte_index, slots = np.unique(addresses >> 3, return_inverse=True)
+                masks = (1 << (addresses & 7)).astype(np.uint8)
+                layout = (byte_index, slots, masks)
+            else:
+                view = table.as_numpy()
+                layout = addresses
+            targets.append((table, view, layout, np.array(indices, dtype=np.int64), is_bits,
+                            int(addresses.min()), int(addresses.max()) + 1))
+        return params, targets
+
+    def compute(self, now, dt):
+        """计算全部通道在 now 时刻的工程值(一次向量运算)"""
+        params = self._compiled[0]
+        kind = params['kind']
+        cycle = (now / params['period'] + params['phase']) % 1.0
+        wave = np.select(
+            [kind == 0, kind == 1, kind == 2],
+            [np.sin(2 * np.pi * cycle), cycle, (cycle < params['duty']).astype(np.float64)],
+            default=0.0)
+        values = wave * params['amplitude'] + params['offset']
+        noisy = (kind == 3) | (params['noise'] > 0)
+        if noisy.any():
+            sigma = np.where(kind == 3, np.abs(params['amplitude']), params['noise'])
+            values = values + self.rng.standard_normal(len(kind)) * sigma * noisy
+        walk = params['walk']
+        if walk.any():
+            step = self.rng.standard_normal(len(kind)) * params['amplitude'] * np.sqrt(max(dt, 0.0))
+            state = self._walk_state
+            state[walk] = np.clip(state + step, params['low'], params['high'])[walk]
+            values = np.where(walk, state + params['noise'] * self.rng.standard_normal(len(kind)), values)
+        return values
+
+    def tick(self, now=None):
+        """计算并写入一个周期的全部通道"""
+        with self._lock:
+            if self._compiled is None:
+                self._compiled = self._compile()
+            params, targets = self._compiled
+            if not targets:
+                return
+            now = time.monotonic() if now is None else now
+            dt = 0.0 if self._last is None else now - self._last
+            self._last = now
+            values = self.compute(now, dt)
+            raw = np.rint(values * params['scale']).astype(np.int64)
+            for table, view, layout, indices, is_bits, lo, hi in targets:
+                if is_bits:
+                    # 先在副本上改位再整字节写回, 读者不会看到清零后尚未置位的中间状态
+                    byte_index, slots, masks = layout
+                    on = raw[indices] > 0
+                    with table.lock or nullcontext():  # 共享存储的位表与其他进程互斥
+                        packed = view[byte_index]
+                        np.bitwise_and.at(packed, slots, ~masks)
+                        np.bitwise_or.at(packed, slots[on], masks[on])
+                        view[byte_index] = packed
+                else:
+                    view[layout] = raw[indices] & 0xFFFF
+                if table.dirty is not None:
+                    table.dirty.mark(lo, hi)
+            self.ticks += 1
+
+    def _run(self):
+        interval = 1.0 / self.rate
+        deadline = time.monotonic()
+        while not self._stopping.is_set():
+            self.tick()
+            deadline += interval
+            delay = deadline - time.monotonic()
+            if delay < 0:
+                deadline = time.monotonic()  # 跟不上时跳过错过的周期
+                delay = 0
+            self._stopping.wait(delay)
+
+    def start(self):
+        if self._thread is None:
+            self._stopping.clear()
+            self._thread = threading.Thread(target=self._run, name="signal-engine", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        if self._thread is not None:
+            self._stopping.set()
+            self._thread.join()
+            self._thread = None
+
+
+def add_demo_signals(engine, tables, ir_count=16, di_count=16):
+    """给一个从站的输入寄存器和离散输入配置一组演示信号(各类型轮流分配)"""
+    for address in range(ir_count):
+        kind = GENERATORS[address % len(GENERATORS)]
+        engine.add(tables['ir'], address, kind, amplitude=100.0, offset=500.0,
+                   period=10.0 + address, phase=address / ir_count, noise=2.0 if kind == 'sine' else 0.0)
+    for address in range(di_count):
+        engine.add(tables['di'], address, 'step', period=2.0 + address, phase=address / di_count)
+    return engine
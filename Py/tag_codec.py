@@ -0,0 +1,203 @@
+# tag_codec.py
+"""寄存器块的类型化编解码
+
+用字段表(名称, 地址, 类型, 数量, 缩放, 偏移, 字节序, 字序)描述一段寄存器的布局,
+编译成一个编解码器: 先把整段寄存器打包成字节, 按需要一次性调整字节/字顺序,
+再用一个预编译的 struct 格式解出全部字段, 最后统一做缩放和偏移。
+编解码器按布局缓存, 同样的字段表只编译一次。
+
+    codec = compile_codec([Field('temperature', 0, 'int16', scale=0.01),
+                           Field('flow', 2, 'float32', word_order='little')])
+    values = codec.decode(registers)      # {'temperature': 25.3, 'flow': 1.5}
+    registers = codec.encode(values)      # 写入时反向编码
+"""
+import operator
+import struct
+from collections import namedtuple
+from functools import lru_cache
+
+# 类型 -> (占用寄存器数, struct字符)
+TYPES = {
+    'bool': (1, 'H'),
+    'uint16': (1, 'H'),
+    'int16': (1, 'h'),
+    'uint32': (2, 'I'),
+    'int32': (2, 'i'),
+    'float32': (2, 'f'),
+    'float64': (4, 'd'),
+}
+FLOAT_TYPES = ('float32', 'float64')
+ORDERS = ('big', 'little')
+
+
+class Field(namedtuple('Field', 'name address type count scale offset byte_order word_order')):
+    """字段定义: 工程值 = 原始值 * scale + offset
+
+    byte_order: 寄存器内两个字节的顺序; word_order: 多寄存器数值中寄存器的顺序
+    (big/big 即常见的 ABCD, word_order='little' 为 CDAB)
+    """
+    def __new__(cls, name, address, type='uint16', count=1, scale=1.0, offset=0.0,
+                byte_order='big', word_order='big'):
+        if type not in TYPES:
+            raise ValueError(f"未知的数据类型: {type}")
+        if byte_order not in ORDERS or word_order not in ORDERS:
+            raise ValueError(f"字节序/字序只能为 big 或 little: {name}")
+        return super().__new__(cls, name, address, type, count, scale, offset, byte_order, word_order)
+
+    @property
+    def width(self):
+        return TYPES[self.type][0] * self.count
+
+
+def _divisor(scale):
+    """scale 为整数的倒数(0.1, 0.01...)时返回该整数, 否则返回None"""
+    if 0 < abs(scale) < 1:
+        divisor = round(1 / scale)
+        if abs(divisor * scale - 1) < 1e-12:
+            return divisor
+    return None
+
+
+def _field_permutation(field, base):
+    """字段在块内的字节位置 -> 规范(大端ABCD)顺序下的位置"""
+    words = TYPES[field.type][0]
+    order = []
+    for i in range(field.count):
+        first = base + i * words * 2
+        word_indexes = range(words) if field.word_order == 'big' else reversed(range(words))
+        for w in word_indexes:
+            pair = (first + 2 * w, first + 2 * w + 1)
+            order.extend(pair if field.byte_order == 'big' else pair[::-1])
+    return order
+
+
+class BlockCodec:
+    """从 start 开始 length 个寄存器的编解码器(通过 compile_codec 获取)
+
+    解码: 整段寄存器一次打包为字节, 每一"趟"用一次字节重排(仅在有非ABCD字段时)
+    和一次 struct.unpack 解出其中所有字段; 只有地址互相重叠的字段才需要多趟。
+    """
+    def __init__(self, fields, start, length):
+        self.fields = tuple(sorted(fields, key=lambda f: f.address))
+        self.start = start
+        self.length = length
+        self._words = struct.Struct(f'>{length}H')
+        self._by_name = {}
+        passes = []  # [[结束字节位置, 字段...], ...]
+        for field in self.fields:
+            base = (field.address - start) * 2
+            if base < 0 or base + field.width * 2 > length * 2:
+                raise ValueError(f"字段 {field.name} 超出块范围")
+            fmt = struct.Struct(f'>{field.count}{TYPES[field.type][1]}')
+            order = _field_permutation(field, 0)
+            self._by_name[field.name] = (field, base, fmt, None if order == sorted(order) else order)
+            for group in passes:
+                if group[0] <= base:
+                    group.append(field)
+                    group[0] = base + field.width * 2
+                    break
+            else:
+                passes.append([base + field.width * 2, field])
+        self._passes = [self._compile_pass(group[1:]) for group in passes]
+
+    def _compile_pass(self, fields):
+        fmt = ['>']
+        position = 0  # 字节
+        permutation = list(range(self.length * 2))
+        identity = list(permutation)
+        layout = []
+        item = 0
+        for field in fields:
+            base = (field.address - self.start) * 2
+            if base > position:
+                fmt.append(f'{base - position}x')
+            fmt.append(f'{field.count}{TYPES[field.type][1]}')
+            permutation[base:base + field.width * 2] = _field_permutation(field, base)
+            position = base + field.width * 2
+            # 解码方式: 0 原值, 1 缩放/偏移, 2 布尔, 3 除以整数(scale为整数的倒数, 如0.01)
+            kind = 2 if field.type == 'bool' else (1 if field.scale != 1 or field.offset else 0)
+            scale = field.scale
+            divisor = _divisor(scale) if kind == 1 else None
+            if divisor is not None:
+                # 6012 * 0.01 = 60.120000000000005, 6012 / 100 = 60.12
+                kind, scale = 3, divisor
+            layout.append((field.name, item, field.count, kind, scale, field.offset))
+            item += field.count
+        if position < self.length * 2:
+            fmt.append(f'{self.length * 2 - position}x')
+        # 全部为大端ABCD时不需要重排字节
+        reorder = None if permutation == identity else operator.itemgetter(*permutation)
+        return reorder, struct.Struct(''.join(fmt)), layout
+
+    def decode(self, registers):
+        """整段寄存器 -> {名称: 值}; count>1 的字段为列表"""
+        wire = self._words.pack(*registers)
+        values = {}
+        for reorder, fmt, layout in self._passes:
+            items = fmt.unpack(wire if reorder is None else bytes(reorder(wire)))
+            for name, lo, count, kind, scale, offset in layout:
+                if count == 1:
+                    v = items[lo]
+                    if kind == 0:
+                        values[name] = v
+                    elif kind == 3:
+                        values[name] = v / scale + offset
+                    else:
+                        values[name] = v * scale + offset if kind == 1 else bool(v)
+                elif kind == 0:
+                    values[name] = list(items[lo:lo + count])
+                elif kind == 1:
+                    values[name] = [v * scale + offset for v in items[lo:lo + count]]
+                elif kind == 3:
+                    values[name] = [v / scale + offset for v in items[lo:lo + count]]
+                else:
+                    values[name] = [bool(v) for v in items[lo:lo + count]]
+        return values
+
+    @staticmethod
+    def _raw_items(field, value):
+        values = value if field.count > 1 else [value]
+        if field.type == 'bool':
+            return [1 if v else 0 for v in values]
+        if field.scale != 1 or field.offset:
+            values = [(v - field.offset) / field.scale for v in values]
+        if field.type not in FLOAT_TYPES:
+            values = [int(round(v)) for v in values]
+        return values
+
+    def encode(self, values, base=None):
+        """{名称: 值} -> 整段寄存器列表; 未给出的字段和空洞取自base(默认为0)"""
+        wire = bytearray(self.length * 2) if base is None else bytearray(self._words.pack(*base))
+        for name, value in values.items():
+            field, offset, fmt, order = self._by_name[name]
+            raw = fmt.pack(*self._raw_items(field, value))
+            if order is None:
+                wire[offset:offset + len(raw)] = raw
+            else:
+                for source, target in enumerate(order):
+                    wire[offset + target] = raw[source]
+        return list(self._words.unpack(wire))
+
+    def encode_field(self, name, value):
+        """单个字段 -> (地址, 寄存器列表), 用于写单个点"""
+        field, offset, fmt, order = self._by_name[name]
+        registers = self.encode({name: value})
+        return field.address, registers[offset // 2:offset // 2 + field.width]
+
+
+@lru_cache(maxsize=256)
+def _compile(fields, start, length):
+    return BlockCodec(fields, start, length)
+
+
+def compile_codec(fields, start=None, length=None):
+    """按布局获取(缓存的)编解码器; start/length 默认为恰好覆盖全部字段
+
+    fields 中的元素只需具有 Field 的属性(如 poll_plan.Tag)
+    """
+    fields = tuple(fields)
+    if start is None:
+        start = min(f.address for f in fields)
+    if length is None:
+        length = max(f.address + TYPES[f.type][0] * f.count for f in fields) - start
+    return _compile(fields, start, length)
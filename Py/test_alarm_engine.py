@@ -0,0 +1,44 @@
+# test_alarm_engine.py
+import unittest
+from alarm_engine import AlarmEngine, AlarmRule
+
+def run(engine, device, tag, samples):
+    """依次评估 [(时间, 值), ...], 返回每一步的事件 [(active, 文字), ...]"""
+    return [[(e.active, e.message) for e in engine.evaluate({device: {tag: value}}, now=t)]
+            for t, value in samples]
+
+class TestAlarmEngine(unittest.TestCase):
+    def test_high_with_hysteresis(self):
+        engine = AlarmEngine([AlarmRule('gh', 't', 'high', 30.0, hysteresis=0.5,
+                                        message='高温: {value:.1f} > {limit}', clear_message='高温解除: {value:.1f}')])
+        steps = run(engine, 'gh', 't', [(0, 29.0), (1, 30.5), (2, 31.0), (3, 29.8), (4, 29.5), (5, 29.9)])
+        self.assertEqual(steps, [[], [(True, '高温: 30.5 > 30.0')], [], [], [(False, '高温解除: 29.5')], []])
+        self.assertEqual(engine.active_alarms(), [])
+
+    def test_low_default_messages(self):
+        rule = AlarmRule('gh', 'h', 'low', 40.0, hysteresis=2.0)
+        engine = AlarmEngine([rule])
+        steps = run(engine, 'gh', 'h', [(0, 39.0), (1, 41.0), (2, 42.0)])
+        self.assertEqual(steps, [[(True, 'gh h 过低: 39.00 < 40.0')], [], [(False, 'gh h 过低已恢复: 42.00')]])
+
+    def test_delay(self):
+        engine = AlarmEngine([AlarmRule('gh', 't', 'high', 30.0, delay=10.0)])
+        steps = run(engine, 'gh', 't', [(0, 31.0), (5, 31.0), (8, 29.0), (9, 31.0), (18, 31.0), (19, 31.0)])
+        # 条件在8秒时中断, 从9秒重新计时
+        self.assertEqual([[active for active, _ in events] for events in steps], [[], [], [], [], [], [True]])
+        self.assertEqual(run(engine, 'gh', 't', [(20, 29.0)])[0][0][0], False)  # 恢复立即生效
+
+    def test_rate(self):
+        engine = AlarmEngine([AlarmRule('gh', 't', 'rate', 1.0, hysteresis=0.5)])
+        steps = run(engine, 'gh', 't', [(0, 20.0), (1, 20.5), (2, 22.0), (3, 22.8), (4, 23.2)])
+        self.assertEqual([[active for active, _ in events] for events in steps], [[], [], [True], [], [False]])
+        self.assertEqual(steps[2][0][1], 'gh t 变化过快: 1.50/s > 1.0/s')
+
+    def test_missing_points_keep_state(self):
+        engine = AlarmEngine([AlarmRule('gh', 't', 'high', 30.0), AlarmRule('gh', 'h', 'high', 80.0)])
+        engine.evaluate({'gh': {'t': 31.0, 'h': 50.0}}, now=0)
+        self.assertEqual(engine.evaluate({'gh': {'h': 90.0}}, now=1)[0].rule.tag, 'h')
+        self.assertEqual([rule.tag for rule in engine.active_alarms()], ['t', 'h'])
+
+if __name__ == '__main__':
+    unittest.main()
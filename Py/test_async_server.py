@@ -0,0 +1,97 @@
+# test_async_server.py
+import socket
+import struct
+import time
+import unittest
+from async_server import AsyncModbusServer, check_mbap
+from modbus_slave_simulator import build_server_context
+from register_store import RegisterStore
+
+def mbap(transaction_id, pdu, protocol_id=0, unit_id=1, length=None):
+    return struct.pack('>HHHB', transaction_id, protocol_id, len(pdu) + 1 if length is None else length, unit_id) + pdu
+
+def recv_exactly(sock, n):
+    data = b''
+    while len(data) < n:
+        chunk = sock.recv(n - len(data))
+        if not chunk:
+            break
+        data += chunk
+    return data
+
+class TestCheckMbap(unittest.TestCase):
+    def test_check_mbap(self):
+        check_mbap(0, 2)
+        check_mbap(0, 254)
+        for protocol_id, length in ((1, 6), (0, 0), (0, 1), (0, 255)):
+            with self.assertRaises(ValueError):
+                check_mbap(protocol_id, length)
+
+class TestAsyncModbusServer(unittest.TestCase):
+    def setUp(self):
+        store = RegisterStore(100)
+        store.unit(0)['hr'].set(0, [11, 22])
+        self.server = AsyncModbusServer(build_server_context(store), ('127.0.0.1', 0), max_connections=2)
+        self.thread = self.server.start_in_thread()
+
+    def tearDown(self):
+        self.server.stop()
+        self.thread.join(5)
+
+    def connect(self):
+        sock = socket.create_connection(('127.0.0.1', self.server.port), timeout=5)
+        self.addCleanup(sock.close)
+        return sock
+
+    def read_hr(self, sock, transaction_id=1):
+        sock.sendall(mbap(transaction_id, bytes.fromhex('03 0000 0002')))
+        return recv_exactly(sock, 13)
+
+    def test_read(self):
+        self.assertEqual(self.read_hr(self.connect(), 7), mbap(7, bytes.fromhex('03 04 000b 0016')))
+
+    def test_malformed_pdu(self):
+        sock = self.connect()
+        # MBAP头正确但FC3只有1个数据字节: 非法数据值, 连接仍可用
+        sock.sendall(mbap(1, bytes.fromhex('03 00')))
+        self.assertEqual(recv_exactly(sock, 9), mbap(1, bytes.fromhex('83 03')))
+        self.assertEqual(self.read_hr(sock, 2), mbap(2, bytes.fromhex('03 04 000b 0016')))
+
+    def test_bad_header_closes(self):
+        for frame in (mbap(1, bytes.fromhex('03 0000 0002'), protocol_id=1),
+                      mbap(1, b'', length=0)):
+            sock = self.connect()
+            sock.sendall(frame)
+            self.assertEqual(sock.recv(100), b'')
+
+    def test_max_connections(self):
+        first, second = self.connect(), self.connect()
+        self.read_hr(first)
+        self.read_hr(second)  # 两个连接都已被服务器登记
+        self.assertEqual(self.connect().recv(100), b'')
+        self.assertEqual(self.server.connection_count, 2)
+        first.close()
+        deadline = time.monotonic() + 5
+        while self.server.connection_count >= 2 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(self.read_hr(self.connect())[7:], bytes.fromhex('03 04 000b 0016'))
+
+    def test_stop(self):
+        sock = self.connect()
+        self.read_hr(sock)
+        port = self.server.port
+        self.server.stop()
+        self.thread.join(5)
+        self.assertFalse(self.thread.is_alive())
+        self.assertEqual(sock.recv(100), b'')  # 空闲连接被关闭
+        with self.assertRaises(OSError):
+            socket.create_connection(('127.0.0.1', port), timeout=5)
+
+    def test_stop_before_start(self):
+        server = AsyncModbusServer(build_server_context(RegisterStore(10)), ('127.0.0.1', 0))
+        server.stop()
+        server.start_in_thread().join(5)
+        self.assertFalse(server.started.is_set())
+
+if __name__ == '__main__':
+    unittest.main()
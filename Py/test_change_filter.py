@@ -0,0 +1,51 @@
+# test_change_filter.py
+import unittest
+from change_filter import ChangeFilter, parse_deadband
+
+class TestChangeFilter(unittest.TestCase):
+    def test_parse_deadband(self):
+        self.assertEqual(parse_deadband(0.5), (0.5, 0.0))
+        self.assertEqual(parse_deadband(' 2% '), (0.0, 0.02))
+        self.assertEqual(parse_deadband(None), (0.0, 0.0))
+
+    def test_first_value_always_reported(self):
+        cov = ChangeFilter({'temperature': 100})
+        self.assertEqual(cov.update({'temperature': 25.0, 'alarm': False}, now=0), {'temperature': 25.0, 'alarm': False})
+        self.assertEqual(cov.update({'temperature': 25.0, 'alarm': False}, now=1), {})
+        cov.forget('alarm')
+        self.assertEqual(cov.update({'temperature': 25.0, 'alarm': False}, now=2), {'alarm': False})
+
+    def test_deadbands(self):
+        cov = ChangeFilter({'temperature': 0.5, 'speed': '2%'})
+        cov.update({'temperature': 20.0, 'speed': 1000, 'mode': 'auto', 'running': True}, now=0)
+        self.assertEqual(cov.update({'temperature': 20.4, 'speed': 1015, 'mode': 'auto', 'running': True}, now=1), {})
+        # 与上次上报值比较: 缓慢漂移累计超过死区后上报
+        self.assertEqual(cov.update({'temperature': 20.6, 'speed': 1021, 'mode': 'manual', 'running': False}, now=2),
+                         {'temperature': 20.6, 'speed': 1021, 'mode': 'manual', 'running': False})
+        self.assertEqual(cov.stats, {'polled': 12, 'reported': 8})
+
+    def test_default_deadband_reports_any_change(self):
+        cov = ChangeFilter()
+        cov.update({'count': 1}, now=0)
+        self.assertEqual(cov.update({'count': 2}, now=1), {'count': 2})
+
+    def test_lists(self):
+        cov = ChangeFilter({'levels': 1})
+        levels = [10, 20, 30]
+        cov.update({'levels': levels}, now=0)
+        levels[2] = 31  # 原地修改不影响已记录的值
+        self.assertEqual(cov.update({'levels': levels}, now=1), {})
+        self.assertEqual(cov.update({'levels': [10, 20, 32]}, now=2), {'levels': [10, 20, 32]})
+        self.assertEqual(cov.update({'levels': [10, 20]}, now=3), {'levels': [10, 20]})
+
+    def test_heartbeat(self):
+        cov = ChangeFilter({'temperature': 1.0}, heartbeat=30)
+        cov.update({'temperature': 20.0}, now=0)
+        self.assertEqual(cov.update({'temperature': 20.0}, now=29.9), {})
+        self.assertEqual(cov.update({'temperature': 20.1}, now=30), {'temperature': 20.1})
+        # 心跳上报后重新计时
+        self.assertEqual(cov.update({'temperature': 20.1}, now=59), {})
+        self.assertEqual(cov.update({'temperature': 20.1}, now=60), {'temperature': 20.1})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+# test_modbus_gateway.py
+import asyncio
+import struct
+import unittest
+from async_server import MBAP_HEADER
+from modbus_gateway import ModbusGateway, GATEWAY_TARGET_FAILED
+
+class FakeDevice:
+    """慢速上游设备: 只支持FC3/FC6, 记录收到的请求"""
+    def __init__(self, delay=0.05):
+        self.delay = delay
+        self.registers = [0] * 16
+        self.requests = []
+        self.bad_frames = 0  # 大于0时用长度为0的帧头应答, 每次减1
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                transaction_id, protocol_id, length, unit = MBAP_HEADER.unpack(await reader.readexactly(7))
+                pdu = await reader.readexactly(length - 1)
+                self.requests.append(pdu)
+                await asyncio.sleep(self.delay)
+                if self.bad_frames:
+                    self.bad_frames -= 1
+                    writer.write(MBAP_HEADER.pack(transaction_id, 0, 0, unit))
+                    continue
+                function_code, address, value = struct.unpack('>BHH', pdu)
+                if function_code == 3:
+                    values = self.registers[address:address + value]
+                    response = struct.pack(f'>BB{len(values)}H', 3, 2 * len(values), *values)
+                else:
+                    self.registers[address] = value
+                    response = pdu
+                writer.write(MBAP_HEADER.pack(transaction_id, protocol_id, len(response) + 1, unit) + response)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+def read_pdu(address, count):
+    return struct.pack('>BHH', 3, address, count)
+
+class TestModbusGateway(unittest.TestCase):
+    def run_with_gateway(self, scenario, **kwargs):
+        async def main():
+            device = FakeDevice()
+            server = await asyncio.start_server(device.handle, '127.0.0.1', 0)
+            gateway = ModbusGateway('127.0.0.1', server.sockets[0].getsockname()[1], timeout=1.0, **kwargs)
+            try:
+                await scenario(gateway, device)
+            finally:
+                await gateway.upstream.close()
+                server.close()
+                await server.wait_closed()
+        asyncio.run(main())
+
+    def test_merge_and_cache(self):
+        async def scenario(gateway, device):
+            device.registers[0:2] = [11, 22]
+            responses = await asyncio.gather(*(gateway.handle_pdu(1, read_pdu(0, 2)) for _ in range(5)))
+            self.assertEqual(set(responses), {bytes.fromhex('03 04 000b 0016')})
+            self.assertEqual(len(device.requests), 1)
+            self.assertEqual(await gateway.handle_pdu(1, read_pdu(0, 2)), responses[0])
+            self.assertEqual(len(device.requests), 1)
+            self.assertEqual((gateway.stats['misses'], gateway.stats['merged'], gateway.stats['hits']), (1, 4, 1))
+        self.run_with_gateway(scenario, default_ttl=10.0)
+
+    def test_write_invalidates(self):
+        async def scenario(gateway, device):
+            await gateway.handle_pdu(1, read_pdu(0, 2))
+            # 写入排队时开始的读取既不合并到旧读取, 也不缓存写入前的值
+            read = asyncio.ensure_future(gateway.handle_pdu(1, read_pdu(0, 2)))
+            await asyncio.sleep(0)
+            await gateway.handle_pdu(1, struct.pack('>BHH', 6, 1, 99))
+            await read
+            self.assertEqual(await gateway.handle_pdu(1, read_pdu(0, 2)), bytes.fromhex('03 04 0000 0063'))
+            # 不重叠的写入不影响缓存
+            await gateway.handle_pdu(1, struct.pack('>BHH', 6, 5, 1))
+            requests = len(device.requests)
+            await gateway.handle_pdu(1, read_pdu(0, 2))
+            self.assertEqual(len(device.requests), requests)
+        self.run_with_gateway(scenario, default_ttl=10.0)
+
+    def test_upstream_failure(self):
+        async def scenario(gateway, device):
+            device.bad_frames = 1
+            responses = await asyncio.gather(*(gateway.handle_pdu(1, read_pdu(0, 2)) for _ in range(3)))
+            self.assertEqual(set(responses), {bytes([0x83, GATEWAY_TARGET_FAILED])})
+            self.assertEqual(gateway.stats['errors'], 1)
+            self.assertNotIn((1, 3, 0, 2), gateway.cache)
+            # 上游连接已关闭, 下一次请求重新连接并得到正确响应
+            device.registers[0] = 5
+            self.assertEqual(await gateway.handle_pdu(1, read_pdu(0, 2)), bytes.fromhex('03 04 0005 0000'))
+        self.run_with_gateway(scenario, default_ttl=10.0)
+
+if __name__ == '__main__':
+    unittest.main()
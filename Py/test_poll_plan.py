@@ -0,0 +1,76 @@
+# test_poll_plan.py
+import unittest
+from poll_plan import Tag, build_plan, PollPlanner, MAX_READ_REGISTERS
+
+class FakeResult:
+    def __init__(self, registers=None, bits=None):
+        self.registers = registers
+        self.bits = bits
+
+    def isError(self):
+        return False
+
+class FakeClient:
+    """按地址返回固定值的客户端, 记录请求次数"""
+    def __init__(self):
+        self.calls = []
+
+    def read_holding_registers(self, address, count, **kwargs):
+        self.calls.append(('hr', address, count))
+        return FakeResult(registers=[(address + i) & 0xFFFF for i in range(count)])
+
+    def read_discrete_inputs(self, address, count, **kwargs):
+        self.calls.append(('di', address, count))
+        return FakeResult(bits=[(address + i) % 2 == 1 for i in range(count)] + [False] * 7)
+
+class TestPollPlan(unittest.TestCase):
+    def test_merge_with_gap(self):
+        tags = [Tag('a', 'hr', 0), Tag('b', 'hr', 1), Tag('c', 'hr', 5), Tag('d', 'hr', 40)]
+        plan = build_plan(tags, max_gap=4)
+        self.assertEqual([(r.start, r.count) for r in plan], [(0, 6), (40, 1)])
+        plan = build_plan(tags, max_gap=0)
+        self.assertEqual([(r.start, r.count) for r in plan], [(0, 2), (5, 1), (40, 1)])
+
+    def test_request_limits(self):
+        # 1000个连续寄存器点 -> 按125个一组读取
+        tags = [Tag(f't{i}', 'hr', i) for i in range(1000)]
+        plan = build_plan(tags)
+        self.assertEqual(len(plan), 8)
+        self.assertTrue(all(r.count <= MAX_READ_REGISTERS for r in plan))
+        bits = [Tag(f'b{i}', 'di', i, 'bool') for i in range(3000)]
+        self.assertEqual([r.count for r in build_plan(bits)], [2000, 1000])
+
+    def test_wide_types_not_split(self):
+        tags = [Tag('x', 'hr', 123, 'float32'), Tag('y', 'hr', 0)]
+        plan = build_plan(tags, max_gap=200)
+        self.assertEqual([(r.start, r.count) for r in plan], [(0, 125)])
+        plan = build_plan([Tag('x', 'hr', 124, 'float32'), Tag('y', 'hr', 0)], max_gap=200)
+        self.assertEqual([(r.start, r.count) for r in plan], [(0, 1), (124, 2)])
+
+    def test_plan_cached_until_tags_change(self):
+        planner = PollPlanner([Tag('a', 'hr', 0)])
+        first = planner.plan
+        self.assertIs(planner.plan, first)
+        planner.add(Tag('a', 'hr', 0))
+        self.assertIs(planner.plan, first)
+        planner.add(Tag('b', 'hr', 1))
+        self.assertIsNot(planner.plan, first)
+        self.assertEqual(planner.rebuilds, 2)
+
+    def test_read_decodes_tags(self):
+        planner = PollPlanner([
+            Tag('speed', 'hr', 10),
+            Tag('start', 'hr', 11, 'bool'),
+            Tag('wide', 'hr', 12, 'uint32'),
+            Tag('sensors', 'di', 0, 'bool', 4),
+        ])
+        client = FakeClient()
+        values = planner.read(client)
+        self.assertEqual(client.calls, [('di', 0, 4), ('hr', 10, 4)])
+        self.assertEqual(values['speed'], 10)
+        self.assertTrue(values['start'])
+        self.assertEqual(values['wide'], (12 << 16) | 13)
+        self.assertEqual(values['sensors'], [False, True, False, True])
+
+if __name__ == '__main__':
+    unittest.main()
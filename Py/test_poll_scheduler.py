@@ -0,0 +1,99 @@
+# test_poll_scheduler.py
+import unittest
+from poll_scheduler import PollScheduler
+
+class FakeClock:
+    """可注入的时钟; wait() 直接把时间推进到截止时间, 测试不需要真的等待"""
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def wait(self, seconds):
+        self.now += seconds
+        return False
+
+def make_scheduler():
+    clock = FakeClock()
+    scheduler = PollScheduler(clock=clock)
+    scheduler._stop.wait = clock.wait
+    return scheduler, clock
+
+class TestPollScheduler(unittest.TestCase):
+    def test_no_drift(self):
+        scheduler, clock = make_scheduler()
+        starts = []
+
+        def poll():
+            starts.append(clock.now)
+            clock.now += 0.3  # 读取耗时不应推迟后续节拍
+        task = scheduler.add('poll', poll, 1.0)
+        for _ in range(10):
+            scheduler.run_once()
+        self.assertEqual(starts, [float(i) for i in range(10)])
+        self.assertEqual((task.runs, task.missed, task.max_jitter), (10, 0, 0.0))
+        self.assertAlmostEqual(task.rtt, 0.3)
+
+    def test_missed_ticks_keep_phase(self):
+        scheduler, clock = make_scheduler()
+        starts = []
+
+        def poll():
+            starts.append(clock.now)
+            if len(starts) == 3:
+                clock.now += 2.5  # 第3次读取卡住2.5秒, 错过3和4两个节拍
+        task = scheduler.add('poll', poll, 1.0, start=0.5)
+        for _ in range(5):
+            scheduler.run_once()
+        self.assertEqual(starts, [0.5, 1.5, 2.5, 5.5, 6.5])
+        self.assertEqual(task.missed, 2)
+
+    def test_earliest_deadline_first_and_errors(self):
+        scheduler, clock = make_scheduler()
+        order = []
+
+        def fail():
+            order.append('slow')
+            raise IOError("超时")
+        scheduler.add('fast', lambda: order.append('fast'), 1.0)
+        slow = scheduler.add('slow', fail, 2.5, start=0.5)
+        for _ in range(6):
+            scheduler.run_once()
+        self.assertEqual(order, ['fast', 'slow', 'fast', 'fast', 'slow', 'fast'])
+        self.assertEqual(slow.errors, 2)
+
+    def test_adaptive_interval(self):
+        scheduler, clock = make_scheduler()
+        readings = iter([20.0, 21.0, 22.0, 23.0] + [23.0] * 10)
+        task = scheduler.add('poll', lambda: {'temperature': next(readings)}, 4.0,
+                             min_interval=1.0, max_interval=8.0, deadbands={'temperature': 0.5}, growth=2.0)
+        intervals = []
+        for _ in range(8):
+            scheduler.run_once()
+            intervals.append(task.interval)
+        # 变化时减半到下限, 平稳后按growth放大到上限
+        self.assertEqual(intervals, [2.0, 1.0, 1.0, 1.0, 2.0, 4.0, 8.0, 8.0])
+
+    def test_adaptive_interval_respects_rtt(self):
+        scheduler, clock = make_scheduler()
+
+        def slow_poll():
+            clock.now += 0.5
+            return {'temperature': clock.now}  # 每次都变化
+        task = scheduler.add('poll', slow_poll, 4.0, min_interval=0.5, max_interval=10.0,
+                             deadbands={'temperature': 0.1}, rtt_factor=4.0)
+        for _ in range(3):
+            scheduler.run_once()
+        self.assertEqual(task.interval, 2.0)  # 不低于 4 * 往返时间0.5秒
+
+    def test_stop_interrupts_wait(self):
+        scheduler = PollScheduler()
+        task = scheduler.add('poll', lambda: None, 1.0, start=scheduler.clock() + 60)
+        scheduler.stop()
+        self.assertFalse(scheduler.run_once())
+        self.assertEqual(task.runs, 0)
+        self.assertEqual(len(scheduler._queue), 1)  # 任务保留, 下次 run() 继续
+
+if __name__ == '__main__':
+    unittest.main()
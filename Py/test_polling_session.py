@@ -0,0 +1,83 @@
+# test_polling_session.py
+import unittest
+from unittest import mock
+from pymodbus.exceptions import ModbusIOException
+from polling_session import PollingSession, merge_addresses
+
+class FakeResult:
+    def __init__(self, registers):
+        self.registers = registers
+
+    def isError(self):
+        return False
+
+class FakeClient:
+    """可控制连接成败的客户端, 寄存器值为地址*10"""
+    def __init__(self):
+        self.online = True
+        self.open = False
+        self.connects = 0
+        self.reads = []
+
+    def connect(self):
+        self.connects += 1
+        self.open = self.online
+        return self.open
+
+    def is_socket_open(self):
+        return self.open
+
+    def close(self):
+        self.open = False
+
+    def read_holding_registers(self, address, count, unit=1):
+        if not self.online:
+            return ModbusIOException("连接中断")
+        self.reads.append((address, count))
+        return FakeResult([(address + i) * 10 for i in range(count)])
+
+class TestPollingSession(unittest.TestCase):
+    def setUp(self):
+        self.session = PollingSession('127.0.0.1', backoff_initial=1.0, backoff_max=4.0)
+        self.client = self.session.client = FakeClient()
+        self.now = 100.0
+        patcher = mock.patch('polling_session.time.monotonic', side_effect=lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_merge_addresses(self):
+        self.assertEqual(merge_addresses([5, 0, 1, 2, 7, 6]), [(0, 3), (5, 3)])
+        self.assertEqual(merge_addresses(range(130)), [(0, 125), (125, 5)])
+
+    def test_coalescing_and_stats(self):
+        tags = {'temperature': 0, 'humidity': 1, 'co2': 5}
+        for _ in range(3):
+            self.assertEqual(self.session.read_holding_registers(tags), {'temperature': 0, 'humidity': 10, 'co2': 50})
+        self.assertEqual(self.client.reads, [(0, 2), (5, 1)] * 3)
+        self.assertEqual(self.session.stats, {'polls': 3, 'requests': 6, 'naive_requests': 9, 'connects': 1})
+        # 合并前: 3次连接 + 9个请求; 实际: 1次连接 + 6个请求
+        self.assertEqual(self.session.round_trips_saved, 5)
+        self.assertEqual(self.session.read_block(0, 2), [0, 10])
+
+    def test_backoff_does_not_count_polls(self):
+        tags = {'temperature': 0}
+        self.session.read_holding_registers(tags)
+        self.client.online = False
+        self.assertIsNone(self.session.read_holding_registers(tags))  # 请求失败, 进入1秒退避
+        self.assertEqual(self.session.stats['polls'], 2)
+        for _ in range(5):  # 退避期内不连接也不计数
+            self.assertIsNone(self.session.read_holding_registers(tags))
+        self.assertEqual((self.client.connects, self.session.stats['polls']), (1, 2))
+        self.now += 1.0
+        self.assertIsNone(self.session.read_holding_registers(tags))  # 重连失败, 退避加倍为2秒
+        self.now += 1.5
+        self.assertIsNone(self.session.read_holding_registers(tags))
+        self.assertEqual(self.client.connects, 2)
+        self.client.online = True
+        self.now += 0.5
+        self.assertEqual(self.session.read_holding_registers(tags), {'temperature': 0})
+        self.assertEqual(self.session.stats, {'polls': 3, 'requests': 3, 'naive_requests': 3, 'connects': 2})
+        self.assertEqual(self.session.round_trips_saved, 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+# test_register_store.py
+import unittest
+from register_store import RegisterTable, BitTable, ArrayDataBlock, RegisterStore, SharedRegisterStore, ADDRESS_SPACE
+
+class TestRegisterStore(unittest.TestCase):
+    def test_full_address_space(self):
+        # 寄存器表覆盖0-65535
+        table = RegisterTable()
+        block = ArrayDataBlock(table)
+        self.assertTrue(block.validate(ADDRESS_SPACE - 1, 1))
+        self.assertFalse(block.validate(ADDRESS_SPACE - 1, 2))
+        block.setValues(ADDRESS_SPACE - 2, [7, 8])
+        self.assertEqual(list(block.getValues(ADDRESS_SPACE - 3, 3)), [0, 7, 8])
+
+    def test_slice_read_is_view(self):
+        # 读取返回视图, 后续写入可见
+        table = RegisterTable(100)
+        view = table.get(10, 2)
+        table.set(10, [1, 2])
+        self.assertEqual(list(view), [1, 2])
+
+    def test_packed_bits(self):
+        bits = BitTable(16)
+        self.assertEqual(len(bits.data), 2)
+        bits.set(3, [1, 0, 1])
+        bits.set(9, True)
+        self.assertEqual(list(bits.get(0, 10)), [0, 0, 0, 1, 0, 1, 0, 0, 0, 1])
+        bits.set(3, 0)
+        self.assertFalse(bits.get(3)[0])
+
+    def test_reset(self):
+        table = RegisterTable(10)
+        block = ArrayDataBlock(table)
+        block.setValues(0, [5, 6])
+        block.reset()
+        self.assertEqual(list(block.getValues(0, 2)), [0, 0])
+
+    def test_units_are_separate(self):
+        store = RegisterStore(10)
+        store.unit(1)['hr'].set(0, 42)
+        self.assertEqual(store.unit(2)['hr'].get(0)[0], 0)
+        self.assertEqual(store.unit(1)['hr'].get(0)[0], 42)
+        self.assertEqual(len(store), 2)
+
+    def test_dirty_ranges(self):
+        # 开启跟踪后记录写入区间, 取走时合并相邻区间
+        table = RegisterTable(100)
+        table.set(0, [1])
+        dirty = table.track_changes()
+        table.set(10, [1, 2])
+        table.set(12, [3])
+        table.set(50, [4])
+        self.assertEqual(dirty.take(), [(10, 13), (50, 51)])
+        self.assertEqual(dirty.take(), [])
+        bits = BitTable(16)
+        bits.track_changes()
+        bits.set(3, [1, 1])
+        self.assertEqual(bits.dirty.take(), [(3, 5)])
+
+    def test_shared_store(self):
+        # 挂接同一块共享内存的两个存储互相可见
+        owner = SharedRegisterStore([1, 2], size=100)
+        other = SharedRegisterStore.attach(owner.name, owner.lock, [1, 2], size=100)
+        try:
+            owner.unit(2)['hr'].set(5, [7, 8])
+            other.unit(2)['co'].set(3, [1, 1])
+            self.assertEqual(list(other.unit(2)['hr'].get(5, 2)), [7, 8])
+            self.assertEqual(list(owner.unit(2)['co'].get(3, 2)), [True, True])
+            self.assertEqual(owner.unit(1)['hr'].get(5)[0], 0)
+            with self.assertRaises(KeyError):
+                owner.unit(3)
+        finally:
+            other.close()
+            owner.close()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+# test_request_log.py
+import json
+import unittest
+from unittest import mock
+from pymodbus.register_read_message import ReadHoldingRegistersRequest
+from pymodbus.register_write_message import WriteSingleRegisterRequest
+from modbus_slave_simulator import build_slave_context
+from register_store import RegisterStore
+from request_log import RequestLogger
+
+class TestRequestLogger(unittest.TestCase):
+    def run_logger(self, logger, action):
+        """启动后台线程, 执行action后停止, 返回写出的全部行"""
+        lines = []
+        logger.sink = lines.extend
+        logger.start()
+        action()
+        logger.stop()
+        return lines
+
+    def test_sampling_counts_requests_and_access_separately(self):
+        logger = RequestLogger(json_lines=True, sample_rates={3: 0.5})
+        context = build_slave_context(RegisterStore(16).unit(0), logger)
+
+        def poll():
+            for _ in range(10):
+                request = ReadHoldingRegistersRequest(0, 2)
+                logger.request(request)
+                request.execute(context)
+        records = [json.loads(line) for line in self.run_logger(logger, poll)]
+        kinds = [record['kind'] for record in records]
+        self.assertEqual((kinds.count('request'), kinds.count('access')), (5, 5))
+        self.assertEqual(sum(r['count'] for r in records if r['kind'] == 'dropped'), 10)
+
+    def test_mute_uses_real_function_code(self):
+        logger = RequestLogger(json_lines=True, sample_rates={6: 0})
+        context = build_slave_context(RegisterStore(16).unit(0), logger)
+
+        def write():
+            WriteSingleRegisterRequest(1, 7).execute(context)    # FC6 写入后再读回: 两条都不记录
+            context.setValues(16, 2, [8, 9])                       # FC16: 记录
+        records = [json.loads(line) for line in self.run_logger(logger, write)]
+        self.assertEqual([r['address'] for r in records if r['kind'] == 'access'], [2])
+        self.assertEqual(sum(r['count'] for r in records if r['kind'] == 'dropped'), 2)
+
+    def test_rate_limit(self):
+        logger = RequestLogger(rate_limits={3: 2})
+        with mock.patch('request_log.time.monotonic', return_value=100.5):
+            self.assertEqual([logger.accept(3) for _ in range(4)], [True, True, False, False])
+            self.assertEqual([logger.accept(3, 'access') for _ in range(3)], [True, True, False])
+            self.assertTrue(logger.accept(4))
+        with mock.patch('request_log.time.monotonic', return_value=101.0):
+            self.assertTrue(logger.accept(3))
+        self.assertEqual(logger.dropped, 3)
+
+    def test_dropped_line_text(self):
+        logger = RequestLogger(sample_rates={1: 0})
+        lines = self.run_logger(logger, lambda: [logger.accept(1) for _ in range(3)])
+        self.assertEqual(lines, ["(已丢弃 3 条日志)"])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,33 @@
+# test_signal_engine.py
+import unittest
+from register_store import RegisterStore
+from signal_engine import SignalEngine
+
+class TestSignalEngine(unittest.TestCase):
+    def test_waveforms(self):
+        tables = RegisterStore(64).unit(0)
+        engine = SignalEngine(seed=0)
+        engine.add(tables['ir'], 0, 'sine', amplitude=10, offset=20, period=4, scale=100)
+        engine.add(tables['ir'], 1, 'ramp', amplitude=100, period=10)
+        engine.add(tables['ir'], 2, 'sine', amplitude=-5, period=4)
+        engine.add(tables['di'], 9, 'step', period=2, duty=0.5)
+        engine.tick(1.0)
+        self.assertEqual(list(tables['ir'].get(0, 3)), [3000, 10, 65531])  # 负数按补码写入
+        self.assertFalse(tables['di'].get(9)[0])
+        engine.tick(2.0)
+        self.assertTrue(tables['di'].get(9)[0])
+        self.assertEqual(tables['ir'].get(1)[0], 20)
+
+    def test_random_walk_bounds_and_dirty(self):
+        tables = RegisterStore(64).unit(0)
+        dirty = tables['ir'].track_changes()
+        engine = SignalEngine(seed=1)
+        for address in range(10, 20):
+            engine.add(tables['ir'], address, 'random_walk', amplitude=50, offset=100, low=90, high=110)
+        for i in range(20):
+            engine.tick(i * 0.5)
+        self.assertTrue(all(90 <= v <= 110 for v in tables['ir'].get(10, 10)))
+        self.assertEqual(dirty.take(), [(10, 20)])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,47 @@
+# test_tag_codec.py
+import struct
+import unittest
+from tag_codec import Field, compile_codec
+
+class TestTagCodec(unittest.TestCase):
+    def test_round_trip_types_and_orders(self):
+        codec = compile_codec([
+            Field('temp', 0, 'int16', scale=0.01),
+            Field('flow', 1, 'float32', word_order='little'),
+            Field('energy', 3, 'float64', byte_order='little'),
+            Field('count', 8, 'int32', offset=100),
+            Field('levels', 10, 'uint16', count=3),
+            Field('alarm', 13, 'bool'),
+        ])
+        values = {'temp': -12.34, 'flow': 1.5, 'energy': 2.25, 'count': -70000,
+                  'levels': [1, 2, 3], 'alarm': True}
+        registers = codec.encode(values)
+        self.assertEqual(len(registers), 14)
+        self.assertEqual(registers[7], 0)  # 空洞保持为0
+        decoded = codec.decode(registers)
+        self.assertAlmostEqual(decoded.pop('temp'), values.pop('temp'))
+        self.assertEqual(decoded, values)
+        # CDAB: 低位字在前
+        self.assertEqual(struct.pack('>HH', registers[2], registers[1]), struct.pack('>f', 1.5))
+
+    def test_cached_per_layout(self):
+        fields = [Field('a', 0), Field('b', 5, 'float32')]
+        self.assertIs(compile_codec(fields), compile_codec(list(fields)))
+        self.assertIsNot(compile_codec(fields), compile_codec(fields, 0, 10))
+
+    def test_overlapping_fields_and_encode_field(self):
+        codec = compile_codec([Field('high', 0), Field('whole', 0, 'uint32')])
+        self.assertEqual(codec.decode([1, 2]), {'high': 1, 'whole': 65538})
+        address, registers = codec.encode_field('whole', 65538)
+        self.assertEqual((address, registers), (0, [1, 2]))
+
+    def test_decimal_scale_is_exact(self):
+        codec = compile_codec([Field('humidity', 0, 'uint16', scale=0.01), Field('temp', 1, 'int16', scale=0.1),
+                               Field('levels', 2, 'uint16', count=2, scale=0.01)])
+        self.assertEqual(codec.decode([6012, 65413, 6012, 1]),
+                         {'humidity': 60.12, 'temp': -12.3, 'levels': [60.12, 0.01]})
+        self.assertEqual(codec.encode({'humidity': 60.12, 'temp': -12.3, 'levels': [60.12, 0.01]}),
+                         [6012, 65413, 6012, 1])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,60 @@
+# test_timeseries_store.py
+import os
+import tempfile
+import unittest
+from timeseries_store import TimeSeriesStore
+
+T0 = 1_700_006_400  # 整天的起点, 同时也是整分钟/整小时
+
+class TestTimeSeriesStore(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.dir.name, 'ts.db')
+        self.store = TimeSeriesStore(self.path, max_rows=1000)
+
+    def tearDown(self):
+        self.store.close()
+        self.dir.cleanup()
+
+    def test_rollups(self):
+        for i in range(180):  # 3分钟, 每秒一个值
+            self.store.write('gh', T0 + i, {'t': i})
+        resolution, rows = self.store.query('gh', 't', T0, T0 + 180, resolution=60)
+        self.assertEqual(resolution, 60)
+        self.assertEqual(rows, [(T0, 0.0, 59.0, 29.5), (T0 + 60, 60.0, 119.0, 89.5),
+                                (T0 + 120, 120.0, 179.0, 149.5)])
+        self.assertEqual(self.store.query('gh', 't', T0, T0 + 180, resolution=3600)[1],
+                         [(T0, 0.0, 179.0, 89.5)])
+        # 增量: 后写入的数据合并进已有的汇总
+        self.store.write('gh', T0 + 30.5, {'t': -10})
+        self.assertEqual(self.store.query('gh', 't', T0, T0 + 60, resolution=60)[1][0][1], -10.0)
+
+    def test_duplicates_and_non_finite(self):
+        self.store.write('gh', T0, {'t': 1.0})
+        self.store.flush()
+        self.store.write('gh', T0, {'t': 100.0})
+        self.store.write('gh', T0 + 1, {'t': float('nan')})
+        self.store.write('gh', T0 + 2, {'t': 3.0})
+        self.assertEqual(self.store.query('gh', 't', T0, T0 + 60)[1], [(T0, 1.0), (T0 + 2, 3.0)])
+        self.assertEqual(self.store.query('gh', 't', T0, T0 + 60, resolution=60)[1], [(T0, 1.0, 3.0, 2.0)])
+
+    def test_choose_resolution(self):
+        for i in range(0, 2 * 86400, 10):
+            self.store.write('gh', T0 + i, {'t': 1})
+        self.assertEqual(self.store.query('gh', 't', T0, T0 + 600, max_points=100)[0], 0)
+        self.assertEqual(self.store.query('gh', 't', T0, T0 + 3600, max_points=100)[0], 60)
+        resolution, rows = self.store.query('gh', 't', T0, T0 + 2 * 86400, max_points=100)
+        self.assertEqual((resolution, len(rows)), (3600, 48))
+
+    def test_reader_sees_new_series(self):
+        reader = TimeSeriesStore(self.path, read_only=True)
+        try:
+            self.assertEqual(reader.query('gh', 't', T0, T0 + 60), (0, []))
+            self.store.write('gh', T0, {'t': 5})
+            self.store.flush()
+            self.assertEqual(reader.query('gh', 't', T0, T0 + 60), (0, [(T0, 5.0)]))
+        finally:
+            reader.close()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+# test_traffic_capture.py
+import asyncio
+import os
+import socket
+import tempfile
+import time
+import unittest
+import modbus_tk.defines as cst
+import modbus_tk.modbus_tcp as modbus_tcp
+from traffic_capture import TrafficCapture, read_capture, replay_to_slave, ReplaySlave, REQUEST, RESPONSE
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+class TestServerCapture(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.dir.name, 'session.mbcap')
+        self.port = free_port()
+        self.server = modbus_tcp.TcpServer(port=self.port, address='127.0.0.1')
+        slave = self.server.add_slave(1)
+        slave.add_block('hr', cst.HOLDING_REGISTERS, 0, 10)
+        slave.set_values('hr', 0, [11, 22, 33, 44])
+        self.server.start()
+        deadline = time.monotonic() + 5
+        while True:  # 服务器在线程中绑定端口, 等到可以连接
+            try:
+                socket.create_connection(('127.0.0.1', self.port)).close()
+                break
+            except ConnectionRefusedError:
+                if time.monotonic() > deadline:
+                    raise
+                time.sleep(0.05)
+
+    def tearDown(self):
+        self.server.stop()
+        self.dir.cleanup()
+
+    def test_capture_and_replay(self):
+        capture = TrafficCapture(self.path).install_server_hooks()
+        master = modbus_tcp.TcpMaster('127.0.0.1', self.port)
+        try:
+            self.assertEqual(master.execute(1, cst.READ_HOLDING_REGISTERS, 0, 4), (11, 22, 33, 44))
+            master.execute(1, cst.WRITE_SINGLE_REGISTER, 5, output_value=7)
+        finally:
+            master.close()
+            capture.close()
+
+        records = list(read_capture(self.path))
+        self.assertEqual([direction for _, direction, _, _ in records], [REQUEST, RESPONSE, REQUEST, RESPONSE])
+        self.assertEqual(len({stream for _, _, stream, _ in records}), 1)
+        frames = [frame for _, _, _, frame in records]
+        # 请求帧是完整的MBAP帧(事务号之后的部分)
+        self.assertEqual(frames[0][2:], bytes.fromhex('0000 0006 01 03 0000 0004'))
+        self.assertEqual(frames[1][2:], bytes.fromhex('0000 000b 01 03 08 000b 0016 0021 002c'))
+        self.assertEqual(frames[2][2:], bytes.fromhex('0000 0006 01 06 0005 0007'))
+        self.assertEqual(frames[3][2:], frames[2][2:])
+
+        stats = asyncio.run(replay_to_slave(self.path, '127.0.0.1', self.port, speed=0))
+        self.assertEqual((stats['requests'], stats['failures'], stats['mismatches']), (2, 0, 0))
+
+        slave = ReplaySlave(self.path, speed=0)
+        self.assertEqual(len(slave.responses), 2)
+        delay, response = slave.lookup(b'\x12\x34' + frames[0][2:])
+        self.assertEqual(response, b'\x12\x34' + frames[1][2:])
+
+if __name__ == '__main__':
+    unittest.main()
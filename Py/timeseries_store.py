@@ -0,0 +1,208 @@
+# timeseries_store.py
+"""嵌入式时序数据库(SQLite)
+
+原始采样按 (序列, 时间) 聚簇存放, 序列 = (设备, 点); 写入时同步增量更新
+1分钟、1小时、1天三级汇总(数量/总和/最小/最大), 查询长时间范围时直接读汇总表,
+几个月的数据也只需读取少量行。写入先缓冲, 攒够条数或超过时间间隔后在一个事务中提交。
+数据库使用WAL模式, 其他线程/进程(如 web_monitor)可以同时读取(read_only=True)。
+
+    store = TimeSeriesStore('greenhouse.db')
+    store.write('greenhouse', time.time(), {'temperature': 25.3, 'humidity': 60.1})
+    resolution, rows = store.query('greenhouse', 'temperature', start, end, max_points=1000)
+"""
+import math
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+
+# 汇总粒度(秒), 从细到粗
+RESOLUTIONS = (60, 3600, 86400)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS series (
+    id INTEGER PRIMARY KEY,
+    device TEXT NOT NULL,
+    tag TEXT NOT NULL,
+    UNIQUE (device, tag)
+);
+CREATE TABLE IF NOT EXISTS samples (
+    series INTEGER NOT NULL,
+    time REAL NOT NULL,
+    value REAL,
+    PRIMARY KEY (series, time)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS rollups (
+    series INTEGER NOT NULL,
+    resolution INTEGER NOT NULL,
+    bucket INTEGER NOT NULL,
+    count INTEGER NOT NULL,
+    sum REAL NOT NULL,
+    min REAL NOT NULL,
+    max REAL NOT NULL,
+    PRIMARY KEY (series, resolution, bucket)
+) WITHOUT ROWID;
+"""
+
+INSERT_SAMPLE = 'INSERT OR IGNORE INTO samples (series, time, value) VALUES (?, ?, ?)'
+UPSERT_ROLLUP = """
+INSERT INTO rollups (series, resolution, bucket, count, sum, min, max) VALUES (?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (series, resolution, bucket) DO UPDATE SET
+    count = count + excluded.count, sum = sum + excluded.sum,
+    min = min(min, excluded.min), max = max(max, excluded.max)
+"""
+
+
+class TimeSeriesStore:
+    """带增量汇总的时序存储
+
+    max_rows / flush_interval: 缓冲条数或秒数达到其一即提交
+    read_only: 只读打开已有的数据库(供其他进程查询)
+    同一序列同一时间戳的重复采样只保留第一条, 也不会重复计入汇总; NaN/无穷大的值被丢弃。
+    """
+    def __init__(self, path, max_rows=500, flush_interval=5.0, read_only=False):
+        self.path = path
+        self.max_rows = max_rows
+        self.flush_interval = flush_interval
+        if read_only:
+            self._db = sqlite3.connect(f'file:{path}?mode=ro', uri=True, check_same_thread=False)
+        else:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute('PRAGMA journal_mode=WAL')
+            self._db.execute('PRAGMA synchronous=NORMAL')
+            self._db.executescript(SCHEMA)
+        self._lock = threading.Lock()
+        self._series = {(device, tag): sid for sid, device, tag in
+                        self._db.execute('SELECT id, device, tag FROM series')}
+        self._rows = []  # (序列号, 时间, 值)
+        self._last_flush = time.monotonic()
+
+    def _find_series(self, device, tag):
+        """查找序列号; 缓存中没有时查库(序列可能由其他进程创建), 不存在返回None"""
+        sid = self._series.get((device, tag))
+        if sid is None:
+            row = self._db.execute('SELECT id FROM series WHERE device = ? AND tag = ?', (device, tag)).fetchone()
+            if row is not None:
+                sid = self._series[(device, tag)] = row[0]
+        return sid
+
+    def _series_id(self, device, tag):
+        sid = self._find_series(device, tag)
+        if sid is None:
+            with self._db:
+                sid = self._db.execute('INSERT INTO series (device, tag) VALUES (?, ?)', (device, tag)).lastrowid
+            self._series[(device, tag)] = sid
+        return sid
+
+    def write(self, device, timestamp, values):
+        """追加一个设备在某时刻的多个点 {点: 值}; timestamp 为epoch秒"""
+        with self._lock:
+            for tag, value in values.items():
+                if value is not None and math.isfinite(value):
+                    self._rows.append((self._series_id(device, tag), timestamp, float(value)))
+            if len(self._rows) >= self.max_rows or time.monotonic() - self._last_flush >= self.flush_interval:
+                self._flush()
+
+    def flush(self):
+        with self._lock:
+            self._flush()
+
+    def _flush(self):
+        self._last_flush = time.monotonic()
+        rows, self._rows = self._rows, []
+        if not rows:
+            return
+        try:
+            with self._db:
+                before = self._db.total_changes
+                self._db.executemany(INSERT_SAMPLE, rows)
+                inserted = rows
+                if self._db.total_changes - before != len(rows):
+                    # 有重复时间戳: 撤销后逐条插入, 只汇总真正写入的行
+                    self._db.rollback()
+                    inserted = [row for row in rows if self._db.execute(INSERT_SAMPLE, row).rowcount]
+                self._db.executemany(UPSERT_ROLLUP, self._aggregate(inserted))
+        except sqlite3.Error:
+            # 事务已回滚, 放回缓冲区等下次提交
+            self._rows = rows + self._rows
+            raise
+
+    @staticmethod
+    def _aggregate(rows):
+        buckets = defaultdict(lambda: [0, 0.0, float('inf'), float('-inf')])
+        for sid, timestamp, value in rows:
+            for resolution in RESOLUTIONS:
+                agg = buckets[(sid, resolution, int(timestamp // resolution) * resolution)]
+                agg[0] += 1
+                agg[1] += value
+                agg[2] = min(agg[2], value)
+                agg[3] = max(agg[3], value)
+        return [key + tuple(agg) for key, agg in buckets.items()]
+
+    def series(self):
+        """全部 (设备, 点)"""
+        with self._lock:
+            return sorted(self._db.execute('SELECT device, tag FROM series'))
+
+    def _count_raw(self, sid, start, end, limit):
+        return self._db.execute(
+            'SELECT COUNT(*) FROM (SELECT 1 FROM samples WHERE series = ? AND time >= ? AND time < ? LIMIT ?)',
+            (sid, start, end, limit)).fetchone()[0]
+
+    def choose_resolution(self, sid, start, end, max_points):
+        """不超过max_points个点的最细粒度; 0 表示原始数据"""
+        if self._count_raw(sid, start, end, max_points + 1) <= max_points:
+            return 0
+        for resolution in RESOLUTIONS:
+            if (end - start) / resolution <= max_points:
+                return resolution
+        return RESOLUTIONS[-1]
+
+    def query(self, device, tag, start, end, resolution=None, max_points=None):
+        """查询 [start, end) 的数据, 返回 (粒度, 行列表)
+
+        粒度为0时行为 (时间, 值); 否则为 (区间起始时间, 最小, 最大, 平均)。
+        resolution 为None时根据max_points自动选择(都未给出时返回原始数据)。
+        """
+        with self._lock:
+            self._flush()
+            sid = self._find_series(device, tag)
+            if sid is None:
+                return resolution or 0, []
+            if resolution is None:
+                resolution = self.choose_resolution(sid, start, end, max_points) if max_points else 0
+            if resolution == 0:
+                rows = self._db.execute(
+                    'SELECT time, value FROM samples WHERE series = ? AND time >= ? AND time < ? ORDER BY time',
+                    (sid, start, end)).fetchall()
+            else:
+                if resolution not in RESOLUTIONS:
+                    raise ValueError(f"不支持的汇总粒度: {resolution}")
+                first = int(start // resolution) * resolution
+                rows = self._db.execute(
+                    'SELECT bucket, min, max, sum / count FROM rollups '
+                    'WHERE series = ? AND resolution = ? AND bucket >= ? AND bucket < ? ORDER BY bucket',
+                    (sid, resolution, first, end)).fetchall()
+            return resolution, rows
+
+    def latest(self, device, tag):
+        """最新的 (时间, 值), 没有数据时为None"""
+        with self._lock:
+            self._flush()
+            sid = self._find_series(device, tag)
+            if sid is None:
+                return None
+            return self._db.execute('SELECT time, value FROM samples WHERE series = ? ORDER BY time DESC LIMIT 1',
+                                    (sid,)).fetchone()
+
+    def prune(self, before):
+        """删除早于before的原始数据(汇总保留), 返回删除的行数"""
+        with self._lock:
+            self._flush()
+            with self._db:
+                return self._db.execute('DELETE FROM samples WHERE time < ?', (before,)).rowcount
+
+    def close(self):
+        with self._lock:
+            self._flush()
+            self._db.close()
@@ -0,0 +1,291 @@
+# traffic_capture.py
+"""Modbus TCP 流量抓取与回放
+
+通过 modbus_tk 的钩子记录每一帧请求/响应(完整MBAP帧)和单调时钟时间戳,
+写入紧凑的二进制文件; 回放时可按原速、N倍速或最快速度:
+  - 把请求重新发给从站(压测/复现现场访问模式)
+  - 作为假从站, 用抓到的响应应答主站
+
+文件格式: b'MBCP' + 版本(1字节), 之后每条记录为
+  <d 相对时间(秒)> <B 方向 0请求/1响应> <H 连接号> <H 帧长度> + 帧字节
+
+    capture = TrafficCapture('session.mbcap').install_master_hooks()
+    python traffic_capture.py dump session.mbcap
+    python traffic_capture.py replay session.mbcap --host 127.0.0.1 --port 5020 --speed 10
+    python traffic_capture.py serve session.mbcap --port 5020
+"""
+import argparse
+import asyncio
+import struct
+import threading
+import time
+from collections import defaultdict, deque
+import modbus_tk.hooks as modbus_hooks
+from benchmark import percentile
+
+MAGIC = b'MBCP'
+VERSION = 1
+RECORD = struct.Struct('<dBHH')
+MBAP_HEADER = struct.Struct('>HHHB')
+REQUEST, RESPONSE = 0, 1
+
+
+class TrafficCapture:
+    """线程安全的抓包写入器, 记录先缓存在内存中成批写出"""
+    def __init__(self, path, buffer_size=64 * 1024):
+        self.path = path
+        self.buffer_size = buffer_size
+        self.frames = 0
+        self._file = open(path, 'wb')
+        self._file.write(MAGIC + bytes([VERSION]))
+        self._buffer = bytearray()
+        self._lock = threading.Lock()
+        self._start = time.monotonic()
+        self._streams = {}  # 连接对象(主站或客户端socket) -> 连接号, 连接关闭时删除
+        self._next_stream = 0
+        self._hooks = []
+        self._server_socket = threading.local()  # 服务器线程正在读取请求的客户端socket
+
+    def record(self, direction, frame, stream=0):
+        frame = bytes(frame)
+        with self._lock:
+            self._buffer += RECORD.pack(time.monotonic() - self._start, direction, stream, len(frame))
+            self._buffer += frame
+            self.frames += 1
+            if len(self._buffer) >= self.buffer_size:
+                self._flush()
+
+    def stream_id(self, key):
+        """连接对象(主站或socket)的连接号; 新连接分配一个当前未使用的号码"""
+        with self._lock:
+            stream = self._streams.get(key)
+            if stream is None:
+                used = set(self._streams.values())
+                stream = self._next_stream
+                while stream in used:
+                    stream = (stream + 1) & 0xFFFF
+                self._next_stream = (stream + 1) & 0xFFFF
+                self._streams[key] = stream
+            return stream
+
+    def end_stream(self, key):
+        """连接关闭: 释放连接号, 之后的新连接不会沿用旧连接的记录"""
+        with self._lock:
+            self._streams.pop(key, None)
+
+    def _flush(self):
+        self._file.write(self._buffer)
+        self._buffer.clear()
+
+    def flush(self):
+        with self._lock:
+            self._flush()
+            self._file.flush()
+
+    def _install(self, name, hook):
+        modbus_hooks.install_hook(name, hook)
+        self._hooks.append((name, hook))
+
+    def install_master_hooks(self):
+        """抓取本进程中所有 modbus_tk 主站的收发帧"""
+        self._install('modbus.Master.before_send',
+                      lambda args: self.record(REQUEST, args[1], self.stream_id(args[0])))
+        self._install('modbus.Master.after_recv',
+                      lambda args: self.record(RESPONSE, args[1], self.stream_id(args[0])))
+        # 断开重连视为新连接
+        self._install('modbus_tcp.TcpMaster.after_close', lambda args: self.end_stream(args[0]))
+        return self
+
+    def _server_received(self, args):
+        # TcpServer.after_recv 在只读到7字节MBAP头时触发, 这里只记下是哪个连接
+        self._server_socket.sock = args[1]
+
+    def _server_request(self, args):
+        # Server.before_handle_request 在同一线程中紧接着收到完整请求帧
+        sock = getattr(self._server_socket, 'sock', None)
+        if sock is not None:
+            self._server_socket.sock = None
+            self.record(REQUEST, args[1], self.stream_id(sock))
+
+    def _server_connected(self, args):
+        self.stream_id(args[1])  # 钩子必须返回None, 否则 call_hooks 不再调用后面的钩子
+
+    def install_server_hooks(self):
+        """抓取本进程中 modbus_tk TcpServer 的收发帧(按客户端连接区分)"""
+        self._install('modbus_tcp.TcpServer.after_recv', self._server_received)
+        self._install('modbus.Server.before_handle_request', self._server_request)
+        self._install('modbus_tcp.TcpServer.before_send',
+                      lambda args: self.record(RESPONSE, args[2], self.stream_id(args[1])))
+        self._install('modbus_tcp.TcpServer.on_connect', self._server_connected)
+        self._install('modbus_tcp.TcpServer.on_disconnect', lambda args: self.end_stream(args[1]))
+        self._install('modbus_tcp.TcpServer.on_error', lambda args: self.end_stream(args[1]))
+        return self
+
+    def close(self):
+        for name, hook in self._hooks:
+            modbus_hooks.uninstall_hook(name, hook)
+        self._hooks = []
+        with self._lock:
+            if not self._file.closed:
+                self._flush()
+                self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def read_capture(path):
+    """逐条读取抓包文件, 产生 (相对时间, 方向, 连接号, 帧字节)"""
+    with open(path, 'rb') as f:
+        header = f.read(len(MAGIC) + 1)
+        if header[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"不是抓包文件: {path}")
+        while True:
+            head = f.read(RECORD.size)
+            if len(head) < RECORD.size:
+                return
+            timestamp, direction, stream, length = RECORD.unpack(head)
+            frame = f.read(length)
+            if len(frame) < length:
+                return  # 写入中断的最后一条记录
+            yield timestamp, direction, stream, frame
+
+
+def _frame_key(frame):
+    """请求帧去掉事务号后的内容(从站ID+PDU), 用于匹配响应"""
+    return frame[6:]
+
+
+async def _read_frame(reader):
+    header = await reader.readexactly(MBAP_HEADER.size)
+    length = MBAP_HEADER.unpack(header)[2]
+    return header + await reader.readexactly(length - 1)
+
+
+def _speed_delay(speed):
+    return (lambda t: t / speed) if speed and speed > 0 else (lambda t: 0.0)
+
+
+async def replay_to_slave(path, host, port, speed=1.0, timeout=3.0):
+    """把抓到的请求按原时间间隔(除以speed; speed<=0为最快)重新发给从站
+
+    每个抓包连接对应一个新连接, 连接内按顺序发请求并等待响应。
+    返回统计: 请求数、超时/断开数、与抓包响应不同的次数、耗时和延迟列表。
+    """
+    streams = defaultdict(list)  # 连接号 -> [[时间, 请求帧, 抓到的响应帧], ...]
+    for timestamp, direction, stream, frame in read_capture(path):
+        if direction == REQUEST:
+            streams[stream].append([timestamp, frame, None])
+        elif streams[stream] and streams[stream][-1][2] is None:
+            streams[stream][-1][2] = frame
+    scale = _speed_delay(speed)
+    stats = {'requests': 0, 'failures': 0, 'mismatches': 0, 'latencies': []}
+    loop = asyncio.get_running_loop()
+    origin = loop.time()
+
+    async def run_stream(requests):
+        reader, writer = await asyncio.open_connection(host, port)
+        try:
+            for timestamp, frame, captured in requests:
+                delay = origin + scale(timestamp) - loop.time()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                begin = loop.time()
+                writer.write(frame)
+                stats['requests'] += 1
+                try:
+                    await writer.drain()
+                    response = await asyncio.wait_for(_read_frame(reader), timeout)
+                except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+                    stats['failures'] += 1
+                    return
+                stats['latencies'].append(loop.time() - begin)
+                if captured is not None and _frame_key(captured) != _frame_key(response):
+                    stats['mismatches'] += 1
+        finally:
+            writer.close()
+
+    await asyncio.gather(*(run_stream(requests) for requests in streams.values()))
+    stats['elapsed'] = loop.time() - origin
+    return stats
+
+
+class ReplaySlave:
+    """用抓到的响应应答主站的假从站
+
+    按请求内容(从站ID+PDU)查找抓包中的响应, 同一请求有多条响应时依次轮换;
+    响应延迟为抓包中的处理时间除以speed。找不到对应响应时不应答。
+    """
+    def __init__(self, path, speed=1.0):
+        self.scale = _speed_delay(speed)
+        self.responses = defaultdict(deque)
+        self.unmatched = 0
+        pending = {}
+        for timestamp, direction, stream, frame in read_capture(path):
+            if direction == REQUEST:
+                pending[stream] = (timestamp, frame)
+            elif stream in pending:
+                sent_at, request = pending.pop(stream)
+                self.responses[_frame_key(request)].append((timestamp - sent_at, frame))
+
+    def lookup(self, request):
+        candidates = self.responses.get(_frame_key(request))
+        if not candidates:
+            return None
+        delay, response = candidates[0]
+        candidates.rotate(-1)
+        return self.scale(delay), request[:2] + response[2:]  # 换成本次请求的事务号
+
+    async def _handle(self, reader, writer):
+        try:
+            while True:
+                request = await _read_frame(reader)
+                found = self.lookup(request)
+                if found is None:
+                    self.unmatched += 1
+                    continue
+                delay, response = found
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                writer.write(response)
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host='0.0.0.0', port=5020):
+        server = await asyncio.start_server(self._handle, host, port, reuse_address=True)
+        async with server:
+            await server.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Modbus TCP 抓包回放')
+    parser.add_argument('command', choices=['dump', 'replay', 'serve'])
+    parser.add_argument('path')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=5020)
+    parser.add_argument('--speed', type=float, default=1.0, help='回放倍速, 0表示最快')
+    args = parser.parse_args()
+
+    if args.command == 'dump':
+        for timestamp, direction, stream, frame in read_capture(args.path):
+            print(f"{timestamp:12.6f} #{stream:<3} {'→' if direction == REQUEST else '←'} {frame.hex(' ')}")
+    elif args.command == 'replay':
+        stats = asyncio.run(replay_to_slave(args.path, args.host, args.port, args.speed))
+        latencies = sorted(stats['latencies'])
+        print(f"请求 {stats['requests']} 次, 失败 {stats['failures']} 次, 响应不同 {stats['mismatches']} 次, "
+              f"耗时 {stats['elapsed']:.3f}s")
+        if latencies:
+            print(f"延迟 p50 {percentile(latencies, 50) * 1000:.3f}ms  p99 {percentile(latencies, 99) * 1000:.3f}ms")
+    else:
+        slave = ReplaySlave(args.path, args.speed)
+        print(f"回放从站监听 {args.host}:{args.port}, 已载入 {len(slave.responses)} 种请求")
+        try:
+            asyncio.run(slave.serve(args.host, args.port))
+        except KeyboardInterrupt:
+            print(f"\n已停止, 未匹配请求 {slave.unmatched} 次")
@@ -0,0 +1,215 @@
+# virtual_fleet.py
+"""虚拟设备群
+
+在一个进程、一个事件循环里模拟成千上万台与 ESP32下位机.ino 相同的温室节点:
+保持寄存器0/1为温度/湿度(放大100倍, 每2秒更新)。设备由一个紧凑模板批量生成,
+每台有独立的寄存器表和传感器参数(基准值、相位随机), 可以按从站ID分布在少数端口上,
+也可以每台设备占一个端口。
+
+    python virtual_fleet.py --devices 2000 --units-per-port 200 --export devices.json
+    python fleet_poller.py devices.json
+"""
+import asyncio
+import json
+import math
+import random
+import threading
+from register_store import RegisterStore
+from modbus_slave_simulator import build_server_context
+from async_server import AsyncModbusServer
+
+MAX_UNITS_PER_PORT = 247  # Modbus从站地址范围1-247
+
+
+class SensorModel:
+    """正弦变化加高斯噪声的传感器, 数值乘以scale后写入保持寄存器
+
+    spread: 各设备基准值的随机偏移范围; dropout: 某次读数失败(保持旧值)的概率
+    """
+    def __init__(self, address, base, amplitude, period=600.0, noise=0.05, scale=100,
+                 spread=1.0, dropout=0.0):
+        self.address = address
+        self.base = base
+        self.amplitude = amplitude
+        self.period = period
+        self.noise = noise
+        self.scale = scale
+        self.spread = spread
+        self.dropout = dropout
+
+
+class DeviceTemplate:
+    """设备模板: 寄存器表大小、传感器列表和更新周期"""
+    def __init__(self, name, sensors, size=16, interval=2.0):
+        self.name = name
+        self.sensors = sensors
+        self.size = size
+        self.interval = interval
+
+
+# 与 ESP32下位机.ino 一致: HR0 温度(°C×100), HR1 湿度(%×100)
+ESP32_TEMPLATE = DeviceTemplate('esp32', [
+    SensorModel(0, base=25.0, amplitude=5.0, spread=3.0),
+    SensorModel(1, base=60.0, amplitude=15.0, spread=10.0),
+])
+
+
+class VirtualDevice:
+    """一台虚拟设备: 所在端口/从站ID、寄存器表和各传感器的个体参数"""
+    def __init__(self, name, port_index, unit, tables, template, rng):
+        self.name = name
+        self.port_index = port_index
+        self.unit = unit
+        self.tables = tables
+        # (传感器, 本设备基准值, 相位)
+        self.sensors = [(s, s.base + rng.uniform(-s.spread, s.spread), rng.uniform(0, 2 * math.pi))
+                        for s in template.sensors]
+
+    def update(self, now, rng):
+        hr = self.tables['hr']
+        for sensor, base, phase in self.sensors:
+            if sensor.dropout and rng.random() < sensor.dropout:
+                continue
+            value = base + sensor.amplitude * math.sin(2 * math.pi * now / sensor.period + phase)
+            value += rng.gauss(0, sensor.noise)
+            hr.set(sensor.address, int(value * sensor.scale) & 0xFFFF)
+
+
+class VirtualFleet:
+    """在一个事件循环中托管整群虚拟设备
+
+    units_per_port: 每个端口上的设备数; 为1时每台设备独占一个端口(任意从站ID都应答),
+                    大于1时设备以从站ID 1..n 区分
+    base_port: 第一个端口, 其余端口依次递增; 为0时每个端口由系统分配
+    """
+    def __init__(self, count, template=ESP32_TEMPLATE, host='0.0.0.0', base_port=5020,
+                 units_per_port=MAX_UNITS_PER_PORT, seed=None):
+        if not 1 <= units_per_port <= MAX_UNITS_PER_PORT:
+            raise ValueError(f"units_per_port 必须在1-{MAX_UNITS_PER_PORT}之间")
+        self.template = template
+        self.host = host
+        self.base_port = base_port
+        self.units_per_port = units_per_port
+        self.rng = random.Random(seed)
+        self.devices = []
+        self.servers = []
+        self.loop = None
+        self.started = threading.Event()
+        self._stop_event = None
+        port_count = (count + units_per_port - 1) // units_per_port
+        for port_index in range(port_count):
+            store = RegisterStore(template.size)
+            first = port_index * units_per_port
+            units = range(1, min(units_per_port, count - first) + 1)
+            if units_per_port == 1:
+                units = [0]  # 单设备端口: 所有从站ID共用一组表
+            for unit in units:
+                name = f"{template.name}-{len(self.devices) + 1:05d}"
+                self.devices.append(VirtualDevice(name, port_index, unit, store.unit(unit), template, self.rng))
+            port = base_port + port_index if base_port else 0
+            context = build_server_context(store, None if units_per_port == 1 else list(units))
+            self.servers.append(AsyncModbusServer(context, (host, port)))
+
+    @property
+    def ports(self):
+        """各端口实际监听的端口号(启动后有效)"""
+        return [server.port for server in self.servers]
+
+    def update(self, now):
+        for device in self.devices:
+            device.update(now, self.rng)
+
+    async def _update_loop(self):
+        loop = asyncio.get_running_loop()
+        deadline = loop.time()
+        while not self._stop_event.is_set():
+            self.update(loop.time())
+            deadline += self.template.interval
+            try:
+                await asyncio.wait_for(self._stop_event.wait(), max(0.0, deadline - loop.time()))
+            except asyncio.TimeoutError:
+                pass
+
+    async def serve(self):
+        """启动全部端口和传感器更新, 直到 stop() 被调用"""
+        self.loop = asyncio.get_running_loop()
+        self._stop_event = asyncio.Event()
+        tasks = [asyncio.ensure_future(server.serve()) for server in self.servers]
+        try:
+            for server in self.servers:
+                while not server.started.is_set():
+                    if any(task.done() for task in tasks):
+                        await asyncio.gather(*tasks)  # 抛出端口绑定错误
+                    await asyncio.sleep(0.01)
+            self.update(self.loop.time())
+            self.started.set()
+            await self._update_loop()
+        finally:
+            for server in self.servers:
+                server.stop()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            self.started.clear()
+
+    def start_in_thread(self):
+        """在后台线程运行, 所有端口开始监听后返回线程对象"""
+        errors = []
+
+        def run():
+            try:
+                asyncio.run(self.serve())
+            except Exception as e:
+                errors.append(e)
+                self.started.set()
+
+        thread = threading.Thread(target=run, name="virtual-fleet", daemon=True)
+        thread.start()
+        self.started.wait()
+        if errors:
+            raise errors[0]
+        return thread
+
+    def stop(self):
+        if self.loop is not None and self._stop_event is not None and not self.loop.is_closed():
+            self.loop.call_soon_threadsafe(self._stop_event.set)
+
+    def device_configs(self, host='127.0.0.1'):
+        """供 fleet_poller.load_devices 使用的设备列表"""
+        ports = self.ports
+        return [{'name': d.name, 'host': host, 'port': ports[d.port_index], 'unit': d.unit or 1,
+                 'interval': self.template.interval} for d in self.devices]
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description='虚拟ESP32温室节点群')
+    parser.add_argument('--devices', type=int, default=1000)
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=5020, help='第一个端口')
+    parser.add_argument('--units-per-port', type=int, default=MAX_UNITS_PER_PORT,
+                        help='每个端口的设备数, 1表示每台设备一个端口')
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--export', help='把设备列表写成JSON(供fleet_poller.py使用)')
+    args = parser.parse_args()
+
+    try:
+        # 每个端口占用一个文件描述符, 设备多时提高软限制
+        import resource
+        soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+    except (ImportError, ValueError, OSError):
+        pass
+
+    fleet = VirtualFleet(args.devices, host=args.host, base_port=args.port,
+                         units_per_port=args.units_per_port, seed=args.seed)
+    fleet.start_in_thread()
+    print(f"已启动 {len(fleet.devices)} 台虚拟设备, 端口 {fleet.ports[0]}-{fleet.ports[-1]}")
+    if args.export:
+        host = '127.0.0.1' if args.host == '0.0.0.0' else args.host
+        with open(args.export, 'w', encoding='utf-8') as f:
+            json.dump(fleet.device_configs(host), f, indent=1, ensure_ascii=False)
+        print(f"设备列表已写入 {args.export}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        print("\n设备群已停止")
+        fleet.stop()
@@ -1,29 +1,170 @@
 # web_monitor.py
-from flask import Flask, render_template_string
-from threading import Lock
+from flask import Flask, Response, request
+from threading import Condition
+from collections import deque
+import copy
 import json
+import time
 
 app = Flask(__name__)
-data = {"speed": 0, "start": False, "sensors": [0]*8}
-data_lock = Lock()
+
+# 页面模板只编译一次
+DASHBOARD = app.jinja_env.from_string('''
+<h1>Modbus监控</h1>
+<p>速度: <span id="speed">{{ speed }}</span>%</p>
+<p>状态: <span id="start">{{ "运行" if start else "停止" }}</span></p>
+<h3>传感器状态:</h3>
+{% for s in sensors %}
+<div>Sensor {{ loop.index0 }}: <span id="sensor{{ loop.index0 }}">{{ "触发" if s else "正常" }}</span></div>
+{% endfor %}
+<script>
+// 通过SSE接收变化量, 只更新变化的字段
+const source = new EventSource('/api/stream');
+function apply(values) {
+    if ('speed' in values) document.getElementById('speed').textContent = values.speed;
+    if ('start' in values) document.getElementById('start').textContent = values.start ? '运行' : '停止';
+    if ('sensors' in values) values.sensors.forEach((s, i) => {
+        const el = document.getElementById('sensor' + i);
+        if (el) el.textContent = s ? '触发' : '正常';
+    });
+}
+source.addEventListener('snapshot', e => apply(JSON.parse(e.data).data));
+source.addEventListener('delta', e => apply(JSON.parse(e.data).changes));
+</script>
+''')
+
+
+class DataHub:
+    """共享数据与版本化变化量
+
+    值变化时版本号加一, 快照和变化量各序列化一次, 所有订阅者共用同一份字符串。
+    """
+    def __init__(self, initial, history=256):
+        self.data = dict(initial)
+        self.version = 0
+        self.snapshot = json.dumps({'version': 0, 'data': self.data})
+        self.data_json = json.dumps(self.data)
+        self._deltas = deque(maxlen=history)  # (版本号, 变化量JSON)
+        self._changed = Condition()
+
+    def update(self, values):
+        """合并新值; 只有真正变化时才生成新版本并通知订阅者"""
+        with self._changed:
+            changes = {k: copy.deepcopy(v) for k, v in values.items() if self.data.get(k) != v}
+            if not changes:
+                return False
+            self.data.update(changes)
+            self.version += 1
+            self.snapshot = json.dumps({'version': self.version, 'data': self.data})
+            self.data_json = json.dumps(self.data)
+            self._deltas.append((self.version, json.dumps({'version': self.version, 'changes': changes})))
+            self._changed.notify_all()
+            return True
+
+    def current(self):
+        with self._changed:
+            return self.version, dict(self.data), self.snapshot
+
+    def current_json(self):
+        with self._changed:
+            return self.version, self.data_json
+
+    def wait(self, since, timeout=15.0):
+        """等待版本号超过since; 返回 (版本, 事件列表), 事件为 (类型, 版本, JSON)"""
+        with self._changed:
+            self._changed.wait_for(lambda: self.version > since, timeout)
+            if self.version <= since:
+                return since, []
+            if since < 0 or not self._deltas or self._deltas[0][0] > since + 1:
+                # 订阅者落后太多, 直接补发完整快照
+                return self.version, [('snapshot', self.version, self.snapshot)]
+            return self.version, [('delta', v, d) for v, d in self._deltas if v > since]
+
+
+hub = DataHub({"speed": 0, "start": False, "sensors": [0]*8})
+
+# 同进程运行从站时设置为其 ServerMetrics, /metrics 即输出从站指标
+metrics = None
+
+# 设置为 TimeSeriesStore 后 /api/history 提供历史曲线数据
+store = None
+
+
+def update_data(values):
+    """供采集端(如 ModbusMaster.data_updated)调用"""
+    return hub.update(values)
+
 
 @app.route('/')
 def dashboard():
-    with data_lock:
-        return render_template_string('''
-        <h1>Modbus监控</h1>
-        <p>速度: {{ speed }}%</p>
-        <p>状态: {{ "运行" if start else "停止" }}</p>
-        <h3>传感器状态:</h3>
-        {% for s in sensors %}
-        <div>Sensor {{ loop.index0 }}: {{ "触发" if s else "正常" }}</div>
-        {% endfor %}
-        ''', **data)
+    _, data, _ = hub.current()
+    return DASHBOARD.render(**data)
 
 @app.route('/api/data')
 def get_data():
-    with data_lock:
-        return json.dumps(data)
+    # 直接返回缓存的快照字符串
+    version, data_json = hub.current_json()
+    return Response(data_json, mimetype='application/json', headers={'ETag': str(version)})
+
+@app.route('/api/stream')
+def stream():
+    """Server-Sent Events: 先发完整快照, 之后只推送变化量"""
+    last_id = request.headers.get('Last-Event-ID', '')
+    since = int(last_id) if last_id.isdigit() else -1
+
+    def events(since):
+        if since < 0 or since > hub.version:
+            since, _, snapshot = hub.current()
+            yield f"id: {since}\nevent: snapshot\ndata: {snapshot}\n\n"
+        while True:
+            version, batch = hub.wait(since)
+            if not batch:
+                yield ": keepalive\n\n"
+                continue
+            for kind, event_id, payload in batch:
+                yield f"id: {event_id}\nevent: {kind}\ndata: {payload}\n\n"
+            since = version
+
+    return Response(events(since), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/api/history')
+def get_history():
+    """历史数据: ?device=&tag=&start=&end=&points=1000[&resolution=60]
+
+    时间为epoch秒, 默认最近1小时; 不指定resolution时选择点数不超过points的最细粒度
+    """
+    if store is None:
+        return Response('{"error": "history not configured"}', status=404, mimetype='application/json')
+    args = request.args
+    try:
+        end = float(args.get('end', time.time()))
+        start = float(args.get('start', end - 3600))
+        points = int(args.get('points', 1000))
+        resolution = int(args['resolution']) if 'resolution' in args else None
+        tag = args['tag']
+        device = args.get('device', '')
+        resolution, rows = store.query(device, tag, start, end, resolution, points)
+    except (KeyError, ValueError) as e:
+        return Response(json.dumps({'error': str(e)}), status=400, mimetype='application/json')
+    columns = ['time', 'value'] if resolution == 0 else ['time', 'min', 'max', 'avg']
+    return Response(json.dumps({'device': device, 'tag': tag, 'resolution': resolution,
+                                'columns': columns, 'rows': rows}), mimetype='application/json')
+
+@app.route('/metrics')
+def get_metrics():
+    """Prometheus 文本格式的从站指标"""
+    if metrics is None:
+        return Response("metrics not configured\n", status=404, mimetype='text/plain')
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4; charset=utf-8')
 
 if __name__ == '__main__':
-    app.run(port=5000)
\ No newline at end of file
+    import argparse
+    from timeseries_store import TimeSeriesStore
+    parser = argparse.ArgumentParser(description='Web监控页面')
+    parser.add_argument('--port', type=int, default=5000)
+    parser.add_argument('--db', help='时序数据库文件(如 greenhouse.db), 只读打开后提供 /api/history')
+    args = parser.parse_args()
+    if args.db:
+        store = TimeSeriesStore(args.db, read_only=True)
+    app.run(port=args.port, threaded=True)
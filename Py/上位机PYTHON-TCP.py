@@ -1,87 +1,113 @@
-from pymodbus.client.sync import ModbusTcpClient as ModbusClient
+from polling_session import PollingSession
+from tag_codec import Field, compile_codec
+from poll_scheduler import PollScheduler
+from alarm_engine import AlarmEngine, AlarmRule
+from data_writer import DataWriter
+from timeseries_store import TimeSeriesStore
+from ring_buffer import RingBuffer, lttb
 import time
 from datetime import datetime
-import csv
 import matplotlib.pyplot as plt
 import warnings
 
 # 忽略matplotlib的警告
 warnings.filterwarnings("ignore")
 
+# ESP32上传的温湿度寄存器: 数值放大100倍存储, 温度可能为负
+GREENHOUSE_FIELDS = (
+    Field('temperature', 0, 'int16', scale=0.01),
+    Field('humidity', 1, 'uint16', scale=0.01),
+)
+
 class GreenhouseMonitor:
-    def __init__(self, ip_address='192.168.108.238', port=502):
-        self.client = ModbusClient(ip_address, port)
-        self.temp_data = []
-        self.humid_data = []
-        self.time_data = []
+    def __init__(self, ip_address='192.168.108.238', port=502, data_format='csv',
+                 history_size=100000, plot_points=1000, db_path='greenhouse.db'):
+        # 持久会话: 长连接+自动重连, 温湿度两个相邻寄存器合并为一次读取
+        self.session = PollingSession(ip_address, port, unit=1)
+        self.codec = compile_codec(GREENHOUSE_FIELDS)
+        # 数据文件: 缓冲写盘, 按天和大小(64MB)轮转; data_format可选'csv'或'binary'
+        path = 'greenhouse_data.csv' if data_format == 'csv' else 'greenhouse_data.bin'
+        self.writer = DataWriter(path, ('temperature', 'humidity'), fmt=data_format,
+                                 max_rows=100, flush_interval=10.0,
+                                 max_bytes=64 * 1024 * 1024, rotate_daily=True)
+        # 时序库: 按(设备, 点, 时间)索引并增量汇总1分钟/1小时/1天, 长时间范围查询只读汇总
+        self.store = TimeSeriesStore(db_path, max_rows=100, flush_interval=10.0)
+        # 内存中只保留最近history_size个采样(epoch时间戳), 绘图时降采样到plot_points个点
+        self.history = RingBuffer(history_size, ('temperature', 'humidity'))
+        self.plot_points = plot_points
         self.max_temp = 30.0  # 温度上限(℃)
         self.min_temp = 15.0   # 温度下限(℃)
         self.max_humid = 80.0  # 湿度上限(%)
         self.min_humid = 40.0  # 湿度下限(%)
+        # 报警规则编译一次; 只在报警/恢复时产生提示, 回差避免在限值附近反复报警
+        self.alarms = AlarmEngine([
+            AlarmRule('greenhouse', 'temperature', 'high', self.max_temp, hysteresis=0.5,
+                      message='高温警告: {value:.2f}°C > {limit}°C', clear_message='高温解除: {value:.2f}°C'),
+            AlarmRule('greenhouse', 'temperature', 'low', self.min_temp, hysteresis=0.5,
+                      message='低温警告: {value:.2f}°C < {limit}°C', clear_message='低温解除: {value:.2f}°C'),
+            AlarmRule('greenhouse', 'humidity', 'high', self.max_humid, hysteresis=2.0,
+                      message='高湿警告: {value:.2f}% > {limit}%', clear_message='高湿解除: {value:.2f}%'),
+            AlarmRule('greenhouse', 'humidity', 'low', self.min_humid, hysteresis=2.0,
+                      message='低湿警告: {value:.2f}% < {limit}%', clear_message='低湿解除: {value:.2f}%'),
+        ])
         
     def read_sensor_data(self):
         try:
-            # 连接Modbus服务器
-            if not self.client.connect():
-                print("无法连接到Modbus服务器")
-                return None, None
-            
-            # 读取保持寄存器(地址0和1)
-            temp_reg = self.client.read_holding_registers(0, 1, unit=1)
-            humid_reg = self.client.read_holding_registers(1, 1, unit=1)
-            
-            if temp_reg.isError() or humid_reg.isError():
+            # 读取保持寄存器(地址0和1), 会话内部合并为一个请求
+            registers = self.session.read_block(self.codec.start, self.codec.length)
+            if registers is None:
                 print("读取寄存器错误")
                 return None, None
                 
-            # 将寄存器值转换回浮点数(之前放大了100倍)
-            temperature = temp_reg.registers[0] / 100.0
-            humidity = humid_reg.registers[0] / 100.0
-            
-            return temperature, humidity
+            # 一次解码并换算回浮点数(之前放大了100倍)
+            values = self.codec.decode(registers)
+            return values['temperature'], values['humidity']
             
         except Exception as e:
             print(f"发生错误: {e}")
             return None, None
-        finally:
-            self.client.close()
     
     def check_thresholds(self, temp, humid):
-        alerts = []
-        if temp > self.max_temp:
-            alerts.append(f"高温警告: {temp}°C > {self.max_temp}°C")
-        if temp < self.min_temp:
-            alerts.append(f"低温警告: {temp}°C < {self.min_temp}°C")
-        if humid > self.max_humid:
-            alerts.append(f"高湿警告: {humid}% > {self.max_humid}%")
-        if humid < self.min_humid:
-            alerts.append(f"低湿警告: {humid}% < {self.min_humid}%")
-        return alerts
+        """返回本次采样新产生的 (报警提示列表, 恢复提示列表), 状态不变时都为空"""
+        events = self.alarms.evaluate({'greenhouse': {'temperature': temp, 'humidity': humid}})
+        return ([event.message for event in events if event.active],
+                [event.message for event in events if not event.active])
     
     def log_data(self, temp, humid):
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        self.time_data.append(timestamp)
-        self.temp_data.append(temp)
-        self.humid_data.append(humid)
+        now = time.time()
+        self.history.append(now, (temp, humid))
         
-        # 写入CSV文件
-        with open('greenhouse_data.csv', 'a', newline='') as file:
-            writer = csv.writer(file)
-            writer.writerow([timestamp, temp, humid])
+        # 写入数据文件(先进缓冲, 按条数/时间批量落盘)
+        self.writer.write(now, (temp, humid))
+        self.store.write('greenhouse', now, {'temperature': temp, 'humidity': humid})
+    
+    def _stored_series(self, tag, since):
+        """从时序库读取since以来的数据, 范围较长时自动改用汇总平均值"""
+        resolution, rows = self.store.query('greenhouse', tag, since, time.time() + 1,
+                                            max_points=self.plot_points)
+        return [row[0] for row in rows], [row[1] if resolution == 0 else row[3] for row in rows]
     
-    def plot_data(self):
-        if len(self.time_data) < 2:
+    def plot_data(self, since=None):
+        """绘制内存中的最近数据; 给出since(epoch秒)时从时序库读取更长的历史"""
+        if since is not None:
+            temp_t, temp_v = self._stored_series('temperature', since)
+            humid_t, humid_v = self._stored_series('humidity', since)
+        else:
+            # LTTB降采样后只需转换固定数量的时间戳
+            epochs = self.history.times()
+            temp_t, temp_v = lttb(epochs, self.history.column('temperature'), self.plot_points)
+            humid_t, humid_v = lttb(epochs, self.history.column('humidity'), self.plot_points)
+        if len(temp_t) < 2:
             print("数据不足，无法生成图表")
             return
             
-        # 将时间字符串转换为datetime对象
-        times = [datetime.strptime(t, "%Y-%m-%d %H:%M:%S") for t in self.time_data]
+        to_datetime = lambda ts: [datetime.fromtimestamp(t) for t in ts]
         
         plt.figure(figsize=(12, 6))
         
         # 绘制温度曲线
         plt.subplot(2, 1, 1)
-        plt.plot(times, self.temp_data, 'r-', label='Temperature (°C)')
+        plt.plot(to_datetime(temp_t), temp_v, 'r-', label='Temperature (°C)')
         plt.axhline(y=self.max_temp, color='r', linestyle='--', label='Max Temp')
         plt.axhline(y=self.min_temp, color='b', linestyle='--', label='Min Temp')
         plt.ylabel('Temperature (°C)')
@@ -91,7 +117,7 @@ class GreenhouseMonitor:
         
         # 绘制湿度曲线
         plt.subplot(2, 1, 2)
-        plt.plot(times, self.humid_data, 'b-', label='Humidity (%)')
+        plt.plot(to_datetime(humid_t), humid_v, 'b-', label='Humidity (%)')
         plt.axhline(y=self.max_humid, color='r', linestyle='--', label='Max Humid')
         plt.axhline(y=self.min_humid, color='b', linestyle='--', label='Min Humid')
         plt.ylabel('Humidity (%)')
@@ -101,26 +127,42 @@ class GreenhouseMonitor:
         plt.tight_layout()
         plt.show()
     
-    def monitor(self, interval=5):
+    def poll_once(self):
+        """读取一次并处理, 返回 {点名: 值}(供调度器自适应), 失败返回None"""
+        temp, humid = self.read_sensor_data()
+        if temp is None or humid is None:
+            return None
+        print(f"{datetime.now().strftime('%Y-%m-%d %H:%M:%S')} - "
+              f"Temperature: {temp:.2f}°C, Humidity: {humid:.2f}%")
+        
+        # 检查阈值
+        alerts, recoveries = self.check_thresholds(temp, humid)
+        for alert in alerts:
+            print(f"! ALERT: {alert}")
+        for recovery in recoveries:
+            print(f"  恢复: {recovery}")
+        
+        # 记录数据
+        self.log_data(temp, humid)
+        return {'temperature': temp, 'humidity': humid}
+    
+    def monitor(self, interval=5, min_interval=None, max_interval=None, deadbands=None):
+        """按绝对截止时间每interval秒采样一次, 读取和写盘耗时不会造成漂移
+
+        同时给出 min_interval/max_interval/deadbands 时自适应: 温湿度变化快时加密采样,
+        平稳或链路慢时放慢, 例如 deadbands={'temperature': 0.1, 'humidity': 0.5}
+        """
+        scheduler = PollScheduler()
+        scheduler.add('sensors', self.poll_once, interval, min_interval, max_interval, deadbands)
         try:
-            while True:
-                temp, humid = self.read_sensor_data()
-                if temp is not None and humid is not None:
-                    print(f"{datetime.now().strftime('%Y-%m-%d %H:%M:%S')} - "
-                          f"Temperature: {temp:.2f}°C, Humidity: {humid:.2f}%")
-                    
-                    # 检查阈值
-                    alerts = self.check_thresholds(temp, humid)
-                    for alert in alerts:
-                        print(f"! ALERT: {alert}")
-                    
-                    # 记录数据
-                    self.log_data(temp, humid)
-                
-                time.sleep(interval)
-                
+            scheduler.run()
         except KeyboardInterrupt:
             print("\n监测停止")
+            print(scheduler.summary())
+            print(self.session.summary())
+            self.session.close()
+            self.writer.close()
+            self.store.close()
             self.plot_data()
 
 if __name__ == "__main__":